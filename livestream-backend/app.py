@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import subprocess
 import os
@@ -6,12 +6,37 @@ import threading
 import time
 import uuid
 import signal
-import json
+import math
+import socket
+import shutil
+from collections import deque
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
 from bson.errors import InvalidId
 from dotenv import load_dotenv
+from utils.hls_playlist import parse_playlist
+from utils.ll_hls import LowLatencyPlaylist
+from utils.ingest_registry import IngestRegistry, ingest_key
+from utils.ffmpeg_manager import build_overlay_filter, overlay_layout, write_overlay_texts, overlay_image_input, overlay_font_file
+from utils.media_probe import probe_source, can_copy_video, can_copy_audio
+from utils.segment_cache import SegmentCache
+from utils.overlay_cache import OverlayCache
+from utils.overlay_events import OverlayEventHub
+from utils.pagination import encode_cursor, keyset_filter
+from utils.segment_storage import DiskStorage, MemoryStorage, UploadServer
+from utils.stream_supervisor import StreamSupervisor
+from utils.pipe_reader import FFmpegPipeReader
+from utils.stream_registry import open_stream_registry
+from utils.stream_view import DiskStreamView, SERVED_DIR
+from utils.stream_janitor import StreamJanitor, SegmentLedger
+from utils.dvr_archive import DvrArchive
+from utils.thumbnail_cache import ThumbnailCache, THUMBNAIL_NAME
+from utils.cpu_scheduler import CpuScheduler, AdmissionRejected, pipeline_cost, parse_cpu_list
+from utils.http_cache import GzipCache, IMMUTABLE, UNCACHEABLE, content_etag, segment_etag, playlist_cache_control
+from utils.db import Database
+from utils.metrics import MetricsRegistry, ViewerTracker, MongoCommandTimer, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 
 load_dotenv()
@@ -20,89 +45,586 @@ CORS(app)
 
 STREAM_DIR = "streams"
 FFMPEG_PATH = "ffmpeg" 
+FFPROBE_PATH = "ffprobe"
+INGEST_MODES = ('auto', 'copy', 'transcode')
+FFMPEG_LOG_LINES = 200
+# Percent of one core a burn-in pipeline may use before burn-in is suspended
+BURN_IN_CPU_BUDGET = float(os.getenv('BURN_IN_CPU_BUDGET', '200'))
+BURN_IN_OVER_BUDGET_SECONDS = 30
+# Overlay writes within this many seconds are applied to burn-in pipelines together
+BURN_IN_SYNC_DELAY = 0.5
+# Local images and fonts (in its fonts/ subdirectory) burn-in may use;
+# other image overlays must be http(s) URLs
+OVERLAY_ASSET_DIR = os.getenv('OVERLAY_ASSET_DIR', 'overlay_assets')
+# Cores FFmpeg pipelines may reserve (0 disables admission control);
+# starts that don't fit wait up to ADMISSION_QUEUE_TIMEOUT seconds in a queue
+CPU_CORE_BUDGET = float(os.getenv('CPU_CORE_BUDGET', str(os.cpu_count() or 1)))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '8'))
+ADMISSION_QUEUE_TIMEOUT = 30
+# Cores one 1080p libx264 encode is expected to use
+TRANSCODE_CORES_1080P = float(os.getenv('TRANSCODE_CORES_1080P', '1.0'))
+# Optional CPU set (e.g. "2-15") FFmpeg is pinned to, niceness and encoder threads
+FFMPEG_CPUS = parse_cpu_list(os.getenv('FFMPEG_CPUS', ''))
+FFMPEG_NICE = int(os.getenv('FFMPEG_NICE', '0'))
+FFMPEG_THREADS = int(os.getenv('FFMPEG_THREADS', '0'))
+# Streams slower than this while the host is oversubscribed are reported as degraded
+DEGRADED_SPEED = 0.95
+HLS_TIME = 2
+HLS_LIST_SIZE = 10
+LL_PART_TARGET = 0.5
+PLAYLIST_NAME = "playlist.m3u8"
+# Renditions for adaptive bitrate streams, highest first
+ABR_LADDER = [
+    {'name': '1080p', 'height': 1080, 'video_bitrate': '5000k', 'audio_bitrate': '128k'},
+    {'name': '720p', 'height': 720, 'video_bitrate': '2800k', 'audio_bitrate': '128k'},
+    {'name': '360p', 'height': 360, 'video_bitrate': '800k', 'audio_bitrate': '96k'}
+]
+SEGMENT_MIMETYPES = {
+    '.ts': 'video/mp2t',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4'
+}
+# Gzip playlists of at least PLAYLIST_GZIP_MIN_BYTES for clients that accept it
+PLAYLIST_GZIP = os.getenv('PLAYLIST_GZIP', '0') == '1'
+PLAYLIST_GZIP_MIN_BYTES = 512
+# Fixed DVR ranges (absolute start and end in the past) never change
+DVR_VOD_MAX_AGE = 3600
+SEGMENT_CACHE_BYTES = int(os.getenv('SEGMENT_CACHE_MB', '64')) * 1024 * 1024
+# Where FFmpeg output goes: "disk" (STREAM_DIR), "tmpfs" (TMPFS_DIR, RAM-backed)
+# or "memory" (uploaded over loopback HTTP and never written to a filesystem)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'disk')
+STORAGE_BACKENDS = ('disk', 'tmpfs', 'memory')
+TMPFS_DIR = os.getenv('TMPFS_DIR', '/dev/shm/livestream')
+TMPFS_MAX_BYTES = int(os.getenv('TMPFS_MAX_MB', '512')) * 1024 * 1024
+# New pipelines are refused when the tmpfs has less than this free
+TMPFS_MIN_FREE = 64 * 1024 * 1024
+MEMORY_STORE_BYTES = int(os.getenv('MEMORY_STORE_MB', '64')) * 1024 * 1024
+# FFmpeg writes a thumbnail every THUMBNAIL_INTERVAL seconds (0 disables them)
+THUMBNAIL_INTERVAL = float(os.getenv('THUMBNAIL_INTERVAL', '10'))
+THUMBNAIL_WIDTH = 320
+# Served thumbnails are re-checked on disk at most this often
+THUMBNAIL_TTL = 2
+# Archived segments of DVR streams, kept for DVR_WINDOW_HOURS
+DVR_DIR = os.getenv('DVR_DIR', 'dvr')
+DVR_WINDOW = float(os.getenv('DVR_WINDOW_HOURS', '24')) * 3600
+DVR_CHUNK_SECONDS = 600
+# e.g. "/hls-files/": segments are handed to a front proxy (nginx) with
+# X-Accel-Redirect instead of being sent through Python
+ACCEL_REDIRECT_PREFIX = os.getenv('ACCEL_REDIRECT_PREFIX')
+# Identifies this worker process as the owner of the streams it starts
+NODE_ID = os.getenv('NODE_ID') or f"{socket.gethostname()}:{os.getpid()}"
+STREAM_REGISTRY_URL = os.getenv('STREAM_REGISTRY', f"sqlite:///{os.path.join(STREAM_DIR, 'registry.db')}")
+REGISTRY_HEARTBEAT_INTERVAL = 5
+# Streams whose owner hasn't heartbeated for this long are not served
+REGISTRY_OWNER_TIMEOUT = 20
+REMOTE_VIEW_TTL = 2
+# Disk budgets for stream output in MB; 0 means unlimited
+STREAM_DISK_BUDGET = int(os.getenv('STREAM_DISK_BUDGET_MB', '0')) * 1024 * 1024
+TOTAL_DISK_BUDGET = int(os.getenv('TOTAL_DISK_BUDGET_MB', '0')) * 1024 * 1024
+if STORAGE_BACKEND == 'tmpfs':
+    TOTAL_DISK_BUDGET = min(TOTAL_DISK_BUDGET or TMPFS_MAX_BYTES, TMPFS_MAX_BYTES)
+JANITOR_INTERVAL = 10
+# Stream directories no live pipeline owns are purged after this long idle
+ORPHAN_GRACE = 60
+# Restart streams whose owning worker died instead of dropping them
+ADOPT_ORPHANED_STREAMS = os.getenv('ADOPT_ORPHANED_STREAMS', '1') == '1'
+# Clients that fetched a playlist this recently count as viewers
+VIEWER_WINDOW = 30
+OVERLAY_PAGE_SIZE = 100
+OVERLAY_MAX_PAGE_SIZE = 500
+OVERLAY_BULK_MAX = 500
+OVERLAY_EVENT_KEEPALIVE = 15
+OVERLAY_UPDATE_FIELDS = ['name', 'type', 'content', 'position', 'size', 'style', 'visible', 'z_index', 'stream_id']
+# Fields the player renders; list endpoints return only these
+OVERLAY_FIELDS = ['name', 'type', 'content', 'position', 'size', 'style', 'visible', 'z_index', 'stream_id']
 active_streams = {}  
+# Streams asking for the same source and profile share one FFmpeg pipeline
+ingest_registry = IngestRegistry()
+# Restarts failed FFmpeg pipelines and scores their health
+stream_supervisor = StreamSupervisor()
+# One thread drains the stdout/stderr pipes of every FFmpeg process
+ffmpeg_reader = FFmpegPipeReader()
+# Admits new pipelines against the CPU budget
+cpu_scheduler = CpuScheduler(
+    CPU_CORE_BUDGET, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT, FFMPEG_CPUS,
+    external=lambda: remote_cpu_reserved()
+)
+
+# Exposed at /metrics; request threads only append to lock-free buffers
+metrics = MetricsRegistry(prefix='livestream_')
+request_latency = metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint and status', ['endpoint', 'status'])
+bytes_served = metrics.counter('stream_bytes_served_total', 'Playlist and segment bytes sent by the app', ['stream', 'kind'])
+segments_offloaded = metrics.counter('stream_segments_offloaded_total', 'Segments handed to the front proxy with X-Accel-Redirect', ['stream'])
+mongo_latency = metrics.histogram('mongo_command_duration_seconds', 'MongoDB command latency', ['command'])
+mongo_failures = metrics.counter('mongo_command_failures_total', 'Failed MongoDB commands', ['command'])
+viewers = ViewerTracker(VIEWER_WINDOW)
 
 MONGO_URI = os.getenv('MONGO_URI')
 MONGO_DB = os.getenv('MONGO_DB')  
+# Connections per worker process; requests beyond it wait for a free one
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+# Upper bound for server selection and each MongoDB operation
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', '5000'))
 
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DB]
-overlays_collection = db.overlays
+# Connects on first use; a mongomock:// URI runs against an in-memory stand-in
+db = Database(
+    MONGO_URI, MONGO_DB,
+    event_listeners=[MongoCommandTimer(mongo_latency, mongo_failures)],
+    max_pool_size=MONGO_MAX_POOL_SIZE, timeout_ms=MONGO_TIMEOUT_MS
+)
+overlays_collection = db['overlays']
+# Pushes overlay changes to subscribed clients over server-sent events
+overlay_events = OverlayEventHub(lambda payload: app.json.dumps(payload))
+# Serialized overlay list responses, dropped whenever the collection changes
+overlay_cache = OverlayCache(overlays_collection, on_change=lambda change: publish_overlay_change(change))
 
+if STORAGE_BACKEND not in STORAGE_BACKENDS:
+    raise ValueError(f"STORAGE_BACKEND must be one of: {', '.join(STORAGE_BACKENDS)}")
+# Stream output directories live here; the registry database stays in STREAM_DIR
+STREAM_ROOT = TMPFS_DIR if STORAGE_BACKEND == 'tmpfs' else STREAM_DIR
 os.makedirs(STREAM_DIR, exist_ok=True)
+os.makedirs(STREAM_ROOT, exist_ok=True)
+os.makedirs(DVR_DIR, exist_ok=True)
+# Receives FFmpeg's uploads for the memory backend
+upload_server = UploadServer()
+# Each playlist version is compressed once, whoever asks for it
+playlist_gzip = GzipCache()
+
+# Shared record of every stream, so any worker can serve any stream's output
+stream_registry = open_stream_registry(STREAM_REGISTRY_URL, db)
+# Read-only views of streams owned by other workers, with their expiry
+remote_views = {}
+registry_heartbeat_thread = None
+# Set by overlay writes; a background thread applies them to burn-in pipelines
+burn_in_sync_pending = threading.Event()
+burn_in_sync_thread = None
+# Reaps stale segments, enforces disk budgets and purges orphaned stream directories
+stream_janitor = StreamJanitor(
+    [STREAM_ROOT, DVR_DIR],
+    live_pipelines=lambda: live_pipelines(),
+    managers=lambda: set(active_streams.values()),
+    reconcile=lambda startup: reconcile_streams(startup),
+    interval=JANITOR_INTERVAL,
+    orphan_grace=ORPHAN_GRACE,
+    stream_budget=STREAM_DISK_BUDGET,
+    total_budget=TOTAL_DISK_BUDGET
+)
+
+def open_storage(pipeline_id, output_dir):
+    """Return the STORAGE_BACKEND storage for one pipeline's FFmpeg output"""
+    if STORAGE_BACKEND == 'memory':
+        return MemoryStorage(upload_server, pipeline_id, MEMORY_STORE_BYTES)
+    return DiskStorage(output_dir, kind=STORAGE_BACKEND)
+
+def storage_full():
+    """Return True if the tmpfs has no room for another pipeline"""
+    if STORAGE_BACKEND != 'tmpfs':
+        return False
+    try:
+        free = shutil.disk_usage(STREAM_ROOT).free
+    except OSError:
+        return False
+    return free < TMPFS_MIN_FREE or stream_janitor.stats()['tracked_bytes'] >= TMPFS_MAX_BYTES
 
 class StreamManager:
-    def __init__(self, stream_id, rtsp_url):
+    def __init__(self, stream_id, rtsp_url, low_latency=False, ingest_mode='auto', ladder=None, burn_overlays=False):
         self.stream_id = stream_id
         self.rtsp_url = rtsp_url
+        self.ingest_key = None
+        self.low_latency = low_latency
+        self.ladder = ladder
+        self.burn_overlays = burn_overlays
+        self.burn_suspended = False
+        self.over_budget_since = None
+        self.overlays = []
+        self.overlay_scope = None
+        self.requested_ingest_mode = ingest_mode
+        self.ingest_mode = None
+        self.source = None
         self.process = None
-        self.output_dir = os.path.join(STREAM_DIR, stream_id)
-        self.playlist_file = os.path.join(self.output_dir, "playlist.m3u8")
+        # CPUs FFmpeg is pinned to, from the scheduler
+        self.cpus = None
+        self.output_dir = os.path.join(STREAM_ROOT, stream_id)
+        # FFmpeg output location, and where published files are read back from
+        self.storage = open_storage(stream_id, self.output_dir)
+        self.playlist_name = PLAYLIST_NAME
+        self.overlay_dir = os.path.join(self.output_dir, "overlays")
+        # Thumbnails always go to output_dir, whatever the storage backend
+        self.thumbnail_file = os.path.join(self.output_dir, THUMBNAIL_NAME)
+        self.thumbnails = ThumbnailCache(self.thumbnail_file, THUMBNAIL_TTL)
+        # Playlists and LL-HLS segments served from memory are mirrored here
+        # for workers that don't own the stream
+        self.served_dir = os.path.join(self.output_dir, SERVED_DIR)
+        self.mirrored_segments = deque()
+        # Segment files written so far, for the janitor to reap
+        self.ledger = SegmentLedger(self.output_dir)
         self.is_running = False
         
+        # With a ladder, playlist.m3u8 is FFmpeg's master playlist and each
+        # rendition gets its own <name>.m3u8 media playlist
+        self.renditions = []
+        self.variant_playlists = set()
+        self.primary_playlist = PLAYLIST_NAME
+        
+        # Keep a couple of segments past the playlist window for players
+        # that fetched the previous playlist
+        cache_entries = HLS_LIST_SIZE + 2
+        self.ll_playlist = None
+        self.init_segment = None
+        if low_latency:
+            # FFmpeg writes short chunks to its own playlist and the served
+            # LL-HLS playlist is generated from it in memory
+            parts_per_segment = max(1, round(HLS_TIME / LL_PART_TARGET))
+            self.ll_playlist = LowLatencyPlaylist(LL_PART_TARGET, parts_per_segment, HLS_LIST_SIZE)
+            self.playlist_name = "parts.m3u8"
+            cache_entries *= parts_per_segment + 1
+        if ladder:
+            cache_entries *= len(ladder)
+        self.cache = SegmentCache(cache_entries, SEGMENT_CACHE_BYTES)
+        
+        # Append-only archive of the primary playlist's segments, once DVR is enabled
+        self.dvr = None
+        self.dvr_msn = None
+        self.dvr_discontinuity = False
+        self.state_lock = threading.Lock()
+        self.process_lock = threading.Lock()
+        # Blocking playlist reloads park on this until the next publish
+        self.playlist_updated = threading.Condition(self.state_lock)
+        self.stopped = False
+        
+        # Readiness state kept in memory so handlers never stat the disk
+        self.playlist_ready = False
+        self.playlists = {}
+        self.segment_names = set()
+        self.segments = []
+        self.media_sequence = None
+        self.target_duration = None
+        self.last_update = None
+        self.segments_published = 0
+        
+        # Filled in by the FFmpeg monitors and the supervisor
+        self.started_at = None
+        self.restart_count = 0
+        self.last_exit_code = None
+        self.cpu_percent = None
+        self.progress = {}
+        self.logs = deque(maxlen=FFMPEG_LOG_LINES)
+        self.health = {'state': 'starting', 'score': None}
+        
+    def resolve_profile(self):
+        """Probe the source and settle on copy or transcode and the renditions to encode"""
+        if self.ingest_mode is not None:
+            return
+        self.ingest_mode = self._resolve_ingest_mode()
+        if self.ladder:
+            self._select_renditions()
+    
     def start_stream(self):
         """Start FFmpeg process to convert RTSP to HLS"""
-        os.makedirs(self.output_dir, exist_ok=True)
-       
-       
-        cmd = [
-            FFMPEG_PATH,
-            "-i", self.rtsp_url,
-            "-c:v", "libx264",         
-            "-c:a", "aac",             
-            "-preset", "ultrafast",    
-            "-tune", "zerolatency",    
-            "-f", "hls",               
-            "-hls_time", "2",          
-            "-hls_list_size", "10",    
-            "-hls_flags", "delete_segments+append_list",
-            "-hls_segment_filename", os.path.join(self.output_dir, "segment%03d.ts"),
-            self.playlist_file,
-            "-y"  
-        ]
+        os.makedirs(self.served_dir, exist_ok=True)
+        self.storage.start(self._on_file_event)
+        self.resolve_profile()
+        
+        print(f"Output directory: {self.output_dir} ({self.storage.kind})")
+        print(f"Playlist file: {self.storage.target(self.playlist_name)}")
+        if not self._spawn():
+            self.storage.stop()
+            return False
         
+        stream_supervisor.register(self)
+        print(f"Started stream {self.stream_id} for URL: {self.rtsp_url}")
+        return True
+    
+    def _spawn(self):
+        """Launch FFmpeg and its output monitors"""
+        # Admission used an estimate; the probed profile (or suspended
+        # burn-in) gives the real cost
+        self.cpus = cpu_scheduler.update(self.stream_id, self.cpu_cost())
         try:
-            print(f"Starting FFmpeg with command: {' '.join(cmd)}")
-            print(f"Output directory: {self.output_dir}")
-            print(f"Playlist file: {self.playlist_file}")
+            cmd = self._build_command()
+        except Exception as e:
+            print(f"Error building FFmpeg command for {self.stream_id}: {e}")
+            return False
+        
+        with self.process_lock:
+            if self.stopped:
+                # stop_stream may have released the reservation before the
+                # update above put it back
+                cpu_scheduler.release(self.stream_id)
+                return False
+            try:
+                print(f"Starting FFmpeg with command: {' '.join(cmd)}")
+                
+                self.process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    preexec_fn=self._prepare_process if os.name != 'nt' else None
+                )
+            except Exception as e:
+                print(f"Error starting stream: {e}")
+                return False
             
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                preexec_fn=os.setsid if os.name != 'nt' else None
-            )
             self.is_running = True
-            
-            # Start a thread to monitor FFmpeg output
-            threading.Thread(target=self._monitor_ffmpeg, daemon=True).start()
-            
-            print(f"Started stream {self.stream_id} for URL: {self.rtsp_url}")
-            return True
+            self.started_at = time.time()
+            self.progress = {}
+        
+        # Logs and -progress stats are drained by the shared pipe reader
+        ffmpeg_reader.register(self.process, self._on_progress, self.logs)
+        return True
+    
+    def _prepare_process(self):
+        # Runs in the forked child before exec
+        os.setsid()
+        if FFMPEG_NICE:
+            os.nice(FFMPEG_NICE)
+        if self.cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.cpus)
+    
+    def cpu_cost(self):
+        """Cores this pipeline is expected to use; until the source is probed, assume the costlier profile"""
+        ingest_mode = self.ingest_mode
+        if ingest_mode is None:
+            copy = self.requested_ingest_mode == 'copy' and not (self.low_latency or self.ladder or self.burn_overlays)
+            ingest_mode = 'copy' if copy else 'transcode'
+        heights = [r['height'] for r in self.renditions or self.ladder or []]
+        source_height = self.source['height'] if self.source else None
+        return pipeline_cost(ingest_mode, heights, source_height, self.burn_in_active(), TRANSCODE_CORES_1080P)
+    
+    def _thread_args(self):
+        """Encoder threads: one per pinned CPU, else FFMPEG_THREADS (FFmpeg picks when unset)"""
+        threads = len(self.cpus) if self.cpus else FFMPEG_THREADS
+        return ["-threads", str(threads)] if threads else []
+    
+    def restart(self):
+        """Kill FFmpeg (if still alive) and start it again with the same settings"""
+        with self.process_lock:
+            if self.stopped:
+                return False
+            self._terminate()
+        
+        if self.ll_playlist:
+            # A new FFmpeg numbers its parts from zero again
+            self.ll_playlist = LowLatencyPlaylist(self.ll_playlist.part_target, self.ll_playlist.parts_per_segment, HLS_LIST_SIZE)
+            self.init_segment = None
+        
+        self.restart_count += 1
+        self.dvr_discontinuity = True
+        print(f"Restarting stream {self.stream_id} (restart #{self.restart_count})")
+        return self._spawn()
+    
+    def enable_dvr(self):
+        """Start archiving this pipeline's segments for time-shifted playback"""
+        with self.state_lock:
+            if self.dvr is None:
+                self.dvr = DvrArchive(
+                    os.path.join(DVR_DIR, self.stream_id), DVR_WINDOW, DVR_CHUNK_SECONDS,
+                    extension='.m4s' if self.ll_playlist else '.ts'
+                )
+        return self.dvr
+    
+    def _resolve_ingest_mode(self):
+        """Decide between stream copy and transcoding for this source"""
+        if self.low_latency:
+            # Parts need a keyframe on every boundary, which only an encoder gives
+            return 'transcode'
+        
+        self.source = probe_source(self.rtsp_url, FFPROBE_PATH)
+        if self.ladder or self.burn_overlays:
+            # Scaling and burn-in both need decoded frames
+            return 'transcode'
+        if self.requested_ingest_mode != 'auto':
+            return self.requested_ingest_mode
+        return 'copy' if can_copy_video(self.source) else 'transcode'
+    
+    def _select_renditions(self):
+        """Drop renditions taller than the source; always keep the smallest"""
+        source_height = self.source['height'] if self.source else None
+        renditions = [r for r in self.ladder if not source_height or r['height'] <= source_height]
+        self.renditions = renditions or self.ladder[-1:]
+        self.variant_playlists = {f"{r['name']}.m3u8" for r in self.renditions}
+        self.primary_playlist = f"{self.renditions[0]['name']}.m3u8"
+    
+    def _ladder_args(self, overlay_graph=None, video_label='0:v'):
+        """Decode once, split the video and encode one output per rendition"""
+        count = len(self.renditions)
+        # var_stream_map can't name an audio stream that may not exist, so
+        # a source ffprobe couldn't read is encoded video-only
+        has_audio = self.source is not None and self.source['audio'] is not None
+        if self.source is None:
+            print(f"Stream {self.stream_id}: source not probed, encoding the ladder without audio")
+        
+        # Overlays are burned in once, before the split
+        graph = [overlay_graph] if overlay_graph else []
+        graph += [f"[{video_label}]split={count}" + ''.join(f"[v{i}]" for i in range(count))]
+        graph += [f"[v{i}]scale=-2:{r['height']}[v{i}out]" for i, r in enumerate(self.renditions)]
+        args = ["-filter_complex", ';'.join(graph)]
+        
+        stream_map = []
+        for i, rendition in enumerate(self.renditions):
+            args += ["-map", f"[v{i}out]", f"-b:v:{i}", rendition['video_bitrate']]
+            entry = f"v:{i}"
+            if has_audio:
+                args += ["-map", "0:a:0", f"-b:a:{i}", rendition['audio_bitrate']]
+                entry += f",a:{i}"
+            stream_map.append(f"{entry},name:{rendition['name']}")
+        
+        args += [
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+            *self._thread_args(),
+            # Same keyframe cadence in every rendition keeps segments aligned
+            # so players can switch on any boundary
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_TIME})",
+            "-c:a", "aac",
+            "-f", "hls",
+            "-hls_time", str(HLS_TIME),
+            "-hls_list_size", str(HLS_LIST_SIZE),
+            # Numbered from the epoch, so no segment URL is reused after a restart
+            "-hls_start_number_source", "epoch_us",
+            "-hls_flags", "delete_segments+independent_segments",
+            "-master_pl_name", PLAYLIST_NAME,
+            "-var_stream_map", ' '.join(stream_map),
+            *self.storage.output_args,
+            "-hls_segment_filename", self.storage.target("%v_segment%03d.ts"),
+            self.storage.target("%v.m3u8")
+        ]
+        return args
+    
+    def _codec_args(self):
+        if self.ingest_mode == 'copy':
+            args = ["-c:v", "copy"]
+        else:
+            args = ["-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency"] + self._thread_args()
+        
+        # Audio is cheap to encode, so only copy it when it is already HLS-safe
+        if self.ingest_mode == 'copy' and (self.source is None or self.source['audio'] is None or can_copy_audio(self.source)):
+            args += ["-c:a", "copy"]
+        else:
+            args += ["-c:a", "aac"]
+        return args
+    
+    def _input_args(self):
+        # Machine-readable encoder stats go to stdout for the supervisor
+        args = [FFMPEG_PATH, "-nostats", "-progress", "pipe:1"]
+        if self.ingest_mode == 'copy' and self._thumbnail_args():
+            # Nothing else decodes the video, so the thumbnail output only
+            # decodes keyframes
+            args += ["-skip_frame", "nokey"]
+        return args + ["-i", self.rtsp_url]
+    
+    def _thumbnail_args(self):
+        """Second output: a small JPEG of the source video every THUMBNAIL_INTERVAL seconds"""
+        if not THUMBNAIL_INTERVAL or (self.source is not None and self.source['video'] is None):
+            return []
+        return [
+            "-map", "0:v:0",
+            "-vf", f"fps=1/{THUMBNAIL_INTERVAL:g},scale={THUMBNAIL_WIDTH}:-2",
+            "-c:v", "mjpeg", "-q:v", "5",
+            "-f", "image2", "-update", "1", "-atomic_writing", "1",
+            self.thumbnail_file
+        ]
+    
+    def burn_in_active(self):
+        return self.burn_overlays and not self.burn_suspended
+    
+    def _overlay_filter(self):
+        """Return overlay image inputs, the burn-in filter chain and its output label"""
+        if not self.burn_in_active():
+            return [], None, '0:v'
+        write_overlay_texts(self.overlay_dir, self.overlays)
+        return build_overlay_filter(self.overlays, self.overlay_dir, OVERLAY_ASSET_DIR)
+    
+    def _build_command(self):
+        """Build the FFmpeg command line for this stream's output mode"""
+        overlay_inputs, overlay_graph, video_label = self._overlay_filter()
+        cmd = self._input_args() + overlay_inputs
+        
+        if self.renditions:
+            return cmd + self._ladder_args(overlay_graph, video_label) + self._thumbnail_args() + ["-y"]
+        
+        if overlay_graph:
+            cmd += ["-filter_complex", overlay_graph, "-map", f"[{video_label}]", "-map", "0:a?"]
+        cmd += self._codec_args()
+        
+        if self.low_latency:
+            part_target = self.ll_playlist.part_target
+            parts_window = (HLS_LIST_SIZE + 1) * self.ll_playlist.parts_per_segment
+            return cmd + [
+                # A keyframe on every part boundary makes each part independent
+                "-force_key_frames", f"expr:gte(t,n_forced*{part_target})",
+                "-f", "hls",
+                "-hls_time", str(part_target),
+                "-hls_list_size", str(parts_window),
+                "-hls_start_number_source", "epoch_us",
+                "-hls_segment_type", "fmp4",
+                "-hls_fmp4_init_filename", self.ll_playlist.init_uri,
+                "-hls_flags", "delete_segments+independent_segments",
+                *self.storage.output_args,
+                "-hls_segment_filename", self.storage.target(self.ll_playlist.part_template),
+                self.storage.target(self.playlist_name)
+            ] + self._thumbnail_args() + ["-y"]
+        
+        # With stream copy, segments can only be cut on the source's keyframes
+        return cmd + [
+            "-f", "hls",
+            "-hls_time", str(HLS_TIME),
+            "-hls_list_size", str(HLS_LIST_SIZE),
+            "-hls_start_number_source", "epoch_us",
+            "-hls_flags", "delete_segments+append_list",
+            *self.storage.output_args,
+            "-hls_segment_filename", self.storage.target("segment%03d.ts"),
+            self.storage.target(self.playlist_name)
+        ] + self._thumbnail_args() + ["-y"]
+    
+    def update_overlays(self, overlays):
+        """Apply a new overlay set to the burned-in video
+
+        Text edits are written to the files drawtext reloads every frame, so
+        they show up live. Anything that changes the filter graph (position,
+        size, style, images, adding or removing overlays) restarts FFmpeg
+        with the new graph.
+        """
+        overlays = [overlay for overlay in overlays if overlay.get('type') in ('text', 'image', 'logo')]
+        layout_changed = overlay_layout(overlays) != overlay_layout(self.overlays)
+        previous, self.overlays = self.overlays, overlays
+        
+        if not self.burn_in_active() or self.stopped:
+            return None
+        if not layout_changed:
+            write_overlay_texts(self.overlay_dir, overlays)
+            return 'live'
+        try:
+            # Build the new graph before stopping FFmpeg, so a bad overlay
+            # leaves the stream running with the old one
+            self._build_command()
         except Exception as e:
-            print(f"Error starting stream: {e}")
-            return False
+            print(f"Keeping the current overlays on stream {self.stream_id}: {e}")
+            self.overlays = previous
+            return 'rejected'
+        self.restart()
+        return 'restart'
     
-    def _monitor_ffmpeg(self):
-        """Monitor FFmpeg process and log output"""
-        if self.process:
-            while self.is_running and self.process.poll() is None:
-                # Read stderr line by line
-                stderr_line = self.process.stderr.readline()
-                if stderr_line:
-                    print(f"FFmpeg [{self.stream_id}]: {stderr_line.decode().strip()}")
-                time.sleep(0.1)
-            
-            # Get final output
-            stdout, stderr = self.process.communicate()
-            if stderr:
-                print(f"FFmpeg final stderr [{self.stream_id}]: {stderr.decode()}")
-            if stdout:
-                print(f"FFmpeg final stdout [{self.stream_id}]: {stdout.decode()}")
+    def check_cpu_budget(self, now):
+        """Suspend burn-in if it keeps this pipeline over its CPU budget"""
+        if not self.burn_in_active() or self.cpu_percent is None:
+            return
+        if self.cpu_percent <= BURN_IN_CPU_BUDGET:
+            self.over_budget_since = None
+            return
+        if self.over_budget_since is None:
+            self.over_budget_since = now
+        elif now - self.over_budget_since > BURN_IN_OVER_BUDGET_SECONDS:
+            print(f"Stream {self.stream_id} over CPU budget ({self.cpu_percent:.0f}% > {BURN_IN_CPU_BUDGET:.0f}%); suspending overlay burn-in")
+            self.burn_suspended = True
+            self.over_budget_since = None
+            self.restart()
     
-    def stop_stream(self):
-        """Stop FFmpeg process and cleanup"""
-        if self.process and self.is_running:
+    def _on_progress(self, progress):
+        self.progress = progress
+    
+    def _terminate(self):
+        # Caller holds process_lock
+        if self.process and self.process.poll() is None:
             try:
                 if os.name != 'nt':
                     os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
@@ -114,14 +636,332 @@ class StreamManager:
                     os.killpg(os.getpgid(self.process.pid), signal.SIGKILL)
                 else:
                     self.process.kill()
+        if self.process:
+            self.last_exit_code = self.process.poll()
+        self.is_running = False
+    
+    def stop_stream(self):
+        """Stop FFmpeg process and cleanup"""
+        stream_supervisor.unregister(self)
+        with self.process_lock:
+            self.stopped = True
+            if self.process:
+                self._terminate()
+                print(f"Stopped stream {self.stream_id}")
+        cpu_scheduler.release(self.stream_id)
+        self.storage.stop()
+        with self.playlist_updated:
+            self.playlist_updated.notify_all()
+    
+    def _on_file_event(self, filename, closed):
+        """Publish files as the storage backend sees FFmpeg write them"""
+        if filename.endswith(('.ts', '.m4s')):
+            self.ledger.record(filename)
+        
+        if filename == self.playlist_name:
+            if self.renditions:
+                self._publish_master_playlist()
+            else:
+                self._publish_playlist()
+        elif filename in self.variant_playlists:
+            self._publish_media_playlist(filename, filename)
+        elif self.ll_playlist and filename == self.ll_playlist.init_uri:
+            self._load_init_segment()
+        elif closed and filename.endswith(('.ts', '.m4s')):
+            # FFmpeg closed the segment, so it is complete; cache it before
+            # the playlist that announces it lands
+            self._load_segment(filename)
+    
+    def _read_playlist_file(self, source):
+        data = self.storage.read(source)
+        if data is None:
+            return None, None
+        
+        playlist = parse_playlist(data.decode('utf-8', 'replace'))
+        
+        # Anything listed in the playlist is a finished segment
+        for segment in playlist['segments']:
+            if segment['uri'] not in self.cache:
+                self._load_segment(segment['uri'])
+        return data, playlist
+    
+    def _publish_playlist(self):
+        if self.ll_playlist:
+            data, playlist = self._read_playlist_file(self.playlist_name)
+            if playlist is not None:
+                self._publish_ll_playlist(playlist)
+            return
+        self._publish_media_playlist(PLAYLIST_NAME, self.playlist_name)
+    
+    def _publish_media_playlist(self, name, source):
+        data, playlist = self._read_playlist_file(source)
+        if playlist is None:
+            return
+        
+        # Tell players they can use _HLS_msn blocking reloads
+        data = data.replace(b'#EXTM3U\n', b'#EXTM3U\n#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES\n', 1)
+        names = [segment['uri'] for segment in playlist['segments']]
+        
+        with self.playlist_updated:
+            self.cache.set_playlist(name, data)
+            self._set_playlist_state(name, names, playlist['media_sequence'], playlist['target_duration'])
+            if not self.renditions:
+                self.playlist_ready = True
+            self.playlist_updated.notify_all()
+        self._mirror(name, data)
+        if self.dvr and name == self.primary_playlist:
+            self._archive_playlist(playlist)
+    
+    def _publish_master_playlist(self):
+        data = self.storage.read(self.playlist_name)
+        if data is None:
+            return
+        
+        with self.playlist_updated:
+            self.cache.set_playlist(PLAYLIST_NAME, data)
+            self.playlist_ready = True
+            self.playlist_updated.notify_all()
+        self._mirror(PLAYLIST_NAME, data)
+    
+    def _publish_ll_playlist(self, playlist):
+        if self.init_segment is None:
+            self._load_init_segment()
+        
+        completed = []
+        archived = []
+        with self.playlist_updated:
+            # Full segments are the concatenation of their parts' fMP4 fragments
+            for msn, uri, part_uris in self.ll_playlist.update(playlist):
+                parts = [self.cache.peek(part_uri) for part_uri in part_uris]
+                if all(part is not None for part in parts):
+                    completed.append((uri, b''.join(parts)))
+                    self.cache.put(uri, completed[-1][1])
+                    archived.append((msn, uri, self.ll_playlist.durations[msn]))
             
-            self.is_running = False
-            print(f"Stopped stream {self.stream_id}")
+            rendered = self.ll_playlist.render()
+            self.cache.set_playlist(PLAYLIST_NAME, rendered)
+            self._set_playlist_state(
+                PLAYLIST_NAME,
+                self.ll_playlist.segment_uris(),
+                self.ll_playlist.media_sequence,
+                self.ll_playlist.target_duration,
+                parts=self.ll_playlist.part_uris()
+            )
+            self.playlist_ready = self.ll_playlist.last_msn is not None
+            self.playlist_updated.notify_all()
+        
+        # Full segments exist only in memory; mirror them before the playlist that lists them
+        for uri, data in completed:
+            self._mirror(uri, data)
+            self.mirrored_segments.append(uri)
+        while len(self.mirrored_segments) > HLS_LIST_SIZE + 2:
+            try:
+                os.remove(os.path.join(self.served_dir, self.mirrored_segments.popleft()))
+            except OSError:
+                pass
+        self._mirror(PLAYLIST_NAME, rendered)
+        if self.dvr and archived:
+            self._archive(archived)
+    
+    def _archive_playlist(self, playlist):
+        """Archive the segments of a media playlist that haven't been archived yet"""
+        segments = playlist['segments']
+        first = playlist['media_sequence']
+        if self.dvr_msn is not None and first + len(segments) - 1 < self.dvr_msn:
+            # FFmpeg started numbering from zero again
+            self.dvr_msn = None
+            self.dvr_discontinuity = True
+        
+        default_duration = playlist['target_duration'] or HLS_TIME
+        self._archive([
+            (first + index, segment['uri'], segment['duration'] or default_duration)
+            for index, segment in enumerate(segments)
+            if self.dvr_msn is None or first + index > self.dvr_msn
+        ])
+    
+    def _archive(self, segments):
+        """Append ``(msn, uri, duration)`` segments, oldest first, to the DVR archive"""
+        # The newest segment just finished; earlier ones ended a duration apart
+        ends = []
+        end = time.time()
+        for _, _, duration in reversed(segments):
+            ends.append(end)
+            end -= duration
+        
+        for (msn, uri, duration), ended in zip(segments, reversed(ends)):
+            self.dvr_msn = msn
+            data = self.cache.peek(uri) or self.storage.read(uri)
+            if data is None:
+                self.dvr_discontinuity = True
+                continue
+            try:
+                self.dvr.append(
+                    data, duration, ended,
+                    discontinuity=self.dvr_discontinuity,
+                    init_segment=self.init_segment if self.ll_playlist else None
+                )
+            except OSError as e:
+                print(f"Error archiving {uri} for stream {self.stream_id}: {e}")
+                self.dvr_discontinuity = True
+                continue
+            self.dvr_discontinuity = False
+    
+    def _mirror(self, name, data):
+        """Write served bytes to the served/ directory for workers that don't own the stream"""
+        path = os.path.join(self.served_dir, name)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            # Readers in other processes see the old or new file, never a partial one
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Error mirroring {name} for stream {self.stream_id}: {e}")
+    
+    def _set_playlist_state(self, name, segments, media_sequence, target_duration, parts=()):
+        # Caller holds state_lock
+        self.playlists[name] = {
+            'segments': segments,
+            'parts': list(parts),
+            'media_sequence': media_sequence,
+            'target_duration': target_duration
+        }
+        self.segment_names = set().union(*(p['segments'] + p['parts'] for p in self.playlists.values()))
+        if name == self.primary_playlist:
+            if media_sequence is not None and self.media_sequence is not None:
+                last_before = self.media_sequence + len(self.segments)
+                # After a restart the sequence jumps ahead to the new epoch number
+                self.segments_published += min(len(segments), max(0, media_sequence + len(segments) - last_before))
+            self.segments = segments
+            self.media_sequence = media_sequence
+            self.target_duration = target_duration
+            self.last_update = time.time()
+    
+    def _load_init_segment(self):
+        data = self.storage.read(self.ll_playlist.init_uri)
+        if data is not None:
+            self.init_segment = data
+    
+    def is_media_playlist(self, name):
+        """Return True if ``name`` is a playlist that lists segments (not a master)"""
+        if name == PLAYLIST_NAME:
+            return not self.renditions
+        return name in self.variant_playlists
+    
+    def target_duration_of(self, name):
+        state = self.playlists.get(name)
+        return state['target_duration'] if state else None
+    
+    def last_msn(self, name=PLAYLIST_NAME):
+        """Return the media sequence number of the newest segment in playlist ``name``"""
+        if self.ll_playlist:
+            return self.ll_playlist.last_msn
+        state = self.playlists.get(name)
+        if not state or state['media_sequence'] is None or not state['segments']:
+            return None
+        return state['media_sequence'] + len(state['segments']) - 1
+    
+    def wait_for_msn(self, msn, part=None, timeout=None, name=PLAYLIST_NAME):
+        """Block until segment ``msn`` is published, the stream stops or ``timeout`` passes"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.playlist_updated:
+            while not self._has_msn(msn, part, name):
+                if self.stopped:
+                    return False
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.playlist_updated.wait(remaining)
+            return True
+    
+    def _has_msn(self, msn, part, name):
+        if self.ll_playlist:
+            return self.ll_playlist.has(msn, part)
+        # Without partial segments a requested part is only available once
+        # its whole segment is
+        last_msn = self.last_msn(name)
+        return last_msn is not None and last_msn >= msn
+    
+    def read_playlist(self, name=PLAYLIST_NAME):
+        """Return current playlist bytes, or None if it is not ready yet"""
+        if name == PLAYLIST_NAME and not self.playlist_ready:
+            return None
+        return self.cache.get_playlist(name)
+    
+    def latest_segment(self):
+        """Return the newest published segment name"""
+        with self.state_lock:
+            return self.segments[-1] if self.segments else None
+    
+    def read_segment(self, filename):
+        """Return segment bytes from memory, falling back to disk on a miss"""
+        if self.ll_playlist:
+            if filename == self.ll_playlist.init_uri:
+                return self.init_segment
+            # LL-HLS players request the hinted next part before it exists
+            if filename == self.ll_playlist.preload_hint():
+                self._wait_for_segment(filename, 3 * self.ll_playlist.part_target)
+        
+        data = self.cache.get(filename)
+        if data is not None:
+            return data
+        
+        # Only published segments are served; an evicted one is re-read once
+        if filename in self.segment_names:
+            return self._load_segment(filename)
+        return None
+    
+    def segment_file(self, filename):
+        """Return the path of a published segment relative to STREAM_ROOT, for proxy offload"""
+        if not self.storage.offload:
+            return None
+        if self.ll_playlist:
+            if filename == self.ll_playlist.init_uri:
+                return f"{self.stream_id}/{filename}"
+            if filename == self.ll_playlist.preload_hint():
+                self._wait_for_segment(filename, 3 * self.ll_playlist.part_target)
+            if filename in self.ll_playlist.segment_uris():
+                # FFmpeg only writes parts; full segments are assembled in
+                # memory and mirrored to served/. One not mirrored yet is
+                # sent from the cache instead.
+                if filename in self.mirrored_segments:
+                    return f"{self.stream_id}/{SERVED_DIR}/{filename}"
+                return None
+        
+        if filename in self.segment_names:
+            return f"{self.stream_id}/{filename}"
+        return None
+    
+    def _wait_for_segment(self, filename, timeout):
+        deadline = time.monotonic() + timeout
+        with self.playlist_updated:
+            while filename not in self.segment_names and not self.stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self.playlist_updated.wait(remaining)
+    
+    def _load_segment(self, filename):
+        data = self.storage.read(filename)
+        if data is None:
+            return None
+        self.cache.put(filename, data)
+        return data
+    
+    def reap_segments(self, retain=0):
+        """Delete segment files that have left every playlist; return ``(files, bytes)`` removed"""
+        with self.state_lock:
+            published = self.segment_names
+        if not published:
+            return 0, 0
+        return self.ledger.reap(published, retain)
     
     def cleanup_files(self):
         """Remove stream files"""
+        self.cache.clear()
+        self.playlist_ready = False
+        if self.dvr:
+            self.dvr.delete()
         try:
-            import shutil
             if os.path.exists(self.output_dir):
                 shutil.rmtree(self.output_dir)
         except Exception as e:
@@ -134,31 +974,497 @@ def serialize_overlay(overlay):
         return overlay
     return None
 
-def validate_overlay_data(data):
-    """Validate overlay data structure"""
+def is_number(value):
+    """True for a finite int or float (JSON null, NaN and booleans are not numbers)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def validate_overlay_data(data, partial=False, stored=None):
+    """Validate overlay data structure; ``partial`` checks only the fields present, for updates
+
+    ``stored`` is the overlay a partial update changes; fields that depend
+    on each other are checked against it merged with the update.
+    """
     required_fields = ['name', 'type', 'content', 'position', 'size']
     
     # Check required fields
+    if not partial:
+        for field in required_fields:
+            if field not in data:
+                return False, f"Missing required field: {field}"
+    elif not any(field in data for field in OVERLAY_UPDATE_FIELDS):
+        return False, f"No updatable fields given; expected any of: {', '.join(OVERLAY_UPDATE_FIELDS)}"
+    
+    # Required fields can't be cleared
     for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
+        if field in data and data[field] is None:
+            return False, f"{field} can't be null"
     
     # Validate overlay type
-    if data['type'] not in ['text', 'logo', 'image']:
+    if 'type' in data and data['type'] not in ['text', 'logo', 'image']:
         return False, "Invalid overlay type. Must be 'text', 'logo', or 'image'"
     
     # Validate position structure
-    position = data['position']
-    if not isinstance(position, dict) or 'x' not in position or 'y' not in position:
-        return False, "Position must be an object with 'x' and 'y' coordinates"
+    if 'position' in data:
+        position = data['position']
+        if not isinstance(position, dict) or not all(is_number(position.get(axis)) for axis in ('x', 'y')):
+            return False, "Position must be an object with numeric 'x' and 'y' coordinates"
     
     # Validate size structure
-    size = data['size']
-    if not isinstance(size, dict) or 'width' not in size or 'height' not in size:
-        return False, "Size must be an object with 'width' and 'height' dimensions"
+    if 'size' in data:
+        size = data['size']
+        if not isinstance(size, dict) or not all(is_number(size.get(side)) for side in ('width', 'height')):
+            return False, "Size must be an object with numeric 'width' and 'height' dimensions"
+    
+    if 'style' in data:
+        style = data['style']
+        if not isinstance(style, dict):
+            return False, "Style must be an object"
+        if 'opacity' in style and not (is_number(style['opacity']) and 0 <= style['opacity'] <= 1):
+            return False, "style.opacity must be a number between 0 and 1"
+        if style.get('fontFile') and overlay_font_file(style['fontFile'], OVERLAY_ASSET_DIR) is None:
+            return False, f"style.fontFile must name a font in {os.path.join(OVERLAY_ASSET_DIR, 'fonts')}"
+    
+    # Burn-in hands image content to FFmpeg as an input, so changing either
+    # the type or the content checks the pair the overlay ends up with
+    if 'type' in data or 'content' in data:
+        merged = dict(stored or {}, **{field: data[field] for field in ('type', 'content') if field in data})
+        if merged.get('type') in ('logo', 'image') and overlay_image_input(merged.get('content'), OVERLAY_ASSET_DIR) is None:
+            return False, f"Image content must be an http(s) URL or a file in {OVERLAY_ASSET_DIR}"
+    
+    # Overlays without a stream_id are shown on every stream
+    if data.get('stream_id') is not None and not isinstance(data['stream_id'], str):
+        return False, "stream_id must be a string or null"
     
     return True, "Valid"
 
+def build_overlay_document(data):
+    """Build the stored document for a validated new overlay"""
+    now = datetime.utcnow()
+    return {
+        'name': data['name'],
+        'type': data['type'],  # text, logo, image
+        'content': data['content'],  # text content or image URL/path
+        'position': {
+            'x': data['position']['x'],
+            'y': data['position']['y']
+        },
+        'size': {
+            'width': data['size']['width'],
+            'height': data['size']['height']
+        },
+        'style': data.get('style', {}),  # Optional styling (color, font, etc.)
+        'visible': data.get('visible', True),
+        'z_index': data.get('z_index', 1),
+        'stream_id': data.get('stream_id'),
+        'created_at': now,
+        'updated_at': now
+    }
+
+def overlay_update_fields(data):
+    """Pick the updatable fields from a request and stamp updated_at"""
+    update_data = {field: data[field] for field in OVERLAY_UPDATE_FIELDS if field in data}
+    update_data['updated_at'] = datetime.utcnow()
+    return update_data
+
+def execute_overlay_bulk(operations, ordered):
+    """Run ``operations`` in one bulk_write; return (result details, {operation index: error})"""
+    if not operations:
+        return {'upserted': []}, {}
+    try:
+        return overlays_collection.bulk_write(operations, ordered=ordered).bulk_api_result, {}
+    except BulkWriteError as e:
+        return e.details, {error['index']: error['errmsg'] for error in e.details.get('writeErrors', [])}
+
+def apply_bulk_outcome(pending, details, errors, ordered, results):
+    """Fill in per-item results for the submitted operations
+
+    ``pending`` lists ``(item index, success status)`` in operation order.
+    An ordered bulk write stops at its first error, so later operations
+    were never attempted.
+    """
+    upserted = {entry['index'] for entry in details.get('upserted', [])}
+    first_error = min(errors) if errors else None
+    for op_index, (item_index, status) in enumerate(pending):
+        result = results[item_index]
+        if op_index in errors:
+            result.update(status='failed', error=errors[op_index])
+        elif ordered and first_error is not None and op_index > first_error:
+            result['status'] = 'skipped'
+        else:
+            result['status'] = 'upserted' if op_index in upserted else status
+        if result['status'] != 'created':
+            result.pop('overlay', None)
+
+def bulk_response(results, ok_status, ordered):
+    """Summarize per-item bulk results; 207 when any item did not succeed"""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    failed = any(result['status'] in ('invalid', 'failed', 'skipped', 'not_found') for result in results)
+    return jsonify({
+        'ordered': ordered,
+        'counts': counts,
+        'results': results
+    }), 207 if failed else ok_status
+
+def ensure_overlay_indexes():
+    """Create the indexes behind the overlay list and stream queries"""
+    try:
+        # Stream overlays: visible overlays for one stream (or global), by z_index
+        overlays_collection.create_index([('stream_id', ASCENDING), ('visible', ASCENDING), ('z_index', ASCENDING)])
+        overlays_collection.create_index([('visible', ASCENDING), ('z_index', ASCENDING)])
+        # Paginated lists, newest first, optionally filtered by type or visibility
+        overlays_collection.create_index([('created_at', DESCENDING), ('_id', DESCENDING)])
+        overlays_collection.create_index([('type', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)])
+        overlays_collection.create_index([('visible', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)])
+        # Overlay cache polling reads the newest updated_at every couple of seconds
+        overlays_collection.create_index([('updated_at', DESCENDING)])
+    except Exception as e:
+        print(f"Error creating overlay indexes: {e}")
+
+def stream_overlay_query(stream_id):
+    """Query for the visible overlays shown on ``stream_id``: its own plus global ones"""
+    return {'visible': True, 'stream_id': {'$in': [stream_id, None]}}
+
+def load_burn_in_overlays(stream_id):
+    """Fetch the overlays that get burned into ``stream_id``"""
+    try:
+        return list(overlays_collection.find(stream_overlay_query(stream_id), OVERLAY_FIELDS).sort('z_index', 1))
+    except Exception as e:
+        print(f"Error loading overlays for burn-in: {e}")
+        return []
+
+def sync_burned_overlays():
+    """Push the current overlays to every pipeline that burns them in"""
+    managers = {manager for manager in active_streams.values() if manager.burn_overlays}
+    if not managers:
+        return
+    
+    by_scope = {}
+    for manager in managers:
+        if manager.overlay_scope not in by_scope:
+            by_scope[manager.overlay_scope] = load_burn_in_overlays(manager.overlay_scope)
+        manager.update_overlays(by_scope[manager.overlay_scope])
+
+def request_burn_in_sync():
+    """Schedule sync_burned_overlays on the background thread instead of in the request"""
+    global burn_in_sync_thread
+    if not any(manager.burn_overlays for manager in list(active_streams.values())):
+        return
+    burn_in_sync_pending.set()
+    if burn_in_sync_thread is None:
+        burn_in_sync_thread = threading.Thread(target=burn_in_sync_loop, daemon=True)
+        burn_in_sync_thread.start()
+
+def burn_in_sync_loop():
+    """Apply overlay changes to burn-in pipelines, one FFmpeg restart per burst of writes"""
+    while True:
+        burn_in_sync_pending.wait()
+        # Let a burst of edits (e.g. dragging an overlay) settle first
+        time.sleep(BURN_IN_SYNC_DELAY)
+        burn_in_sync_pending.clear()
+        try:
+            sync_burned_overlays()
+        except Exception as e:
+            print(f"Error applying overlay changes to burn-in: {e}")
+
+def event_overlay(overlay):
+    """Reduce an overlay document to the fields pushed to clients"""
+    event = {field: overlay[field] for field in OVERLAY_FIELDS if field in overlay}
+    event['_id'] = str(overlay['_id'])
+    return event
+
+def overlays_changed(upserted=(), deleted_ids=(), upserted_ids=()):
+    """Invalidate cached lists, push the change to subscribers and update burned-in overlays
+
+    ``upserted_ids`` are only read back from MongoDB if someone is listening.
+    """
+    overlay_cache.invalidate()
+    
+    # With a change stream every process publishes from it, this write included
+    if overlay_cache.mode != 'change_stream' and overlay_events.has_subscribers():
+        upserted = list(upserted)
+        if upserted_ids:
+            upserted += overlays_collection.find({'_id': {'$in': list(upserted_ids)}}, OVERLAY_FIELDS)
+        for overlay in upserted:
+            overlay_events.publish_upsert(event_overlay(overlay))
+        for overlay_id in deleted_ids:
+            overlay_events.publish_delete(str(overlay_id))
+    
+    request_burn_in_sync()
+
+def publish_overlay_change(change):
+    """Turn a change stream event into an overlay event; None means changes were missed"""
+    if change is None:
+        overlay_events.resync_all()
+        return
+    
+    operation = change['operationType']
+    if operation in ('insert', 'update', 'replace') and change.get('fullDocument'):
+        overlay_events.publish_upsert(event_overlay(change['fullDocument']))
+    elif operation in ('insert', 'update', 'replace', 'delete'):
+        overlay_events.publish_delete(str(change['documentKey']['_id']))
+    else:
+        # drop, rename or invalidate: the whole collection may have changed
+        overlay_events.resync_all()
+    
+    # Writes made through other workers still reach this worker's burn-in pipelines
+    request_burn_in_sync()
+
+def overlay_event_stream(stream_id):
+    """Stream overlay events as server-sent events, with keepalives for idle connections"""
+    overlay_cache.start()
+    
+    def generate():
+        # Subscribe inside the generator so a client that never reads can't leak a subscription
+        subscription = overlay_events.subscribe(stream_id)
+        try:
+            ready = app.json.dumps({'version': overlay_events.version, 'stream_id': stream_id})
+            yield f"retry: 2000\nevent: ready\ndata: {ready}\n\n"
+            while True:
+                event = subscription.next_event(OVERLAY_EVENT_KEEPALIVE)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                name, version, data = event
+                event_id = f"id: {version}\n" if version else ""
+                yield f"{event_id}event: {name}\ndata: {data}\n\n"
+        finally:
+            overlay_events.unsubscribe(subscription)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def cached_overlay_response(key, load):
+    """Serve an overlay list from the cache, answering If-None-Match with 304"""
+    etag, body = overlay_cache.get(key, lambda: (app.json.dumps(load()) + "\n").encode())
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let clients keep the list but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def register_stream(stream_id, stream_manager):
+    """Record a stream this worker owns in the shared registry"""
+    media_playlists = sorted(stream_manager.variant_playlists) if stream_manager.renditions else [PLAYLIST_NAME]
+    try:
+        stream_registry.register(
+            stream_id, stream_manager.stream_id, NODE_ID, stream_manager.output_dir,
+            rtsp_url=stream_manager.rtsp_url,
+            low_latency=stream_manager.low_latency,
+            part_target=LL_PART_TARGET if stream_manager.low_latency else None,
+            media_playlists=media_playlists,
+            renditions=[r['name'] for r in stream_manager.renditions],
+            ingest_mode=stream_manager.ingest_mode,
+            burn_overlays=stream_manager.burn_overlays,
+            dvr_dir=stream_manager.dvr.directory if stream_manager.dvr else None,
+            dvr_extension=stream_manager.dvr.extension if stream_manager.dvr else None,
+            cpu_cost=stream_manager.cpu_cost()
+        )
+    except Exception as e:
+        print(f"Error registering stream {stream_id}: {e}")
+    ensure_registry_heartbeat()
+
+def remote_cpu_reserved():
+    """Cores reserved by pipelines that other live workers own"""
+    stale_before = time.time() - REGISTRY_OWNER_TIMEOUT
+    try:
+        records = stream_registry.list()
+    except Exception as e:
+        print(f"Error reading stream registry: {e}")
+        return 0
+    # Streams sharing a pipeline share its cost
+    costs = {
+        record['pipeline_id']: record.get('cpu_cost') or 0
+        for record in records
+        if record['owner'] != NODE_ID and record['heartbeat_at'] >= stale_before
+    }
+    return sum(costs.values())
+
+def forget_stream_metrics(stream_id):
+    """Drop the per-stream counter series of a stream that has ended"""
+    bytes_served.remove(stream_id)
+    segments_offloaded.remove(stream_id)
+
+def release_stream(stream_id):
+    """Detach a local stream, stopping its pipeline if it was the last consumer"""
+    stream_manager = active_streams.pop(stream_id, None)
+    forget_stream_metrics(stream_id)
+    try:
+        stream_registry.remove(stream_id)
+    except Exception as e:
+        print(f"Error unregistering stream {stream_id}: {e}")
+    if stream_manager is None:
+        return
+    
+    # Other streams may still be watching the same pipeline
+    if ingest_registry.release(stream_manager.ingest_key, stream_id):
+        stream_manager.stop_stream()
+        stream_manager.cleanup_files()
+
+def find_stream(stream_id):
+    """Return the local StreamManager for ``stream_id``, or a disk view if another worker owns it"""
+    stream_manager = active_streams.get(stream_id)
+    if stream_manager is not None:
+        return stream_manager
+    
+    now = time.time()
+    cached = remote_views.get(stream_id)
+    if cached and cached[1] > now:
+        return cached[0]
+    
+    record = remote_stream_record(stream_id)
+    if record is None:
+        if remote_views.pop(stream_id, None):
+            forget_stream_metrics(stream_id)
+        return None
+    view = cached[0] if cached else DiskStreamView(record, SEGMENT_MIMETYPES, thumbnail_ttl=THUMBNAIL_TTL)
+    remote_views[stream_id] = (view, now + REMOTE_VIEW_TTL)
+    return view
+
+def remote_stream_record(stream_id):
+    """Return the registry record of a live stream owned by another worker, or None"""
+    try:
+        record = stream_registry.get(stream_id)
+    except Exception as e:
+        print(f"Error reading stream registry: {e}")
+        return None
+    if (record is None or record['owner'] == NODE_ID or record['stop_requested']
+            or time.time() - record['heartbeat_at'] > REGISTRY_OWNER_TIMEOUT):
+        return None
+    return record
+
+def ensure_registry_heartbeat():
+    global registry_heartbeat_thread
+    if registry_heartbeat_thread is None:
+        registry_heartbeat_thread = threading.Thread(target=registry_heartbeat, daemon=True)
+        registry_heartbeat_thread.start()
+
+def registry_heartbeat():
+    """Keep this worker's registry rows fresh and act on stop requests from other workers"""
+    while True:
+        time.sleep(REGISTRY_HEARTBEAT_INTERVAL)
+        states = {manager.stream_id: manager.health['state'] for manager in set(active_streams.values())}
+        try:
+            stop_requests = stream_registry.heartbeat(NODE_ID, states)
+        except Exception as e:
+            print(f"Stream registry heartbeat failed: {e}")
+            continue
+        for stream_id in stop_requests:
+            print(f"Stopping stream {stream_id} on request from another worker")
+            release_stream(stream_id)
+
+def live_pipelines():
+    """Return the pipeline ids whose directories must be kept, or None if the registry is unreadable"""
+    try:
+        records = stream_registry.list()
+    except Exception as e:
+        print(f"Error reading stream registry: {e}")
+        return None
+    stale_before = time.time() - REGISTRY_OWNER_TIMEOUT
+    live = {manager.stream_id for manager in set(active_streams.values())}
+    live.update(record['pipeline_id'] for record in records if record['heartbeat_at'] >= stale_before)
+    return live
+
+def reconcile_streams(startup=False):
+    """Adopt registered streams whose owner died, or drop their records
+
+    On startup this worker's own leftover records (same NODE_ID, e.g. after
+    a crash) are taken over too.
+    """
+    stale_before = time.time() - REGISTRY_OWNER_TIMEOUT
+    for record in stream_registry.list():
+        stream_id = record['stream_id']
+        if stream_id in active_streams:
+            continue
+        own = startup and record['owner'] == NODE_ID
+        if record['heartbeat_at'] >= stale_before and not own:
+            continue
+        # Only one worker wins the record
+        if not stream_registry.claim(stream_id, NODE_ID, stale_before, previous_owner=NODE_ID if own else None):
+            continue
+        
+        if record['stop_requested'] or not ADOPT_ORPHANED_STREAMS or not record.get('rtsp_url'):
+            print(f"Dropping stream {stream_id} left behind by {record['owner']}")
+            stream_registry.remove(stream_id)
+            continue
+        
+        print(f"Adopting stream {stream_id} from {record['owner']}")
+        renditions = record.get('renditions') or []
+        ladder = [r for r in ABR_LADDER if r['name'] in renditions] or None
+        try:
+            stream_manager, _ = launch_stream(
+                stream_id, record['rtsp_url'],
+                low_latency=record.get('low_latency', False),
+                ingest_mode=record.get('ingest_mode') or 'auto',
+                ladder=ladder,
+                burn_overlays=record.get('burn_overlays', False),
+                dvr=bool(record.get('dvr_dir'))
+            )
+        except AdmissionRejected as e:
+            print(f"No CPU budget to adopt stream {stream_id}: {e}")
+            stream_manager = None
+        if stream_manager is None:
+            print(f"Failed to adopt stream {stream_id}")
+            stream_registry.remove(stream_id)
+
+def start_stream_janitor():
+    """Reconcile leftover streams now and keep reclaiming disk in the background"""
+    stream_janitor.start()
+
+def launch_stream(stream_id, rtsp_url, low_latency=False, ingest_mode='auto', ladder=None, burn_overlays=False, dvr=False):
+    """Attach ``stream_id`` to a pipeline for its source, starting one if needed
+
+    Returns ``(stream_manager, created)``; ``stream_manager`` is None if the
+    pipeline failed to start. Raises AdmissionRejected if a new pipeline
+    doesn't fit the CPU budget.
+    """
+    key = ingest_key(
+        rtsp_url,
+        low_latency=low_latency,
+        ingest_mode=ingest_mode,
+        ladder=tuple(r['name'] for r in ladder) if ladder else None,
+        burn_overlays=burn_overlays,
+        # Burned-in video carries this stream's overlays, so it can't be shared
+        overlay_scope=stream_id if burn_overlays else None
+    )
+    
+    def start_pipeline():
+        if storage_full():
+            print(f"Not starting a pipeline for {stream_id}: stream storage is full")
+            return None
+        # The pipeline gets its own id so it outlives whichever stream started it
+        stream_manager = StreamManager(
+            str(uuid.uuid4()), rtsp_url,
+            low_latency=low_latency, ingest_mode=ingest_mode, ladder=ladder, burn_overlays=burn_overlays
+        )
+        stream_manager.ingest_key = key
+        if burn_overlays:
+            stream_manager.overlay_scope = stream_id
+            stream_manager.overlays = load_burn_in_overlays(stream_id)
+        # Probe first so a copy-mode source is charged as a remux, not a transcode
+        stream_manager.resolve_profile()
+        # Waits in the start queue while the host is at its CPU budget;
+        # raises AdmissionRejected if it stays there
+        cpu_scheduler.admit(stream_manager.stream_id, stream_manager.cpu_cost())
+        if not stream_manager.start_stream():
+            cpu_scheduler.release(stream_manager.stream_id)
+            return None
+        return stream_manager
+    
+    # Attach to a running pipeline for this source, or start one
+    stream_manager, created = ingest_registry.acquire(key, stream_id, start_pipeline)
+    if stream_manager:
+        if dvr:
+            # Archiving is per pipeline, so a shared pipeline starts archiving for everyone
+            stream_manager.enable_dvr()
+        active_streams[stream_id] = stream_manager
+        register_stream(stream_id, stream_manager)
+    return stream_manager, created
+
 # STREAMING ENDPOINTS (existing)
 @app.route('/api/stream/start', methods=['POST'])
 def start_stream():
@@ -169,6 +1475,31 @@ def start_stream():
         return jsonify({'error': 'RTSP URL is required'}), 400
     
     rtsp_url = data['rtsp_url']
+    low_latency = bool(data.get('low_latency', False))
+    burn_overlays = bool(data.get('burn_overlays', False))
+    dvr = bool(data.get('dvr', False))
+    ingest_mode = data.get('ingest_mode', 'auto')
+    ladder = data.get('ladder')
+    
+    if ingest_mode not in INGEST_MODES:
+        return jsonify({'error': f"ingest_mode must be one of: {', '.join(INGEST_MODES)}"}), 400
+    
+    # "ladder": true for every rendition, or a list of rendition names
+    if ladder is True:
+        ladder = ABR_LADDER
+    elif isinstance(ladder, list):
+        known = {r['name']: r for r in ABR_LADDER}
+        unknown = [name for name in ladder if name not in known]
+        if unknown or not ladder:
+            return jsonify({'error': f"ladder must be true or a list of: {', '.join(known)}"}), 400
+        ladder = [r for r in ABR_LADDER if r['name'] in ladder]
+    elif ladder:
+        return jsonify({'error': 'ladder must be true or a list of rendition names'}), 400
+    else:
+        ladder = None
+    
+    if ladder and (low_latency or ingest_mode == 'copy'):
+        return jsonify({'error': 'ladder cannot be combined with low_latency or ingest_mode copy'}), 400
     
     # Validate RTSP URL format
     if not rtsp_url.startswith('rtsp://'):
@@ -177,61 +1508,253 @@ def start_stream():
     # Generate unique stream ID
     stream_id = str(uuid.uuid4())
     
-    # Create stream manager
-    stream_manager = StreamManager(stream_id, rtsp_url)
+    try:
+        stream_manager, created = launch_stream(
+            stream_id, rtsp_url,
+            low_latency=low_latency, ingest_mode=ingest_mode, ladder=ladder, burn_overlays=burn_overlays, dvr=dvr
+        )
+    except AdmissionRejected as e:
+        response = jsonify({'error': str(e), 'scheduler': cpu_scheduler.stats()})
+        if e.retry_after:
+            response.headers['Retry-After'] = str(int(e.retry_after))
+        return response, 503
     
-    # Start the stream
-    if stream_manager.start_stream():
-        active_streams[stream_id] = stream_manager
-        
+    if stream_manager:
         return jsonify({
             'stream_id': stream_id,
+            'pipeline_id': stream_manager.stream_id,
+            'shared': not created,
             'playlist_url': f'/api/stream/{stream_id}/playlist.m3u8',
+            'low_latency': low_latency,
+            'ingest_mode': stream_manager.ingest_mode,
+            'renditions': [r['name'] for r in stream_manager.renditions],
+            'burn_overlays': stream_manager.burn_overlays,
+            'dvr_url': f'/api/stream/{stream_id}/dvr.m3u8' if dvr else None,
             'status': 'starting',
             'message': 'Stream is starting, please wait a few seconds...'
         }), 200
+    elif storage_full():
+        return jsonify({'error': 'Stream storage is full'}), 507
     else:
         return jsonify({'error': 'Failed to start stream'}), 500
 
+# Routes serving stream files; their errors must not be cached by a CDN
+STREAM_FILE_ENDPOINTS = {'get_playlist', 'get_segment', 'get_dvr_playlist', 'get_dvr_segment', 'get_thumbnail'}
+
+@app.after_request
+def uncacheable_stream_errors(response):
+    if response.status_code >= 400 and request.endpoint in STREAM_FILE_ENDPOINTS:
+        response.headers['Cache-Control'] = UNCACHEABLE
+    return response
+
+def body_length(response):
+    # A 304 keeps the Content-Length of the full response
+    return 0 if response.status_code == 304 else response.content_length or 0
+
+def segment_response(stream_manager, name, data, mimetype):
+    """Segment bytes with cache validators, honouring conditional and range requests"""
+    response = Response(data, mimetype=mimetype)
+    if name.endswith('.mp4'):
+        # Init segments keep their name across restarts, so they are hashed and only briefly cached
+        response.headers['Cache-Control'] = f'public, max-age={HLS_TIME}'
+        response.set_etag(content_etag(data))
+    else:
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.set_etag(segment_etag(stream_manager.stream_id, name, len(data)))
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+
+def viewer_key():
+    """Identify the client behind a request, for viewer counts"""
+    address = request.headers.get('X-Forwarded-For', request.remote_addr or '').split(',')[0].strip()
+    return f"{address} {request.headers.get('User-Agent', '')}"
+
+def serve_playlist(stream_id, stream_manager, name):
+    """Serve a master or media playlist, honouring LL-HLS blocking reloads"""
+    viewers.seen(stream_id, viewer_key())
+    msn = request.args.get('_HLS_msn')
+    part = request.args.get('_HLS_part')
+    if stream_manager.is_media_playlist(name) and (msn is not None or part is not None):
+        try:
+            msn = int(msn)
+            part = int(part) if part is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': '_HLS_msn must be an integer, and _HLS_part requires _HLS_msn'}), 400
+        
+        last_msn = stream_manager.last_msn(name)
+        if last_msn is not None and msn > last_msn + 2:
+            return jsonify({'error': '_HLS_msn is too far in the future'}), 400
+        
+        # LL-HLS asks servers to give up after three target durations
+        timeout = 3 * (stream_manager.target_duration_of(name) or HLS_TIME)
+        if not stream_manager.wait_for_msn(msn, part, timeout, name):
+            return jsonify({'error': 'Requested media sequence not available yet'}), 503
+    
+    data = stream_manager.read_playlist(name)
+    
+    if data is None:
+        return jsonify({'error': 'Playlist not ready yet'}), 404
+    
+    media = stream_manager.is_media_playlist(name)
+    target_duration = (stream_manager.target_duration_of(name) if media else None) or HLS_TIME
+    response = Response(data, mimetype='application/vnd.apple.mpegurl')
+    response.headers['Cache-Control'] = playlist_cache_control(target_duration, blocking=media and msn is not None)
+    etag = content_etag(data)
+    if PLAYLIST_GZIP and len(data) >= PLAYLIST_GZIP_MIN_BYTES:
+        response.vary.add('Accept-Encoding')
+        if request.accept_encodings['gzip']:
+            response.set_data(playlist_gzip.compress(etag, data))
+            response.content_encoding = 'gzip'
+            # Each representation needs its own strong ETag
+            etag += '-gz'
+    response.set_etag(etag)
+    response = response.make_conditional(request)
+    bytes_served.inc(body_length(response), stream_id, 'playlist')
+    return response
+
 @app.route('/api/stream/<stream_id>/playlist.m3u8')
 def get_playlist(stream_id):
     """Serve HLS playlist file"""
-    if stream_id not in active_streams:
+    stream_manager = find_stream(stream_id)
+    if stream_manager is None:
         return jsonify({'error': 'Stream not found'}), 404
     
-    stream_manager = active_streams[stream_id]
-    playlist_file = stream_manager.playlist_file
+    return serve_playlist(stream_id, stream_manager, PLAYLIST_NAME)
+
+def parse_dvr_time(value, now):
+    """Parse a DVR range bound: unix seconds, or seconds before now if negative"""
+    if value is None:
+        return None
+    seconds = float(value)
+    return now + seconds if seconds < 0 else seconds
+
+def thumbnail_url(stream_id, stream_manager):
+    """URL of the stream's thumbnail, versioned so clients can cache each one"""
+    if not THUMBNAIL_INTERVAL:
+        return None
+    url = f'/api/stream/{stream_id}/thumbnail.jpg'
+    thumbnail = stream_manager.thumbnails.get()
+    return f'{url}?v={thumbnail[1]}' if thumbnail else url
+
+@app.route('/api/stream/<stream_id>/thumbnail.jpg')
+def get_thumbnail(stream_id):
+    """Serve the stream's latest thumbnail from memory"""
+    stream_manager = find_stream(stream_id)
+    if stream_manager is None:
+        return jsonify({'error': 'Stream not found'}), 404
     
-    if not os.path.exists(playlist_file):
-        return jsonify({'error': 'Playlist not ready yet'}), 404
+    thumbnail = stream_manager.thumbnails.get()
+    if thumbnail is None:
+        return jsonify({'error': 'Thumbnail not ready yet'}), 404
     
-    return send_file(playlist_file, mimetype='application/vnd.apple.mpegurl')
+    data, version, mtime = thumbnail
+    response = Response(data, mimetype='image/jpeg')
+    response.set_etag(version)
+    response.last_modified = mtime
+    response.headers['Cache-Control'] = f'max-age={THUMBNAIL_TTL}'
+    return response.make_conditional(request)
+
+@app.route('/api/stream/<stream_id>/dvr.m3u8')
+def get_dvr_playlist(stream_id):
+    """Playlist of archived segments between ``start`` and ``end``
+
+    Without ``end`` (or with an end in the future) it keeps growing at the
+    live edge: an EVENT playlist from a fixed ``start``, a sliding window
+    from a relative (or no) ``start``. Otherwise a finished VOD playlist.
+    """
+    stream_manager = find_stream(stream_id)
+    archive = getattr(stream_manager, 'dvr', None)
+    if archive is None:
+        return jsonify({'error': 'DVR is not enabled for this stream'}), 404
+    
+    now = time.time()
+    try:
+        start = parse_dvr_time(request.args.get('start'), now)
+        end = parse_dvr_time(request.args.get('end'), now)
+    except ValueError:
+        return jsonify({'error': 'start and end must be unix timestamps or negative offsets in seconds'}), 400
+    if start is not None and end is not None and end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    
+    entries = archive.window(start, end)
+    ended = end is not None and end <= now
+    # Offsets from now name a different range on every request, and without
+    # a start the oldest segments drop out as the archive is pruned
+    relative = any(request.args.get(bound, '').startswith('-') for bound in ('start', 'end'))
+    append_only = start is not None and not request.args.get('start', '').startswith('-')
+    response = Response(archive.playlist(entries, ended, append_only), mimetype='application/vnd.apple.mpegurl')
+    if ended and not relative:
+        response.headers['Cache-Control'] = f'public, max-age={DVR_VOD_MAX_AGE}'
+    else:
+        response.headers['Cache-Control'] = playlist_cache_control(archive.max_duration or HLS_TIME)
+    return response
+
+@app.route('/api/stream/<stream_id>/dvr/<filename>')
+def get_dvr_segment(stream_id, filename):
+    """Serve an archived segment (``<seq>.ts``/``<seq>.m4s``) or init segment (``init<chunk>.mp4``)"""
+    stream_manager = find_stream(stream_id)
+    archive = getattr(stream_manager, 'dvr', None)
+    if archive is None:
+        return jsonify({'error': 'DVR is not enabled for this stream'}), 404
+    
+    name, extension = os.path.splitext(filename)
+    data = None
+    if name.startswith('init') and name[4:].isdigit() and extension == '.mp4':
+        data = archive.read_init(int(name[4:]))
+    elif name.isdigit() and extension == archive.extension:
+        data = archive.read_segment(int(name))
+    
+    if data is None:
+        return jsonify({'error': 'Segment not found'}), 404
+    
+    response = segment_response(stream_manager, f"dvr-{filename}", data, SEGMENT_MIMETYPES.get(extension, 'application/octet-stream'))
+    bytes_served.inc(body_length(response), stream_id, 'dvr')
+    return response
 
 @app.route('/api/stream/<stream_id>/<filename>')
 def get_segment(stream_id, filename):
-    """Serve HLS segment files"""
-    if stream_id not in active_streams:
+    """Serve HLS segment files and rendition playlists"""
+    stream_manager = find_stream(stream_id)
+    if stream_manager is None:
         return jsonify({'error': 'Stream not found'}), 404
     
-    stream_manager = active_streams[stream_id]
-    file_path = os.path.join(stream_manager.output_dir, filename)
+    if filename.endswith('.m3u8'):
+        return serve_playlist(stream_id, stream_manager, filename)
+    
+    extension = os.path.splitext(filename)[1]
+    mimetype = SEGMENT_MIMETYPES.get(extension, 'application/octet-stream')
+    
+    # The front proxy sends files itself with sendfile; segments kept only
+    # in memory are sent from here
+    path = stream_manager.segment_file(filename) if ACCEL_REDIRECT_PREFIX else None
+    if path is not None:
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + path
+        # nginx adds its own validators and ranges for the file and keeps this header
+        response.headers['Cache-Control'] = IMMUTABLE if extension != '.mp4' else f'public, max-age={HLS_TIME}'
+        segments_offloaded.inc(1, stream_id)
+        return response
     
-    if not os.path.exists(file_path):
+    data = stream_manager.read_segment(filename)
+    
+    if data is None:
         return jsonify({'error': 'Segment not found'}), 404
     
-    return send_file(file_path, mimetype='video/mp2t')
+    response = segment_response(stream_manager, filename, data, mimetype)
+    bytes_served.inc(body_length(response), stream_id, 'segment')
+    return response
 
 @app.route('/api/stream/<stream_id>/stop', methods=['POST'])
 def stop_stream(stream_id):
     """Stop a running stream"""
     if stream_id not in active_streams:
+        # Only the owning worker controls FFmpeg; ask it to stop
+        if remote_stream_record(stream_id) and stream_registry.request_stop(stream_id):
+            remote_views.pop(stream_id, None)
+            forget_stream_metrics(stream_id)
+            return jsonify({'message': 'Stop requested from the owning worker'}), 202
         return jsonify({'error': 'Stream not found'}), 404
     
-    stream_manager = active_streams[stream_id]
-    stream_manager.stop_stream()
-    stream_manager.cleanup_files()
-    
-    del active_streams[stream_id]
+    release_stream(stream_id)
     
     return jsonify({'message': 'Stream stopped successfully'})
 
@@ -239,20 +1762,82 @@ def stop_stream(stream_id):
 def get_stream_status(stream_id):
     """Get stream status"""
     if stream_id not in active_streams:
-        return jsonify({'error': 'Stream not found'}), 404
+        record = remote_stream_record(stream_id)
+        if record is None:
+            return jsonify({'error': 'Stream not found'}), 404
+        return jsonify(remote_stream_status(stream_id, record))
     
     stream_manager = active_streams[stream_id]
-    
-    # Check if playlist exists (stream is ready)
-    playlist_exists = os.path.exists(stream_manager.playlist_file)
+    playlist_ready = stream_manager.playlist_ready
     
     return jsonify({
         'stream_id': stream_id,
+        'pipeline_id': stream_manager.stream_id,
+        'consumers': ingest_registry.consumers(stream_manager.ingest_key),
         'is_running': stream_manager.is_running,
-        'playlist_ready': playlist_exists,
-        'playlist_url': f'/api/stream/{stream_id}/playlist.m3u8' if playlist_exists else None
+        'low_latency': stream_manager.low_latency,
+        'ingest_mode': stream_manager.ingest_mode,
+        'source': stream_manager.source,
+        'renditions': [r['name'] for r in stream_manager.renditions],
+        'cpu': {
+            'cost': stream_manager.cpu_cost(),
+            'cpus': stream_manager.cpus,
+            'degraded': stream_degraded(stream_manager)
+        },
+        'burn_in': {
+            'enabled': stream_manager.burn_overlays,
+            'active': stream_manager.burn_in_active(),
+            'suspended': stream_manager.burn_suspended,
+            'overlays': len(stream_manager.overlays),
+            'cpu_percent': stream_manager.cpu_percent,
+            'cpu_budget': BURN_IN_CPU_BUDGET
+        },
+        'playlist_ready': playlist_ready,
+        'playlist_url': f'/api/stream/{stream_id}/playlist.m3u8' if playlist_ready else None,
+        'media_sequence': stream_manager.media_sequence,
+        'latest_segment': stream_manager.latest_segment(),
+        'watch_mode': stream_manager.storage.mode,
+        'storage': stream_manager.storage.stats(),
+        'health': stream_manager.health,
+        'cache': stream_manager.cache.stats(),
+        'disk': stream_manager.ledger.stats(),
+        'dvr': stream_manager.dvr.stats() if stream_manager.dvr else None,
+        'thumbnail_url': thumbnail_url(stream_id, stream_manager),
+        'owner': NODE_ID
     })
 
+def remote_stream_status(stream_id, record):
+    """Status of a stream owned by another worker, from its registry record"""
+    return {
+        'stream_id': stream_id,
+        'pipeline_id': record['pipeline_id'],
+        'owner': record['owner'],
+        'remote': True,
+        'state': record['state'],
+        'low_latency': record.get('low_latency', False),
+        'renditions': record.get('renditions', []),
+        'playlist_ready': record['state'] == 'running',
+        'playlist_url': f'/api/stream/{stream_id}/playlist.m3u8'
+    }
+
+@app.route('/api/stream/<stream_id>/logs')
+def get_stream_logs(stream_id):
+    """Get the most recent FFmpeg log lines for a stream"""
+    if stream_id not in active_streams:
+        return jsonify({'error': 'Stream not found'}), 404
+    
+    stream_manager = active_streams[stream_id]
+    
+    return jsonify({
+        'stream_id': stream_id,
+        'lines': list(stream_manager.logs)
+    })
+
+def stream_degraded(manager):
+    """True when a pipeline runs below realtime while the host is oversubscribed"""
+    speed = manager.progress.get('speed')
+    return speed is not None and speed < DEGRADED_SPEED and cpu_scheduler.oversubscribed()
+
 @app.route('/api/streams')
 def list_streams():
     """List all active streams"""
@@ -260,12 +1845,45 @@ def list_streams():
     for stream_id, manager in active_streams.items():
         streams.append({
             'stream_id': stream_id,
+            'pipeline_id': manager.stream_id,
             'rtsp_url': manager.rtsp_url,
             'is_running': manager.is_running,
-            'playlist_ready': os.path.exists(manager.playlist_file)
+            'playlist_ready': manager.playlist_ready,
+            'health': {
+                'state': manager.health['state'],
+                'score': manager.health['score'],
+                'restarts': manager.restart_count
+            },
+            # Running below realtime because the host is oversubscribed
+            'degraded': stream_degraded(manager),
+            'thumbnail_url': thumbnail_url(stream_id, manager),
+            'owner': NODE_ID
+        })
+    
+    # Streams owned by other workers
+    try:
+        records = stream_registry.list()
+    except Exception as e:
+        print(f"Error reading stream registry: {e}")
+        records = []
+    for record in records:
+        if record['stream_id'] in active_streams:
+            continue
+        view = find_stream(record['stream_id'])
+        if view is None:
+            continue
+        streams.append({
+            'stream_id': record['stream_id'],
+            'pipeline_id': record['pipeline_id'],
+            'rtsp_url': record.get('rtsp_url'),
+            'is_running': record['state'] not in ('crashed', 'backoff'),
+            'playlist_ready': record['state'] == 'running',
+            'health': {'state': record['state']},
+            'thumbnail_url': thumbnail_url(record['stream_id'], view),
+            'owner': record['owner']
         })
     
-    return jsonify({'streams': streams})
+    return jsonify({'streams': streams, 'scheduler': cpu_scheduler.stats()})
 
 # OVERLAY CRUD ENDPOINTS
 
@@ -284,34 +1902,15 @@ def create_overlay():
             return jsonify({'error': message}), 400
         
         # Add metadata
-        overlay_data = {
-            'name': data['name'],
-            'type': data['type'],  # text, logo, image
-            'content': data['content'],  # text content or image URL/path
-            'position': {
-                'x': data['position']['x'],
-                'y': data['position']['y']
-            },
-            'size': {
-                'width': data['size']['width'],
-                'height': data['size']['height']
-            },
-            'style': data.get('style', {}),  # Optional styling (color, font, etc.)
-            'visible': data.get('visible', True),
-            'z_index': data.get('z_index', 1),
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
-        }
+        overlay_data = build_overlay_document(data)
         
-        # Insert into MongoDB
-        result = overlays_collection.insert_one(overlay_data)
-        
-        # Return created overlay
-        created_overlay = overlays_collection.find_one({'_id': result.inserted_id})
+        # Insert into MongoDB; insert_one fills in _id, so the response needs no read back
+        overlays_collection.insert_one(overlay_data)
+        overlays_changed(upserted=[overlay_data])
         
         return jsonify({
             'message': 'Overlay created successfully',
-            'overlay': serialize_overlay(created_overlay)
+            'overlay': serialize_overlay(overlay_data)
         }), 201
         
     except Exception as e:
@@ -319,11 +1918,19 @@ def create_overlay():
 
 @app.route('/api/overlays', methods=['GET'])
 def get_overlays():
-    """Get all overlays with optional filtering"""
+    """Get overlays with optional filtering, newest first, one page at a time"""
     try:
         # Get query parameters for filtering
         overlay_type = request.args.get('type')
         visible_only = request.args.get('visible_only', 'false').lower() == 'true'
+        stream_id = request.args.get('stream_id')
+        cursor = request.args.get('cursor')
+        
+        try:
+            limit = int(request.args.get('limit', OVERLAY_PAGE_SIZE))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        limit = max(1, min(limit, OVERLAY_MAX_PAGE_SIZE))
         
         # Build query
         query = {}
@@ -331,17 +1938,36 @@ def get_overlays():
             query['type'] = overlay_type
         if visible_only:
             query['visible'] = True
+        if stream_id:
+            query['stream_id'] = stream_id
+        if cursor:
+            # Keyset pagination on (created_at, _id) stays O(page) at any depth
+            try:
+                query.update(keyset_filter(cursor))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
         
-        # Get overlays from MongoDB
-        overlays = list(overlays_collection.find(query).sort('created_at', -1))
-        
-        # Serialize overlays
-        serialized_overlays = [serialize_overlay(overlay) for overlay in overlays]
+        def load():
+            # Fetch one extra document to know whether another page follows
+            overlays = list(
+                overlays_collection.find(query, OVERLAY_FIELDS + ['created_at'])
+                .sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+                .limit(limit + 1)
+            )
+            next_cursor = encode_cursor(overlays[limit - 1]) if len(overlays) > limit else None
+            overlays = overlays[:limit]
+            
+            # Serialize overlays
+            for overlay in overlays:
+                overlay.pop('created_at', None)
+            serialized_overlays = [serialize_overlay(overlay) for overlay in overlays]
+            return {
+                'overlays': serialized_overlays,
+                'count': len(serialized_overlays),
+                'next_cursor': next_cursor
+            }
         
-        return jsonify({
-            'overlays': serialized_overlays,
-            'count': len(serialized_overlays)
-        }), 200
+        return cached_overlay_response(('list', overlay_type, visible_only, stream_id, limit, cursor), load)
         
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve overlays: {str(e)}'}), 500
@@ -383,42 +2009,27 @@ def update_overlay(overlay_id):
         if not data:
             return jsonify({'error': 'Request body is required'}), 400
         
-        # Check if overlay exists
-        existing_overlay = overlays_collection.find_one({'_id': obj_id})
-        if not existing_overlay:
-            return jsonify({'error': 'Overlay not found'}), 404
-        
-        # Validate updated data if provided
-        if any(field in data for field in ['name', 'type', 'content', 'position', 'size']):
-            # Merge with existing data for validation
-            merged_data = existing_overlay.copy()
-            merged_data.update(data)
-            is_valid, message = validate_overlay_data(merged_data)
-            if not is_valid:
-                return jsonify({'error': message}), 400
-        
-        # Prepare update data
-        update_data = {}
-        allowed_fields = ['name', 'type', 'content', 'position', 'size', 'style', 'visible', 'z_index']
-        
-        for field in allowed_fields:
-            if field in data:
-                update_data[field] = data[field]
-        
-        # Add updated timestamp
-        update_data['updated_at'] = datetime.utcnow()
+        # Validate the fields being changed, against the stored type and content
+        stored = None
+        if 'type' in data or 'content' in data:
+            stored = overlays_collection.find_one({'_id': obj_id}, {'type': 1, 'content': 1})
+            if not stored:
+                return jsonify({'error': 'Overlay not found'}), 404
+        is_valid, message = validate_overlay_data(data, partial=True, stored=stored)
+        if not is_valid:
+            return jsonify({'error': message}), 400
         
-        # Update in MongoDB
-        result = overlays_collection.update_one(
+        # Update and read back the new document in one round trip
+        updated_overlay = overlays_collection.find_one_and_update(
             {'_id': obj_id},
-            {'$set': update_data}
+            {'$set': overlay_update_fields(data)},
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
-            return jsonify({'error': 'No changes made to overlay'}), 400
+        if not updated_overlay:
+            return jsonify({'error': 'Overlay not found'}), 404
         
-        # Return updated overlay
-        updated_overlay = overlays_collection.find_one({'_id': obj_id})
+        overlays_changed(upserted=[updated_overlay])
         
         return jsonify({
             'message': 'Overlay updated successfully',
@@ -449,6 +2060,8 @@ def delete_overlay(overlay_id):
         if result.deleted_count == 0:
             return jsonify({'error': 'Failed to delete overlay'}), 500
         
+        overlays_changed(deleted_ids=[overlay_id])
+        
         return jsonify({
             'message': 'Overlay deleted successfully',
             'deleted_overlay_id': overlay_id
@@ -457,6 +2070,132 @@ def delete_overlay(overlay_id):
     except Exception as e:
         return jsonify({'error': f'Failed to delete overlay: {str(e)}'}), 500
 
+@app.route('/api/overlays/bulk', methods=['POST'])
+def create_overlays_bulk():
+    """Create many overlays in a single bulk write"""
+    try:
+        data = request.get_json()
+        if not data or 'overlays' not in data:
+            return jsonify({'error': 'overlays array is required'}), 400
+        
+        items = data['overlays']
+        if not isinstance(items, list) or len(items) == 0:
+            return jsonify({'error': 'overlays must be a non-empty array'}), 400
+        if len(items) > OVERLAY_BULK_MAX:
+            return jsonify({'error': f'At most {OVERLAY_BULK_MAX} overlays per request'}), 400
+        
+        # Ordered stops at the first invalid or failed item, like MongoDB's ordered writes
+        ordered = bool(data.get('ordered', True))
+        results = [{'index': index, 'status': 'skipped'} for index in range(len(items))]
+        operations, pending, documents = [], [], []
+        
+        for index, item in enumerate(items):
+            is_valid, message = validate_overlay_data(item) if isinstance(item, dict) else (False, 'Overlay must be an object')
+            if not is_valid:
+                results[index].update(status='invalid', error=message)
+                if ordered:
+                    break
+                continue
+            
+            # Assign ids up front so the response is built without reading back
+            overlay_data = build_overlay_document(item)
+            overlay_data['_id'] = ObjectId()
+            operations.append(InsertOne(overlay_data))
+            pending.append((index, 'created'))
+            documents.append(overlay_data)
+            results[index]['_id'] = str(overlay_data['_id'])
+            results[index]['overlay'] = overlay_data
+        
+        details, errors = execute_overlay_bulk(operations, ordered)
+        apply_bulk_outcome(pending, details, errors, ordered, results)
+        for result in results:
+            if 'overlay' in result:
+                result['overlay'] = serialize_overlay(result['overlay'])
+        
+        created = [result['overlay'] for result in results if result['status'] == 'created']
+        if created:
+            overlays_changed(upserted=created)
+        
+        return bulk_response(results, 201, ordered)
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to create overlays: {str(e)}'}), 500
+
+@app.route('/api/overlays/bulk', methods=['PATCH'])
+def update_overlays_bulk():
+    """Update (or upsert) many overlays in a single bulk write"""
+    try:
+        data = request.get_json()
+        if not data or 'overlays' not in data:
+            return jsonify({'error': 'overlays array is required'}), 400
+        
+        items = data['overlays']
+        if not isinstance(items, list) or len(items) == 0:
+            return jsonify({'error': 'overlays must be a non-empty array'}), 400
+        if len(items) > OVERLAY_BULK_MAX:
+            return jsonify({'error': f'At most {OVERLAY_BULK_MAX} overlays per request'}), 400
+        
+        ordered = bool(data.get('ordered', True))
+        upsert = bool(data.get('upsert', False))
+        results = [{'index': index, 'status': 'skipped'} for index in range(len(items))]
+        
+        # Parse ids first so existence is checked with one query for the whole batch
+        obj_ids = {}
+        for index, item in enumerate(items):
+            try:
+                obj_ids[index] = ObjectId(item['_id'])
+            except (InvalidId, KeyError, TypeError):
+                pass
+        existing = {doc['_id']: doc for doc in overlays_collection.find({'_id': {'$in': list(obj_ids.values())}}, {'type': 1, 'content': 1})}
+        
+        operations, pending = [], []
+        for index, item in enumerate(items):
+            obj_id = obj_ids.get(index)
+            if obj_id is None:
+                results[index].update(status='invalid', error='Each overlay needs a valid _id')
+                if ordered:
+                    break
+                continue
+            results[index]['_id'] = str(obj_id)
+            
+            if obj_id in existing:
+                is_valid, message = validate_overlay_data(item, partial=True, stored=existing[obj_id])
+                operation = UpdateOne({'_id': obj_id}, {'$set': overlay_update_fields(item)})
+            elif upsert:
+                # A missing overlay is inserted, so it needs every required field
+                is_valid, message = validate_overlay_data(item)
+                if is_valid:
+                    overlay_data = build_overlay_document(item)
+                    created_at = overlay_data.pop('created_at')
+                    operation = UpdateOne(
+                        {'_id': obj_id},
+                        {'$set': overlay_data, '$setOnInsert': {'created_at': created_at}},
+                        upsert=True
+                    )
+            else:
+                results[index]['status'] = 'not_found'
+                continue
+            
+            if not is_valid:
+                results[index].update(status='invalid', error=message)
+                if ordered:
+                    break
+                continue
+            operations.append(operation)
+            pending.append((index, 'updated'))
+        
+        details, errors = execute_overlay_bulk(operations, ordered)
+        apply_bulk_outcome(pending, details, errors, ordered, results)
+        
+        changed_ids = [ObjectId(result['_id']) for result in results if result['status'] in ('updated', 'upserted')]
+        if changed_ids:
+            overlays_changed(upserted_ids=changed_ids)
+        
+        return bulk_response(results, 200, ordered)
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to update overlays: {str(e)}'}), 500
+
 @app.route('/api/overlays/bulk', methods=['DELETE'])
 def delete_overlays_bulk():
     """Delete multiple overlays"""
@@ -477,6 +2216,7 @@ def delete_overlays_bulk():
       
       
         result = overlays_collection.delete_many({'_id': {'$in': obj_ids}})
+        overlays_changed(deleted_ids=overlay_ids)
         
         return jsonify({
             'message': f'Successfully deleted {result.deleted_count} overlays',
@@ -489,42 +2229,134 @@ def delete_overlays_bulk():
 
 @app.route('/api/overlays/stream/<stream_id>', methods=['GET'])
 def get_stream_overlays(stream_id):
-    """Get overlays associated with a specific stream"""
+    """Get the visible overlays for a stream: its own plus global ones"""
     try:
        
-        if stream_id not in active_streams:
+        if find_stream(stream_id) is None:
             return jsonify({'error': 'Stream not found'}), 404
         
        
        
-        overlays = list(overlays_collection.find({'visible': True}).sort('z_index', 1))
-       
-       
-        serialized_overlays = [serialize_overlay(overlay) for overlay in overlays]
+        def load():
+            overlays = list(overlays_collection.find(stream_overlay_query(stream_id), OVERLAY_FIELDS).sort('z_index', 1))
+            serialized_overlays = [serialize_overlay(overlay) for overlay in overlays]
+            return {
+                'stream_id': stream_id,
+                'overlays': serialized_overlays,
+                'count': len(serialized_overlays)
+            }
         
-        return jsonify({
-            'stream_id': stream_id,
-            'overlays': serialized_overlays,
-            'count': len(serialized_overlays)
-        }), 200
+        return cached_overlay_response(('stream', stream_id), load)
         
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve stream overlays: {str(e)}'}), 500
 
+@app.route('/api/overlays/events')
+def overlay_events_all():
+    """Server-sent events for changes to any overlay"""
+    return overlay_event_stream(None)
+
+@app.route('/api/overlays/stream/<stream_id>/events')
+def overlay_events_for_stream(stream_id):
+    """Server-sent events for changes to a stream's overlays"""
+    if find_stream(stream_id) is None:
+        return jsonify({'error': 'Stream not found'}), 404
+    
+    return overlay_event_stream(stream_id)
+
+# METRICS
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Streamed responses (DVR playlists, events) are timed to their first byte
+        request_latency.observe(time.perf_counter() - started, request.endpoint or 'unmatched', response.status_code)
+    return response
+
+@metrics.register_collector
+def collect_stream_metrics():
+    """Gauges read from the local stream managers at scrape time"""
+    now = time.time()
+    # Shared pipelines appear once per attached stream
+    managers = list({manager.stream_id: manager for manager in list(active_streams.values())}.values())
+    caches = {manager.stream_id: manager.cache.stats() for manager in managers}
+    
+    def per_pipeline(value):
+        return [((manager.stream_id,), value(manager)) for manager in managers]
+    
+    yield ('ffmpeg_fps', 'gauge', 'Frames per second FFmpeg is encoding', ['pipeline'],
+           per_pipeline(lambda manager: manager.progress.get('fps')))
+    yield ('ffmpeg_speed', 'gauge', 'FFmpeg encoding speed relative to realtime', ['pipeline'],
+           per_pipeline(lambda manager: manager.progress.get('speed')))
+    yield ('ffmpeg_bitrate_kbps', 'gauge', 'FFmpeg output bitrate', ['pipeline'],
+           per_pipeline(lambda manager: manager.progress.get('bitrate_kbps')))
+    yield ('ffmpeg_dropped_frames', 'gauge', 'Frames FFmpeg dropped since it started', ['pipeline'],
+           per_pipeline(lambda manager: manager.progress.get('drop_frames')))
+    yield ('ffmpeg_cpu_percent', 'gauge', 'CPU used by the FFmpeg process, in percent of one core', ['pipeline'],
+           per_pipeline(lambda manager: manager.cpu_percent))
+    yield ('pipeline_running', 'gauge', 'Whether the FFmpeg process is running', ['pipeline'],
+           per_pipeline(lambda manager: int(manager.is_running)))
+    yield ('pipeline_health_score', 'gauge', 'Supervisor health score (0-100)', ['pipeline'],
+           per_pipeline(lambda manager: manager.health.get('score')))
+    yield ('pipeline_restarts_total', 'counter', 'FFmpeg restarts by the supervisor', ['pipeline'],
+           per_pipeline(lambda manager: manager.restart_count))
+    yield ('segments_published_total', 'counter', 'Segments added to the primary playlist', ['pipeline'],
+           per_pipeline(lambda manager: manager.segments_published))
+    yield ('segment_age_seconds', 'gauge', 'Time since the playlist last gained a segment; above the segment duration means production lags', ['pipeline'],
+           per_pipeline(lambda manager: round(now - manager.last_update, 3) if manager.last_update else None))
+    yield ('segment_cache_hits_total', 'counter', 'Segment reads served from memory', ['pipeline'],
+           per_pipeline(lambda manager: caches[manager.stream_id]['hits']))
+    yield ('segment_cache_misses_total', 'counter', 'Segment reads that went to storage', ['pipeline'],
+           per_pipeline(lambda manager: caches[manager.stream_id]['misses']))
+    yield ('segment_cache_bytes', 'gauge', 'Bytes held in the segment cache', ['pipeline'],
+           per_pipeline(lambda manager: caches[manager.stream_id]['bytes_cached']))
+    yield ('stream_viewers', 'gauge', f'Clients that fetched a playlist in the last {VIEWER_WINDOW}s', ['stream'],
+           [((stream_id,), count) for stream_id, count in viewers.counts().items()])
+    yield ('active_streams', 'gauge', 'Streams owned by this worker', [], [((), len(active_streams))])
+    yield ('pipeline_degraded', 'gauge', 'Whether the pipeline runs below realtime on an oversubscribed host', ['pipeline'],
+           per_pipeline(lambda manager: int(stream_degraded(manager))))
+    
+    scheduler = cpu_scheduler.stats()
+    yield ('cpu_budget_cores', 'gauge', 'Cores FFmpeg pipelines may reserve (0 is unlimited)', [], [((), scheduler['budget'])])
+    yield ('cpu_reserved_cores', 'gauge', 'Cores reserved by running pipelines', [], [((), scheduler['reserved'])])
+    yield ('admission_waiting', 'gauge', 'Stream starts waiting for CPU budget', [], [((), scheduler['waiting'])])
+    yield ('admission_rejected_total', 'counter', 'Stream starts refused for lack of CPU budget', [], [((), scheduler['rejected'])])
+    
+    connected = db.status()['state'] == 'connected'
+    yield ('mongo_connected', 'gauge', 'Whether MongoDB had a writable server at its last check', [], [((), int(connected))])
+    events = overlay_events.stats()
+    yield ('overlay_event_subscribers', 'gauge', 'Open overlay event streams', [], [((), events['subscribers'])])
+    cache = overlay_cache.stats()
+    yield ('overlay_cache_hits_total', 'counter', 'Overlay list responses served from cache', [], [((), cache['hits'])])
+    yield ('overlay_cache_misses_total', 'counter', 'Overlay list responses loaded from MongoDB', [], [((), cache['misses'])])
+    janitor = stream_janitor.stats()
+    yield ('storage_tracked_bytes', 'gauge', 'Segment bytes on disk for local streams', [], [((), janitor['tracked_bytes'])])
+    yield ('storage_reclaimed_bytes_total', 'counter', 'Bytes the janitor reclaimed', [], [((), janitor['bytes_reclaimed'])])
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics for this worker"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
-    try:
-        
-        db.command('ping')
-        mongo_status = 'connected'
-    except Exception as e:
-        mongo_status = f'error: {str(e)}'
-    
+    # pymongo monitors the servers in the background; report its last result
+    # instead of a ping per request
     return jsonify({
         'status': 'healthy',
-        'mongodb': mongo_status,
+        'mongodb': db.status(),
         'active_streams': len(active_streams),
+        'node': NODE_ID,
+        'overlay_cache': overlay_cache.stats(),
+        'overlay_events': overlay_events.stats(),
+        'storage': dict(stream_janitor.stats(), backend=STORAGE_BACKEND),
+        'scheduler': cpu_scheduler.stats(),
         'timestamp': datetime.utcnow().isoformat()
     }), 200
 
@@ -533,14 +2365,26 @@ def health_check():
 def cleanup_on_exit():
     """Cleanup function to stop all streams on exit"""
     print("Cleaning up streams...")
-    for stream_id, manager in active_streams.items():
+    # Shared pipelines appear once per attached stream; stop each only once
+    for manager in set(active_streams.values()):
         manager.stop_stream()
         manager.cleanup_files()
+    try:
+        stream_registry.remove_owner(NODE_ID)
+    except Exception as e:
+        print(f"Error unregistering streams: {e}")
 
 if __name__ == '__main__':
     import atexit
     atexit.register(cleanup_on_exit)
+    # Don't hold up startup on MongoDB being reachable
+    threading.Thread(target=ensure_overlay_indexes, daemon=True).start()
+    debug = os.getenv('FLASK_DEBUG', '1') == '1'
+    # The debug reloader's parent process never serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_stream_janitor()
     
     print("Starting Flask app with overlay management...")
     print("Make sure MongoDB is running on localhost:27017")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; run wsgi:app under gunicorn in production
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
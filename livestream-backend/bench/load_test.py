@@ -0,0 +1,211 @@
+"""Load-test HLS delivery with many concurrent viewers
+
+Each viewer holds one keep-alive HTTP/1.1 connection and behaves like a
+player: it reloads the media playlist every target duration and downloads
+each new segment once. With --saturate, viewers instead re-download the
+newest segment back to back to find the server's ceiling. Reports segment
+requests/sec, throughput and latency percentiles.
+
+Run it against each serving mode to compare them, e.g.:
+    python app.py                                  # dev server
+    gunicorn -c gunicorn.conf.py wsgi:app          # production
+
+    python bench/load_test.py --stream-id <id> --viewers 1000 --duration 60
+
+Raise the open file limit first (``ulimit -n 4096``); each viewer uses one
+socket.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from segment_latency import parse, percentile
+
+
+class Stats:
+    def __init__(self):
+        self.segment_latencies = []
+        self.playlist_latencies = []
+        self.segment_bytes = 0
+        self.errors = {}
+        self.viewers_connected = 0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 GET client on asyncio streams"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            body = await self._read_chunked()
+        else:
+            body = await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def viewer(base, stream_id, stats, deadline, saturate, start_delay):
+    await asyncio.sleep(start_delay)
+    connection = Connection(base.hostname, base.port or 80)
+    prefix = f"{base.path.rstrip('/')}/api/stream/{stream_id}/"
+    playlist = 'playlist.m3u8'
+    seen = set()
+    connected = False
+
+    while time.monotonic() < deadline:
+        try:
+            started = time.monotonic()
+            status, body = await connection.get(prefix + playlist)
+            stats.playlist_latencies.append(time.monotonic() - started)
+            if status != 200:
+                stats.error(f"playlist_{status}")
+                await asyncio.sleep(1)
+                continue
+            if not connected:
+                stats.viewers_connected += 1
+                connected = True
+
+            text = body.decode()
+            if '#EXT-X-STREAM-INF' in text:
+                # Master playlist: follow the first rendition
+                playlist = next(line for line in text.splitlines() if line and not line.startswith('#'))
+                continue
+
+            _, _, uris = parse(text)
+            wanted = uris[-1:] if saturate else [uri for uri in uris if uri not in seen]
+            for uri in wanted:
+                seen.add(uri)
+                started = time.monotonic()
+                status, body = await connection.get(prefix + uri)
+                if status != 200:
+                    stats.error(f"segment_{status}")
+                    continue
+                stats.segment_latencies.append(time.monotonic() - started)
+                stats.segment_bytes += len(body)
+
+            if not saturate:
+                # Reload once per target duration, like a player at the live edge
+                target = next((float(line.split(':')[1]) for line in text.splitlines()
+                               if line.startswith('#EXT-X-TARGETDURATION:')), 2.0)
+                await asyncio.sleep(target * random.uniform(0.9, 1.1))
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            stats.error(type(e).__name__)
+            connection.close()
+            await asyncio.sleep(0.5)
+
+    connection.close()
+
+
+def summarize(stats, elapsed):
+    def latency(values):
+        if not values:
+            return {'samples': 0}
+        return {
+            'samples': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p95_ms': round(percentile(values, 95) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+            'max_ms': round(max(values) * 1000, 1),
+            'mean_ms': round(statistics.mean(values) * 1000, 1)
+        }
+
+    return {
+        'elapsed_s': round(elapsed, 1),
+        'viewers_connected': stats.viewers_connected,
+        'segment_requests_per_s': round(len(stats.segment_latencies) / elapsed, 1),
+        'segment_mbit_per_s': round(stats.segment_bytes * 8 / elapsed / 1e6, 1),
+        'playlist_requests_per_s': round(len(stats.playlist_latencies) / elapsed, 1),
+        'segment_latency': latency(stats.segment_latencies),
+        'playlist_latency': latency(stats.playlist_latencies),
+        'errors': stats.errors
+    }
+
+
+async def run(args, stream_id):
+    base = urlsplit(args.base_url)
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.ramp + args.duration
+    await asyncio.gather(*(
+        viewer(base, stream_id, stats, deadline, args.saturate, args.ramp * i / args.viewers)
+        for i in range(args.viewers)
+    ))
+    return summarize(stats, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--stream-id')
+    parser.add_argument('--rtsp-url', help='start a stream for this URL instead of using --stream-id')
+    parser.add_argument('--viewers', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which viewers join')
+    parser.add_argument('--saturate', action='store_true', help='request segments back to back')
+    parser.add_argument('--label', help='name for this run in the output, e.g. "dev-server"')
+    args = parser.parse_args()
+
+    stream_id = args.stream_id
+    if not stream_id:
+        body = json.dumps({'rtsp_url': args.rtsp_url}).encode()
+        req = urllib.request.Request(f"{args.base_url}/api/stream/start", data=body,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=60) as response:
+            stream_id = json.loads(response.read())['stream_id']
+        time.sleep(10)
+
+    result = asyncio.run(run(args, stream_id))
+    result.update(label=args.label, stream_id=stream_id, viewers=args.viewers, saturate=args.saturate)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Measure how long segments take to go from "available" to "served"
+
+Follows one stream with blocking playlist reloads, the way an LL-HLS player
+does, and times every new part or segment:
+
+* announce -> served: from the playlist response that first lists the URI
+  until its bytes have been downloaded
+* written -> served: from the file's mtime in the stream directory until its
+  bytes have been downloaded (only with --stream-dir, on the same host)
+
+Usage:
+    python bench/segment_latency.py --rtsp-url rtsp://camera/stream --low-latency
+    python bench/segment_latency.py --stream-id <id> --stream-dir streams/<id>
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+PART_URI = re.compile(r'#EXT-X-PART:.*URI="([^"]+)"')
+
+
+def http_get(url, data=None, timeout=30):
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read()
+
+
+def start_stream(base_url, rtsp_url, low_latency):
+    body = json.dumps({'rtsp_url': rtsp_url, 'low_latency': low_latency}).encode()
+    return json.loads(http_get(f"{base_url}/api/stream/start", data=body))['stream_id']
+
+
+def parse(text):
+    """Return (last complete msn, parts after it, uris in order)"""
+    media_sequence = 0
+    segments = 0
+    pending_parts = 0
+    uris = []
+    for line in text.splitlines():
+        if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            media_sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-PART:'):
+            uris.append(PART_URI.match(line).group(1))
+            pending_parts += 1
+        elif line and not line.startswith('#'):
+            uris.append(line)
+            segments += 1
+            pending_parts = 0
+    return media_sequence + segments - 1, pending_parts, uris
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(name, values):
+    if not values:
+        return {'name': name, 'samples': 0}
+    return {
+        'name': name,
+        'samples': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 1),
+        'p95_ms': round(percentile(values, 95) * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1),
+        'mean_ms': round(statistics.mean(values) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--stream-id')
+    parser.add_argument('--rtsp-url')
+    parser.add_argument('--low-latency', action='store_true')
+    parser.add_argument('--stream-dir', help='local output dir, enables written->served timing')
+    parser.add_argument('--duration', type=float, default=60)
+    args = parser.parse_args()
+
+    stream_id = args.stream_id or start_stream(args.base_url, args.rtsp_url, args.low_latency)
+    playlist_url = f"{args.base_url}/api/stream/{stream_id}/playlist.m3u8"
+
+    seen = set()
+    announce_to_served = []
+    written_to_served = []
+    query = ''
+    deadline = time.time() + args.duration
+
+    while time.time() < deadline:
+        try:
+            text = http_get(playlist_url + query).decode()
+        except urllib.error.HTTPError as e:
+            # 404 until the first playlist lands, 503 on a blocking timeout
+            if e.code not in (404, 503):
+                raise
+            time.sleep(0.2)
+            continue
+        announced_at = time.time()
+        last_msn, pending_parts, uris = parse(text)
+
+        for uri in uris:
+            if uri in seen:
+                continue
+            seen.add(uri)
+            http_get(f"{args.base_url}/api/stream/{stream_id}/{uri}")
+            served_at = time.time()
+            announce_to_served.append(served_at - announced_at)
+            if args.stream_dir:
+                try:
+                    written_to_served.append(served_at - os.stat(os.path.join(args.stream_dir, uri)).st_mtime)
+                except OSError:
+                    pass
+
+        if pending_parts or args.low_latency:
+            query = f"?_HLS_msn={last_msn + 1}&_HLS_part={pending_parts}"
+        else:
+            query = f"?_HLS_msn={last_msn + 1}"
+
+    print(json.dumps({
+        'stream_id': stream_id,
+        'results': [
+            summarize('announce_to_served', announce_to_served),
+            summarize('written_to_served', written_to_served)
+        ]
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,517 @@
+"""End-to-end benchmark: N streams from a local RTSP source, watched by M HLS viewers
+
+Everything runs on this host, so results are comparable between releases:
+
+* a local RTSP server (mediamtx) fed by one FFmpeg publisher looping
+  ``test.mp4`` (``--source file``) or a generated ``lavfi`` test pattern
+  (``--source lavfi``); each stream asks for a different query string on
+  the same path, so every stream gets its own pipeline instead of sharing
+  one (pass ``--shared`` to measure shared ingest instead)
+* optionally the service itself (``--server-cmd``), so its processes can be
+  measured; otherwise give ``--server-pid`` or only the API-side numbers
+  are reported
+* N streams started through ``/api/stream/start``, timed until their first
+  playlist lists a segment
+* M viewers (see load_test.py) spread over the streams for ``--duration``
+
+The result goes to a JSON file: streams per host (streams encoding at
+realtime), CPU per stream, time to first playlist, segment and playlist
+latency percentiles and memory, plus the git commit and host. With
+``--baseline`` the summary is compared against an earlier result.
+
+``--find-capacity`` starts streams one at a time instead, until a stream
+falls below realtime or the service refuses a start, and reports how many
+ran at realtime.
+
+Usage:
+    python bench/suite.py --streams 4 --viewers 200 --duration 60
+    python bench/suite.py --source lavfi --find-capacity --max-streams 32
+    python bench/suite.py --server-cmd "gunicorn -c gunicorn.conf.py wsgi:app" --baseline results/v1.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shlex
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from load_test import Stats, viewer, summarize as summarize_viewers
+from segment_latency import percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A stream encoding slower than this is not keeping up with realtime
+REALTIME_SPEED = 0.95
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = PAGE_SIZE = None
+
+
+def api(base_url, path, body=None, timeout=60):
+    """Return ``(status, parsed JSON or text)`` for an API request"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, payload, content_type = response.status, response.read(), response.headers.get('Content-Type', '')
+    except urllib.error.HTTPError as e:
+        status, payload, content_type = e.code, e.read(), e.headers.get('Content-Type', '')
+    text = payload.decode('utf-8', 'replace')
+    return status, json.loads(text) if content_type.startswith('application/json') else text
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class RtspSource:
+    """Local RTSP server with one FFmpeg publisher looping a file or a lavfi pattern
+
+    With ``--rtsp-url`` nothing is started and streams use that source.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.port = args.rtsp_port or free_port()
+        self.url = args.rtsp_url or f"rtsp://127.0.0.1:{self.port}/bench"
+        self.processes = []
+        self.config = None
+
+    def start(self):
+        if self.args.rtsp_url:
+            return
+        # JSON is valid YAML; turn off every protocol but RTSP
+        config = {'rtspAddress': f":{self.port}", 'rtmp': False, 'hls': False, 'webrtc': False, 'srt': False,
+                  'paths': {'all_others': {}}}
+        fd, self.config = tempfile.mkstemp(suffix='.yml')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f)
+        self._spawn([self.args.mediamtx, self.config])
+        if not wait_for_port('127.0.0.1', self.port, 10):
+            raise RuntimeError(f"RTSP server did not start on port {self.port}")
+
+        self._spawn(self.publisher_command())
+        # Give the publisher time to announce the path before clients ask for it
+        time.sleep(self.args.source_warmup)
+        if self.processes[-1].poll() is not None:
+            raise RuntimeError('RTSP publisher exited; check --ffmpeg and --input')
+
+    def publisher_command(self):
+        ffmpeg = self.args.ffmpeg
+        if self.args.source == 'lavfi':
+            fps = self.args.lavfi_fps
+            return [
+                ffmpeg, '-nostats', '-loglevel', 'error', '-re',
+                '-f', 'lavfi', '-i', f"testsrc2=size={self.args.lavfi_size}:rate={fps}",
+                '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+                '-g', str(fps * 2), '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+                '-f', 'rtsp', '-rtsp_transport', 'tcp', self.url
+            ]
+        return [
+            ffmpeg, '-nostats', '-loglevel', 'error', '-re', '-stream_loop', '-1', '-i', self.args.input,
+            '-c', 'copy', '-f', 'rtsp', '-rtsp_transport', 'tcp', self.url
+        ]
+
+    def _spawn(self, cmd):
+        self.processes.append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL))
+
+    def stream_url(self, index):
+        # The service keys shared pipelines on the whole URL; the server ignores the query
+        if self.args.shared:
+            return self.url
+        return f"{self.url}{'&' if '?' in self.url else '?'}bench={index}"
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.config:
+            os.remove(self.config)
+
+
+class ProcessSampler:
+    """CPU and memory of a process and all its descendants, split into FFmpeg and the rest"""
+
+    def __init__(self, root_pid):
+        self.root_pid = root_pid
+        self.samples = []
+
+    @staticmethod
+    def _stat(pid):
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+        # The command name can contain spaces; fields resume after its closing paren
+        comm = stat[stat.find(b'(') + 1:stat.rfind(b')')].decode('utf-8', 'replace')
+        fields = stat[stat.rfind(b')') + 2:].split()
+        return comm, int(fields[1]), (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(fields[21]) * PAGE_SIZE
+
+    def sample(self):
+        stats = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    stats[int(entry)] = self._stat(entry)
+                except (OSError, ValueError, IndexError):
+                    continue
+        children = {}
+        for pid, (_, ppid, _, _) in stats.items():
+            children.setdefault(ppid, []).append(pid)
+
+        totals = {'time': time.monotonic(), 'ffmpeg_cpu': 0.0, 'server_cpu': 0.0,
+                  'ffmpeg_rss': 0, 'server_rss': 0, 'ffmpeg_processes': 0}
+        pending = [self.root_pid] if self.root_pid in stats else []
+        while pending:
+            pid = pending.pop()
+            comm, _, cpu, rss = stats[pid]
+            kind = 'ffmpeg' if comm.startswith('ffmpeg') else 'server'
+            totals[f'{kind}_cpu'] += cpu
+            totals[f'{kind}_rss'] += rss
+            totals['ffmpeg_processes'] += kind == 'ffmpeg'
+            pending += children.get(pid, [])
+        self.samples.append(totals)
+        return totals
+
+    def summary(self, start_time=None):
+        samples = [s for s in self.samples if start_time is None or s['time'] >= start_time]
+        if len(samples) < 2:
+            return {}
+        elapsed = samples[-1]['time'] - samples[0]['time']
+        # FFmpeg processes come and go, so CPU is summed over sample-to-sample deltas
+        def cpu_percent(kind):
+            used = sum(max(0.0, b[f'{kind}_cpu'] - a[f'{kind}_cpu']) for a, b in zip(samples, samples[1:]))
+            return round(used * 100 / elapsed, 1)
+        return {
+            'server_cpu_percent': cpu_percent('server'),
+            'ffmpeg_cpu_percent': cpu_percent('ffmpeg'),
+            'server_rss_mb_peak': round(max(s['server_rss'] for s in samples) / 2 ** 20, 1),
+            'ffmpeg_rss_mb_peak': round(max(s['ffmpeg_rss'] for s in samples) / 2 ** 20, 1),
+            'ffmpeg_processes': samples[-1]['ffmpeg_processes']
+        }
+
+
+def parse_metrics(text):
+    """Return ``{(name, pipeline): value}`` for per-pipeline gauges in a /metrics response"""
+    values = {}
+    for line in text.splitlines():
+        if line.startswith('#') or 'pipeline="' not in line:
+            continue
+        name, _, rest = line.partition('{')
+        pipeline = rest.split('pipeline="', 1)[1].split('"', 1)[0]
+        try:
+            values[(name, pipeline)] = float(line.rsplit(' ', 1)[1])
+        except ValueError:
+            continue
+    return values
+
+
+class StreamRun:
+    def __init__(self, index, rtsp_url):
+        self.index = index
+        self.rtsp_url = rtsp_url
+        self.stream_id = None
+        self.pipeline_id = None
+        self.start_status = None
+        self.error = None
+        self.first_playlist = None
+        self.speeds = []
+        self.cpu = []
+
+    def result(self):
+        return {
+            'index': self.index,
+            'stream_id': self.stream_id,
+            'pipeline_id': self.pipeline_id,
+            'start_status': self.start_status,
+            'error': self.error,
+            'time_to_first_playlist_ms': round(self.first_playlist * 1000) if self.first_playlist is not None else None,
+            'speed': round(min(self.speeds[-3:]), 2) if self.speeds else None,
+            'ffmpeg_cpu_percent': round(sum(self.cpu) / len(self.cpu), 1) if self.cpu else None
+        }
+
+    @property
+    def realtime(self):
+        # The last few samples, so start-up catch-up doesn't count
+        return bool(self.speeds) and min(self.speeds[-3:]) >= REALTIME_SPEED
+
+
+def start_stream(args, run):
+    """Start one stream and wait until its playlist lists a segment"""
+    body = {'rtsp_url': run.rtsp_url, 'ingest_mode': args.ingest_mode, 'low_latency': args.low_latency}
+    if args.ladder:
+        body['ladder'] = True
+    started = time.monotonic()
+    run.start_status, payload = api(args.base_url, '/api/stream/start', body)
+    if run.start_status != 200:
+        run.error = payload.get('error') if isinstance(payload, dict) else str(payload)[:200]
+        return run
+    run.stream_id = payload['stream_id']
+    run.pipeline_id = payload['pipeline_id']
+
+    deadline = started + args.ready_timeout
+    while time.monotonic() < deadline:
+        status, text = api(args.base_url, f"/api/stream/{run.stream_id}/playlist.m3u8")
+        if status == 200 and ('#EXTINF' in text or '#EXT-X-STREAM-INF' in text):
+            run.first_playlist = time.monotonic() - started
+            return run
+        time.sleep(0.1)
+    run.error = 'no playlist before --ready-timeout'
+    return run
+
+
+def sample_streams(args, runs):
+    """Record each stream's encoding speed and FFmpeg CPU from /metrics"""
+    status, text = api(args.base_url, '/metrics')
+    if status != 200:
+        return
+    values = parse_metrics(text)
+    for run in runs:
+        speed = values.get(('livestream_ffmpeg_speed', run.pipeline_id))
+        cpu = values.get(('livestream_ffmpeg_cpu_percent', run.pipeline_id))
+        if speed is not None:
+            run.speeds.append(speed)
+        if cpu is not None:
+            run.cpu.append(cpu)
+
+
+class Sampler(threading.Thread):
+    """Samples processes and stream speeds every ``interval`` seconds until stopped"""
+
+    def __init__(self, args, runs, processes):
+        super().__init__(daemon=True)
+        self.args = args
+        self.runs = runs
+        self.processes = processes
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.args.sample_interval):
+            if self.processes:
+                self.processes.sample()
+            try:
+                sample_streams(self.args, [run for run in self.runs if run.pipeline_id])
+            except (OSError, urllib.error.URLError) as e:
+                print(f"Sampling failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+async def run_viewers(args, stream_ids):
+    base = urlsplit(args.base_url)
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.ramp + args.duration
+    await asyncio.gather(*(
+        viewer(base, stream_ids[i % len(stream_ids)], stats, deadline, False, args.ramp * i / args.viewers)
+        for i in range(args.viewers)
+    ))
+    return stats, time.monotonic() - started
+
+
+def find_capacity(args, source, runs):
+    """Add streams one by one until one falls below realtime or a start is refused"""
+    for index in range(args.max_streams):
+        run = start_stream(args, StreamRun(index, source.stream_url(index)))
+        runs.append(run)
+        print(f"stream {index}: {run.start_status} {run.error or ''}".rstrip())
+        if run.first_playlist is None:
+            return
+        # Let every pipeline settle with the new load before judging it
+        time.sleep(args.settle)
+        sample_streams(args, [r for r in runs if r.pipeline_id])
+        slow = [r.index for r in runs if r.pipeline_id and not r.realtime]
+        if slow:
+            print(f"streams {slow} fell below {REALTIME_SPEED}x")
+            return
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(summary, baseline_path):
+    """Print each numeric summary value next to the baseline's"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['summary']
+    print(f"\nCompared with {baseline_path}:")
+    for key, value in summary.items():
+        old = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or isinstance(value, bool):
+            continue
+        change = f" ({(value - old) * 100 / old:+.1f}%)" if old else ''
+        print(f"  {key}: {old} -> {value}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--server-cmd', help='start the service with this command (run in livestream-backend)')
+    parser.add_argument('--server-pid', type=int, help='pid of an already running service, for CPU and memory')
+    parser.add_argument('--source', choices=('file', 'lavfi'), default='file')
+    parser.add_argument('--input', default=os.path.join(BACKEND_DIR, 'test.mp4'), help='file for --source file')
+    parser.add_argument('--lavfi-size', default='1280x720')
+    parser.add_argument('--lavfi-fps', type=int, default=30)
+    parser.add_argument('--rtsp-url', help='use this RTSP source instead of starting one')
+    parser.add_argument('--rtsp-port', type=int)
+    parser.add_argument('--mediamtx', default='mediamtx', help='RTSP server binary')
+    parser.add_argument('--ffmpeg', default='ffmpeg')
+    parser.add_argument('--source-warmup', type=float, default=2)
+    parser.add_argument('--shared', action='store_true', help='every stream uses the same URL (shared ingest)')
+    parser.add_argument('--streams', type=int, default=4)
+    parser.add_argument('--start-concurrency', type=int, default=1)
+    parser.add_argument('--ingest-mode', choices=('auto', 'copy', 'transcode'), default='auto')
+    parser.add_argument('--low-latency', action='store_true')
+    parser.add_argument('--ladder', action='store_true')
+    parser.add_argument('--ready-timeout', type=float, default=60)
+    parser.add_argument('--viewers', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which viewers join')
+    parser.add_argument('--sample-interval', type=float, default=2)
+    parser.add_argument('--find-capacity', action='store_true')
+    parser.add_argument('--max-streams', type=int, default=32)
+    parser.add_argument('--settle', type=float, default=15, help='seconds to wait after each capacity step')
+    parser.add_argument('--label')
+    parser.add_argument('--output', help='result file (default bench/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    args = parser.parse_args()
+
+    server = None
+    source = None
+    runs = []
+    try:
+        if args.server_cmd:
+            server = subprocess.Popen(shlex.split(args.server_cmd), cwd=BACKEND_DIR)
+            base = urlsplit(args.base_url)
+            if not wait_for_port(base.hostname, base.port or 80, 30):
+                raise RuntimeError('service did not start listening')
+        server_pid = server.pid if server else args.server_pid
+        processes = ProcessSampler(server_pid) if server_pid and CLOCK_TICKS else None
+
+        source = RtspSource(args)
+        source.start()
+
+        sampler = Sampler(args, runs, processes)
+        started = time.time()
+        if args.find_capacity:
+            find_capacity(args, source, runs)
+        else:
+            with ThreadPoolExecutor(args.start_concurrency) as pool:
+                runs += pool.map(lambda i: start_stream(args, StreamRun(i, source.stream_url(i))), range(args.streams))
+
+        ready = [run for run in runs if run.first_playlist is not None]
+        viewer_stats = None
+        viewers_started = time.monotonic()
+        sampler.start()
+        if ready and args.viewers:
+            stats, elapsed = asyncio.run(run_viewers(args, [run.stream_id for run in ready]))
+            viewer_stats = (stats, elapsed)
+        else:
+            time.sleep(args.duration)
+        sampler.stop()
+    finally:
+        for run in runs:
+            if run.stream_id:
+                try:
+                    api(args.base_url, f"/api/stream/{run.stream_id}/stop", {})
+                except (OSError, urllib.error.URLError):
+                    pass
+        if source is not None:
+            source.stop()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    first_playlist = [run.first_playlist for run in ready]
+    realtime = [run for run in ready if run.realtime]
+    per_stream_cpu = [run.result()['ffmpeg_cpu_percent'] for run in ready if run.cpu]
+    summary = {
+        'streams_requested': len(runs),
+        'streams_ready': len(ready),
+        'streams_rejected': sum(1 for run in runs if run.start_status == 503),
+        'streams_realtime': len(realtime),
+        # In capacity mode, how many streams ran at realtime before one couldn't
+        'streams_per_host': len(realtime),
+        'ffmpeg_cpu_percent_per_stream': round(sum(per_stream_cpu) / len(per_stream_cpu), 1) if per_stream_cpu else None,
+        'time_to_first_playlist_p50_ms': round(percentile(first_playlist, 50) * 1000) if first_playlist else None,
+        'time_to_first_playlist_p99_ms': round(percentile(first_playlist, 99) * 1000) if first_playlist else None
+    }
+    if processes:
+        summary.update(processes.summary(viewers_started))
+        if ready and 'ffmpeg_cpu_percent' in summary:
+            summary['cpu_percent_per_stream'] = round((summary['server_cpu_percent'] + summary['ffmpeg_cpu_percent']) / len(ready), 1)
+    viewers = None
+    if viewer_stats:
+        viewers = summarize_viewers(*viewer_stats)
+        summary.update({
+            'viewers_connected': viewers['viewers_connected'],
+            'segment_p50_ms': viewers['segment_latency'].get('p50_ms'),
+            'segment_p99_ms': viewers['segment_latency'].get('p99_ms'),
+            'playlist_p50_ms': viewers['playlist_latency'].get('p50_ms'),
+            'playlist_p99_ms': viewers['playlist_latency'].get('p99_ms'),
+            'segment_requests_per_s': viewers['segment_requests_per_s'],
+            'viewer_errors': sum(viewers['errors'].values())
+        })
+
+    result = {
+        'benchmark': 'livestream-suite',
+        'format': 1,
+        'label': args.label,
+        'timestamp': started,
+        'git_commit': git_commit(),
+        'host': {
+            'hostname': socket.gethostname(),
+            'cpus': os.cpu_count(),
+            'platform': platform.platform(),
+            'python': platform.python_version()
+        },
+        'config': {key: value for key, value in vars(args).items() if key not in ('baseline', 'output')},
+        'summary': summary,
+        'streams': [run.result() for run in runs],
+        'viewers': viewers
+    }
+
+    output = args.output or os.path.join(BACKEND_DIR, 'bench', 'results', time.strftime('%Y%m%d-%H%M%S', time.localtime(started)) + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(summary, indent=2))
+    print(f"Wrote {output}")
+    if args.baseline:
+        compare(summary, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
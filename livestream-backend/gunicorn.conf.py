@@ -0,0 +1,27 @@
+"""gunicorn settings for serving the API and HLS output in production
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gevent workers multiplex thousands of viewer connections, long LL-HLS
+blocking reloads and overlay event streams on cooperative greenlets
+instead of one OS thread each.
+"""
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+# The worker that starts a stream owns its FFmpeg process; the others serve
+# its output from disk through the stream registry
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '4000'))
+
+# Players fetch a playlist and a segment every target duration; keep their
+# connections open between requests
+keepalive = 30
+timeout = 60
+graceful_timeout = 15
+
+# Per-request access logs cost more than the segment responses themselves
+accesslog = os.getenv('ACCESS_LOG')
+errorlog = '-'
@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import time; run it against mongomock's
+# in-memory server with its stream and DVR directories in a scratch dir
+os.environ['MONGO_URI'] = 'mongomock://'
+os.environ['MONGO_DB'] = 'livestream_test'
+os.environ.setdefault('OVERLAY_ASSET_DIR', os.path.join(os.path.dirname(__file__), 'assets'))
+os.chdir(tempfile.mkdtemp(prefix='livestream-tests-'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as livestream  # noqa: E402
+
+
+@pytest.fixture
+def app_module():
+    return livestream
+
+
+@pytest.fixture
+def client():
+    livestream.overlays_collection.delete_many({})
+    livestream.overlay_cache.invalidate()
+    return livestream.app.test_client()
+
+
+@pytest.fixture
+def overlay_data():
+    return {
+        'name': 'Title',
+        'type': 'text',
+        'content': 'LIVE',
+        'position': {'x': 10, 'y': 20},
+        'size': {'width': 200, 'height': 50}
+    }
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+from utils.cpu_scheduler import AdmissionRejected, CpuScheduler, parse_cpu_list
+
+
+def test_admit_and_release():
+    scheduler = CpuScheduler(budget=2)
+    scheduler.admit('a', 1.5)
+    with pytest.raises(AdmissionRejected):
+        scheduler.admit('b', 1, timeout=0)
+
+    scheduler.release('a')
+    scheduler.admit('b', 1)
+    assert scheduler.reserved == 1
+    assert scheduler.stats()['rejected'] == 1
+
+
+def test_cost_is_clamped_to_the_budget():
+    scheduler = CpuScheduler(budget=2)
+    scheduler.admit('big', 5)
+    assert scheduler.reserved == 2
+
+
+def test_queued_start_is_admitted_on_release():
+    scheduler = CpuScheduler(budget=1, poll_interval=0.05)
+    scheduler.admit('a', 1)
+    admitted = threading.Event()
+
+    def start():
+        scheduler.admit('b', 1, timeout=5)
+        admitted.set()
+
+    waiter = threading.Thread(target=start)
+    waiter.start()
+    assert not admitted.wait(0.1)
+
+    scheduler.release('a')
+    waiter.join(5)
+    assert admitted.is_set()
+    assert set(scheduler.reservations) == {'b'}
+
+
+def test_full_queue_rejects_immediately():
+    scheduler = CpuScheduler(budget=1, queue_size=0)
+    scheduler.admit('a', 1)
+    with pytest.raises(AdmissionRejected):
+        scheduler.admit('b', 1)
+
+
+def test_external_reservations_count_against_the_budget():
+    scheduler = CpuScheduler(budget=2, external=lambda: 1.5)
+    with pytest.raises(AdmissionRejected):
+        scheduler.admit('a', 1, timeout=0)
+    scheduler.admit('b', 0.5)
+
+
+def test_pipelines_are_pinned_to_the_least_reserved_cpus():
+    scheduler = CpuScheduler(budget=0, cpus=parse_cpu_list('0-2,5'))
+    assert scheduler.admit('a', 1.5) == [0, 1]
+    assert scheduler.admit('b', 1) == [2]
+    assert scheduler.admit('c', 0.1) == [5]
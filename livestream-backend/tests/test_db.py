@@ -0,0 +1,34 @@
+import pytest
+
+from utils.db import Database, client_options
+
+
+def test_connects_on_first_use():
+    database = Database('mongomock://', 'lazy')
+    collection = database['items']
+    assert database.status()['state'] == 'idle'
+
+    collection.insert_one({'a': 1})
+    assert database.status()['state'] == 'connected'
+    assert database.get_collection('items').count_documents({}) == 1
+
+
+def test_attributes_are_not_collections():
+    database = Database('mongomock://', 'lazy')
+    with pytest.raises(AttributeError):
+        database.command
+    with pytest.raises(AttributeError):
+        database.overlays
+
+
+def test_missing_database_name():
+    database = Database('mongomock://', None)
+    with pytest.raises(RuntimeError):
+        database['items'].find_one()
+
+
+def test_uri_options_win():
+    options = client_options('mongodb://db:27017/?maxPoolSize=20&serverSelectionTimeoutMS=300', timeout_ms=5000)
+    assert 'maxPoolSize' not in options
+    assert 'serverSelectionTimeoutMS' not in options
+    assert options['timeoutMS'] == 5000
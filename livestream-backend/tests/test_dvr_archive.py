@@ -0,0 +1,60 @@
+import os
+
+from utils.dvr_archive import DvrArchive
+
+
+def fill(archive, starts, duration=2):
+    for start in starts:
+        archive.append(f'segment {start}'.encode(), duration, wallclock=start + duration)
+
+
+def test_window_selects_segments_by_start_time(tmp_path):
+    archive = DvrArchive(str(tmp_path), window_seconds=3600, chunk_seconds=10)
+    fill(archive, range(1000, 1020, 2))
+
+    assert [entry[5] for entry in archive.window(1004, 1010)] == [1004, 1006, 1008]
+    assert len(archive.window()) == 10
+    assert archive.window(2000) == []
+    assert archive.bounds() == (1000, 1020)
+
+    # Sequence numbers are contiguous and address the stored bytes
+    first = archive.window()[0][0]
+    assert [entry[0] for entry in archive.window()] == list(range(first, first + 10))
+    assert archive.read_segment(first + 3) == b'segment 1006'
+
+
+def test_trim_drops_whole_chunks_past_the_window(tmp_path):
+    archive = DvrArchive(str(tmp_path), window_seconds=25, chunk_seconds=10)
+    fill(archive, range(1000, 1040, 2))
+
+    # The first chunk (1000-1010) ended before 1040 - 25; the second still
+    # overlaps the window, so it is kept whole
+    assert archive.bounds() == (1010, 1040)
+    assert archive.stats()['chunks'] == 3
+    assert not any(name.startswith('000000.') for name in os.listdir(tmp_path))
+    assert archive.read_segment(archive.window()[0][0] - 1) is None
+
+
+def test_readonly_archive_follows_the_writer(tmp_path):
+    writer = DvrArchive(str(tmp_path), window_seconds=25, chunk_seconds=10)
+    fill(writer, range(1000, 1010, 2))
+    reader = DvrArchive(str(tmp_path), window_seconds=25, readonly=True)
+    assert len(reader.window()) == 5
+
+    fill(writer, range(1010, 1040, 2))
+    entries = reader.window()
+    assert entries == writer.window()
+    assert reader.bounds() == (1010, 1040)
+    assert reader.read_segment(entries[-1][0]) == b'segment 1038'
+
+
+def test_playlist_marks_restarts(tmp_path):
+    archive = DvrArchive(str(tmp_path), window_seconds=3600)
+    fill(archive, [1000, 1002])
+    archive.append(b'after restart', 2, wallclock=1010, discontinuity=True)
+
+    playlist = b''.join(archive.playlist(archive.window(), ended=True)).decode()
+    assert playlist.count('#EXT-X-DISCONTINUITY') == 1
+    assert playlist.count('#EXT-X-PROGRAM-DATE-TIME') == 2
+    assert '#EXT-X-PLAYLIST-TYPE:VOD' in playlist
+    assert playlist.endswith('#EXT-X-ENDLIST\n')
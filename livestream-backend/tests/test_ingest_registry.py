@@ -0,0 +1,40 @@
+from utils.ingest_registry import IngestRegistry, ingest_key
+
+
+def test_equivalent_urls_share_a_key():
+    assert ingest_key('RTSP://Cam.Local/live/?b=2&a=1', low_latency=False) == \
+        ingest_key('rtsp://cam.local:554/live?a=1&b=2', low_latency=False)
+    assert ingest_key('rtsp://cam.local/live', low_latency=False) != \
+        ingest_key('rtsp://cam.local/live', low_latency=True)
+
+
+def test_pipeline_is_shared_and_refcounted():
+    registry = IngestRegistry()
+    key = ingest_key('rtsp://cam.local/live')
+    started = []
+
+    def factory():
+        started.append(object())
+        return started[-1]
+
+    first, created = registry.acquire(key, 'viewer-1', factory)
+    assert created
+    second, created = registry.acquire(key, 'viewer-2', factory)
+    assert not created and second is first
+    assert len(started) == 1
+    assert registry.consumers(key) == 2
+
+    assert registry.release(key, 'viewer-1') is False
+    assert registry.release(key, 'viewer-2') is True
+    assert registry.consumers(key) == 0
+    assert registry.key_locks == {}
+
+
+def test_failed_start_leaves_nothing_behind():
+    registry = IngestRegistry()
+    key = ingest_key('rtsp://cam.local/live')
+    assert registry.acquire(key, 'viewer', lambda: None) == (None, False)
+    assert registry.pipelines == {}
+    assert registry.key_locks == {}
+    # Releasing an unknown key is the last consumer going away
+    assert registry.release(key, 'viewer') is True
@@ -0,0 +1,19 @@
+def ladder_command(app_module, source):
+    manager = app_module.StreamManager('ladder-test', 'rtsp://camera/stream', ladder=app_module.ABR_LADDER)
+    manager.ingest_mode = 'transcode'
+    manager.source = source
+    manager._select_renditions()
+    return manager._ladder_args()
+
+
+def test_ladder_maps_audio_of_probed_source(app_module):
+    args = ladder_command(app_module, {'height': 720, 'video': {}, 'audio': {}})
+    assert args.count('0:a:0') == 2
+    assert args[args.index('-var_stream_map') + 1] == 'v:0,a:0,name:720p v:1,a:1,name:360p'
+
+
+def test_unprobed_source_is_encoded_video_only(app_module):
+    # ffprobe failed: mapping a missing audio track would stop FFmpeg
+    args = ladder_command(app_module, None)
+    assert '0:a:0' not in args
+    assert args[args.index('-var_stream_map') + 1] == 'v:0,name:1080p v:1,name:720p v:2,name:360p'
@@ -0,0 +1,77 @@
+from utils.hls_playlist import parse_playlist
+from utils.ll_hls import LowLatencyPlaylist
+
+# FFmpeg numbers chunks from the epoch in microseconds (-hls_start_number_source epoch_us)
+EPOCH_START = 1_700_000_000_000_001
+
+
+def chunks(first, count, duration=0.5):
+    """FFmpeg's chunk playlist, as parse_playlist returns it"""
+    return {
+        'media_sequence': first,
+        'segments': [{'uri': f'part{seq:05d}.m4s', 'duration': duration} for seq in range(first, first + count)]
+    }
+
+
+def test_parts_are_grouped_into_segments():
+    playlist = LowLatencyPlaylist(0.5, parts_per_segment=3, list_size=3)
+    first = EPOCH_START - EPOCH_START % 3
+    msn = first // 3
+
+    completed = playlist.update(chunks(first, 5))
+    assert completed == [(msn, f'seg{msn}.m4s', [f'part{seq}.m4s' for seq in range(first, first + 3)])]
+    assert playlist.durations[msn] == 1.5
+
+    rendered = parse_playlist(playlist.render().decode())
+    assert rendered['media_sequence'] == msn
+    assert [segment['uri'] for segment in rendered['segments']] == [f'seg{msn}.m4s']
+    assert rendered['pending_parts'] == 2
+    assert rendered['preload_hint'] == f'part{first + 5}.m4s'
+
+
+def test_blocking_reload_waits_for_the_requested_part():
+    playlist = LowLatencyPlaylist(0.5, parts_per_segment=3, list_size=3)
+    first = EPOCH_START - EPOCH_START % 3
+    msn = first // 3
+    playlist.update(chunks(first, 5))
+
+    assert playlist.has(msn)
+    assert not playlist.has(msn + 1)
+    assert playlist.has(msn + 1, 1)
+    assert not playlist.has(msn + 1, 2)
+
+    playlist.update(chunks(first + 5, 1))
+    assert playlist.has(msn + 1)
+    assert playlist.preload_hint() == f'part{first + 6}.m4s'
+
+
+def test_numbering_after_an_epoch_restart():
+    before = LowLatencyPlaylist(0.5, parts_per_segment=3, list_size=3)
+    before.update(chunks(EPOCH_START - EPOCH_START % 3, 6))
+
+    # A restarted FFmpeg gets a fresh playlist and numbers from a later
+    # epoch, which needn't fall on a segment boundary
+    restart = EPOCH_START + 60_000_001
+    assert restart % 3
+    after = LowLatencyPlaylist(0.5, parts_per_segment=3, list_size=3)
+    completed = after.update(chunks(restart, 6))
+
+    # The partial segment before the first full one is never published
+    first_msn = restart // 3 + 1
+    assert [msn for msn, _, _ in completed] == [first_msn]
+    assert first_msn > before.last_msn
+    assert after.media_sequence == first_msn
+    assert after.preload_hint() == f'part{restart + 6}.m4s'
+    assert parse_playlist(after.render().decode())['media_sequence'] == first_msn
+
+
+def test_window_keeps_list_size_segments():
+    playlist = LowLatencyPlaylist(0.5, parts_per_segment=2, list_size=3)
+    for seq in range(0, 20, 2):
+        playlist.update(chunks(seq, 2))
+
+    assert playlist.segment_uris() == ['seg7.m4s', 'seg8.m4s', 'seg9.m4s']
+    assert min(int(uri[4:-4]) for uri in playlist.part_uris()) == 14
+    # Only the last two segments list their parts
+    rendered = parse_playlist(playlist.render().decode())
+    assert rendered['parts'] == [f'part{seq:05d}.m4s' for seq in range(16, 20)]
@@ -0,0 +1,36 @@
+from utils.metrics import Counter, Histogram
+
+
+def test_counter_folds_pending_observations():
+    counter = Counter('bytes_total', 'Bytes', ['stream', 'kind'])
+    counter.inc(10, 'a', 'segment')
+    counter.inc(5, 'a', 'segment')
+    counter.inc(1, 'b', 'playlist')
+    assert counter.render()[2:] == [
+        'bytes_total{stream="a",kind="segment"} 15',
+        'bytes_total{stream="b",kind="playlist"} 1'
+    ]
+
+
+def test_remove_drops_series_by_label_prefix():
+    counter = Counter('bytes_total', 'Bytes', ['stream', 'kind'])
+    counter.inc(10, 'a', 'segment')
+    counter.inc(1, 'a', 'playlist')
+    counter.inc(1, 'b', 'playlist')
+    # Observations still pending are dropped too
+    counter.remove('a')
+    assert counter.render()[2:] == ['bytes_total{stream="b",kind="playlist"} 1']
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3'
+    ]
@@ -0,0 +1,47 @@
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+
+from utils.overlay_cache import OverlayCache
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_cache_hits_until_invalidated():
+    cache = OverlayCache(mongomock.MongoClient().db.overlays, poll_interval=60)
+    loads = []
+    load = lambda: loads.append(1) or b'[]'
+
+    etag, body = cache.get('list', load)
+    assert cache.get('list', load) == (etag, body)
+    assert len(loads) == 1
+
+    cache.invalidate()
+    cache.get('list', load)
+    assert len(loads) == 2
+
+
+def test_polling_notifies_on_changes_from_elsewhere():
+    # mongomock has no change streams, so the cache falls back to polling
+    collection = mongomock.MongoClient().db.overlays
+    changes = []
+    cache = OverlayCache(collection, poll_interval=0.02, on_change=changes.append)
+    cache.start()
+    assert wait_for(lambda: cache.mode == 'polling')
+    time.sleep(0.05)
+    changes.clear()
+
+    cache.get('list', lambda: b'[]')
+    collection.insert_one({'name': 'a', 'updated_at': datetime.utcnow() + timedelta(seconds=1)})
+
+    assert wait_for(lambda: changes)
+    assert changes[0] is None
+    assert cache.stats()['entries'] == 0
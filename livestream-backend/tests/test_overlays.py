@@ -0,0 +1,203 @@
+def create(client, data, **changes):
+    response = client.post('/api/overlays', json=dict(data, **changes))
+    assert response.status_code == 201, response.json
+    return response.json['overlay']
+
+
+def test_create_and_get(client, overlay_data):
+    overlay = create(client, overlay_data)
+    assert overlay['name'] == 'Title'
+    assert overlay['visible'] is True
+    assert overlay['stream_id'] is None
+
+    response = client.get(f"/api/overlays/{overlay['_id']}")
+    assert response.status_code == 200
+    assert response.json['overlay']['content'] == 'LIVE'
+
+
+def test_get_unknown_and_invalid_ids(client):
+    assert client.get('/api/overlays/000000000000000000000000').status_code == 404
+    assert client.get('/api/overlays/not-an-id').status_code == 400
+
+
+def test_create_requires_fields(client, overlay_data):
+    del overlay_data['content']
+    response = client.post('/api/overlays', json=overlay_data)
+    assert response.status_code == 400
+    assert 'content' in response.json['error']
+
+
+def test_create_rejects_non_numeric_geometry(client, overlay_data):
+    # An emptied number input in the player arrives as null
+    for changes in ({'position': {'x': None, 'y': 1}}, {'size': {'width': '10', 'height': 5}},
+                    {'position': {'x': True, 'y': 1}}, {'style': {'opacity': 2}}):
+        response = client.post('/api/overlays', json=dict(overlay_data, **changes))
+        assert response.status_code == 400, changes
+
+
+def test_image_content_must_be_url_or_asset(client, overlay_data):
+    image = dict(overlay_data, type='image')
+    create(client, image, content='https://example.com/logo.png')
+    create(client, image, content='logo.png')
+    for content in ('/etc/passwd', '../conftest.py', 'file:///etc/passwd', 'concat:a|b', 'missing.png'):
+        response = client.post('/api/overlays', json=dict(image, content=content))
+        assert response.status_code == 400, content
+
+
+def test_update_checks_image_content(client, overlay_data):
+    image = create(client, overlay_data, type='image', content='logo.png')
+    response = client.put(f"/api/overlays/{image['_id']}", json={'content': '/etc/passwd'})
+    assert response.status_code == 400
+    assert client.get(f"/api/overlays/{image['_id']}").json['overlay']['content'] == 'logo.png'
+
+    # Text content becomes an FFmpeg input once the overlay turns into an image
+    text = create(client, overlay_data, content='/etc/passwd')
+    assert client.put(f"/api/overlays/{text['_id']}", json={'type': 'image'}).status_code == 400
+    assert client.put(f"/api/overlays/{text['_id']}", json={'type': 'image', 'content': 'logo.png'}).status_code == 200
+
+
+def test_bulk_update_checks_image_content(client, overlay_data):
+    image = create(client, overlay_data, type='image', content='logo.png')
+    text = create(client, overlay_data, content='/etc/passwd')
+    response = client.patch('/api/overlays/bulk', json={'ordered': False, 'overlays': [
+        {'_id': image['_id'], 'content': '/etc/passwd'},
+        {'_id': text['_id'], 'type': 'logo'},
+        {'_id': image['_id'], 'content': 'https://example.com/logo.png'}
+    ]})
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == ['invalid', 'invalid', 'updated']
+    assert client.get(f"/api/overlays/{text['_id']}").json['overlay']['type'] == 'text'
+
+
+def test_font_file_must_be_a_known_font(client, overlay_data):
+    create(client, overlay_data, style={'fontFile': 'Test.ttf'})
+    for font in ('/etc/passwd', '../logo.png', 'Missing.ttf'):
+        response = client.post('/api/overlays', json=dict(overlay_data, style={'fontFile': font}))
+        assert response.status_code == 400, font
+
+
+def test_list_pages_newest_first(client, overlay_data):
+    names = [create(client, overlay_data, name=f'overlay {i}')['name'] for i in range(5)]
+
+    first = client.get('/api/overlays?limit=2').json
+    assert [o['name'] for o in first['overlays']] == names[:-3:-1]
+    assert first['next_cursor']
+
+    second = client.get(f"/api/overlays?limit=2&cursor={first['next_cursor']}").json
+    assert [o['name'] for o in second['overlays']] == names[2:0:-1]
+
+
+def test_list_filters(client, overlay_data):
+    create(client, overlay_data, name='hidden', visible=False)
+    create(client, overlay_data, name='scoped', stream_id='cam1')
+    create(client, overlay_data, name='image', type='image', content='https://example.com/a.png')
+
+    assert {o['name'] for o in client.get('/api/overlays?type=image').json['overlays']} == {'image'}
+    visible = client.get('/api/overlays?visible_only=true').json['overlays']
+    assert 'hidden' not in {o['name'] for o in visible}
+
+
+def test_list_revalidates_with_etag(client, overlay_data):
+    create(client, overlay_data)
+    response = client.get('/api/overlays')
+    etag = response.headers['ETag']
+
+    assert client.get('/api/overlays', headers={'If-None-Match': etag}).status_code == 304
+
+    # Any write invalidates the cached list
+    create(client, overlay_data, name='second')
+    response = client.get('/api/overlays', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['count'] == 2
+
+
+def test_update(client, overlay_data):
+    overlay = create(client, overlay_data)
+    response = client.put(f"/api/overlays/{overlay['_id']}", json={'name': 'Renamed', 'position': {'x': 50, 'y': 50}})
+    assert response.status_code == 200
+    assert response.json['overlay']['name'] == 'Renamed'
+    assert response.json['overlay']['position'] == {'x': 50, 'y': 50}
+
+
+def test_update_rejects_null_required_field(client, overlay_data):
+    overlay = create(client, overlay_data)
+    response = client.put(f"/api/overlays/{overlay['_id']}", json={'name': None})
+    assert response.status_code == 400
+    assert client.get(f"/api/overlays/{overlay['_id']}").json['overlay']['name'] == 'Title'
+
+
+def test_update_needs_a_known_field(client, overlay_data):
+    overlay = create(client, overlay_data)
+    response = client.put(f"/api/overlays/{overlay['_id']}", json={'foo': 1})
+    assert response.status_code == 400
+
+
+def test_update_unknown_overlay(client):
+    response = client.put('/api/overlays/000000000000000000000000', json={'name': 'x'})
+    assert response.status_code == 404
+
+
+def test_delete(client, overlay_data):
+    overlay = create(client, overlay_data)
+    assert client.delete(f"/api/overlays/{overlay['_id']}").status_code == 200
+    assert client.get(f"/api/overlays/{overlay['_id']}").status_code == 404
+    assert client.delete(f"/api/overlays/{overlay['_id']}").status_code == 404
+
+
+def test_bulk_create(client, overlay_data):
+    response = client.post('/api/overlays/bulk', json={
+        'overlays': [overlay_data, dict(overlay_data, name=None), dict(overlay_data, name='Second')],
+        'ordered': False
+    })
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == ['created', 'invalid', 'created']
+    assert client.get('/api/overlays').json['count'] == 2
+
+
+def test_bulk_update(client, overlay_data):
+    first = create(client, overlay_data)
+    second = create(client, overlay_data, name='Second')
+    response = client.patch('/api/overlays/bulk', json={'overlays': [
+        {'_id': first['_id'], 'visible': False},
+        {'_id': second['_id'], 'z_index': 5}
+    ]})
+    assert response.status_code == 200, response.json
+    assert [r['status'] for r in response.json['results']] == ['updated', 'updated']
+    assert client.get(f"/api/overlays/{first['_id']}").json['overlay']['visible'] is False
+    assert client.get(f"/api/overlays/{second['_id']}").json['overlay']['z_index'] == 5
+
+
+def test_bulk_update_validates_items(client, overlay_data):
+    overlay = create(client, overlay_data)
+    response = client.patch('/api/overlays/bulk', json={'ordered': False, 'overlays': [
+        {'_id': overlay['_id'], 'foo': 1},
+        {'_id': overlay['_id'], 'content': None},
+        {'_id': '000000000000000000000000', 'name': 'x'}
+    ]})
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == ['invalid', 'invalid', 'not_found']
+
+
+def test_bulk_upsert(client, overlay_data):
+    overlay_id = '65f000000000000000000001'
+    response = client.patch('/api/overlays/bulk', json={
+        'upsert': True,
+        'overlays': [dict(overlay_data, _id=overlay_id)]
+    })
+    assert response.status_code == 200, response.json
+    assert client.get(f'/api/overlays/{overlay_id}').json['overlay']['name'] == 'Title'
+
+
+def test_bulk_delete(client, overlay_data):
+    ids = [create(client, overlay_data, name=f'o{i}')['_id'] for i in range(3)]
+    response = client.delete('/api/overlays/bulk', json={'overlay_ids': ids[:2]})
+    assert response.status_code == 200
+    assert response.json['deleted_count'] == 2
+    assert [o['_id'] for o in client.get('/api/overlays').json['overlays']] == ids[2:]
+
+
+def test_health_reports_cached_mongo_state(client, overlay_data):
+    create(client, overlay_data)
+    mongodb = client.get('/api/health').json['mongodb']
+    assert mongodb['backend'] == 'mongomock'
+    assert mongodb['state'] == 'connected'
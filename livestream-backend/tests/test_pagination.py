@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip():
+    document = {'_id': ObjectId(), 'created_at': datetime(2024, 5, 1, 12, 30, 15, 250000)}
+    assert decode_cursor(encode_cursor(document)) == (document['created_at'], document['_id'])
+
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', 'eyJ0IjoxfQ', encode_cursor({'_id': 'x', 'created_at': datetime(2024, 1, 1)})])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        keyset_filter(cursor)
+
+
+def test_pages_cover_every_document_once():
+    collection = mongomock.MongoClient().db.items
+    # Ties on created_at are broken by _id
+    stamps = [datetime(2024, 1, 1, 0, 0, i // 3) for i in range(10)]
+    collection.insert_many([{'created_at': stamp} for stamp in stamps])
+    order = [('created_at', -1), ('_id', -1)]
+
+    seen = []
+    query = {}
+    while True:
+        page = list(collection.find(query).sort(order).limit(4))
+        seen += [doc['_id'] for doc in page]
+        if len(page) < 4:
+            break
+        query = keyset_filter(encode_cursor(page[-1]))
+
+    assert seen == [doc['_id'] for doc in collection.find().sort(order)]
+    assert len(set(seen)) == 10
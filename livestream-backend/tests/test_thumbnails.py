@@ -0,0 +1,19 @@
+import os
+from types import SimpleNamespace
+
+from utils.thumbnail_cache import ThumbnailCache
+
+
+def test_thumbnail_url_changes_with_the_thumbnail(app_module, tmp_path):
+    path = tmp_path / 'thumbnail.jpg'
+    manager = SimpleNamespace(thumbnails=ThumbnailCache(str(path), ttl=0))
+    assert app_module.thumbnail_url('cam', manager) == '/api/stream/cam/thumbnail.jpg'
+
+    path.write_bytes(b'first')
+    first = app_module.thumbnail_url('cam', manager)
+    assert first.startswith('/api/stream/cam/thumbnail.jpg?v=')
+    assert app_module.thumbnail_url('cam', manager) == first
+
+    path.write_bytes(b'second frame')
+    os.utime(path, ns=(0, 10 ** 9))
+    assert app_module.thumbnail_url('cam', manager) != first
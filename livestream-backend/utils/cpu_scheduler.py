@@ -0,0 +1,208 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Cores per pipeline profile, relative to one 1080p libx264 (ultrafast) encode
+COPY_COST = 0.1
+DECODE_COST_1080P = 0.25
+BURN_IN_COST_1080P = 0.2
+DEFAULT_HEIGHT = 1080
+
+
+class AdmissionRejected(Exception):
+    """A pipeline can't be started within the CPU budget"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_cpu_list(value):
+    """Parse a CPU list like ``"2-7,10"`` into a sorted list of CPU numbers"""
+    cpus = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def pipeline_cost(ingest_mode, output_heights=(), source_height=None, burn_in=False, encode_cost_1080p=1.0):
+    """Estimated cores a pipeline needs
+
+    Stream copy only remuxes. Transcoding decodes the source once and runs
+    one libx264 encode per output (one at the source height without a
+    ladder); decode, encode and burn-in costs scale with pixel count.
+    """
+    if ingest_mode == 'copy':
+        return COPY_COST
+    source = source_height or DEFAULT_HEIGHT
+    scale = (source / 1080) ** 2
+    cost = DECODE_COST_1080P * scale
+    cost += sum(encode_cost_1080p * (min(height, source) / 1080) ** 2 for height in output_heights or [source])
+    if burn_in:
+        cost += BURN_IN_COST_1080P * scale
+    return round(cost, 2)
+
+
+def host_load():
+    """One-minute load average per core, or None where it isn't available"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class CpuScheduler:
+    """Admit FFmpeg pipelines against a budget of ``budget`` CPU cores
+
+    ``admit`` reserves a pipeline's estimated cost. When it doesn't fit, the
+    caller waits in a FIFO queue for up to ``queue_timeout`` seconds while
+    running pipelines release their reservations; a full queue or a timeout
+    raise AdmissionRejected. A pipeline costing more than the whole budget
+    is charged the budget, so it still starts on an otherwise idle host. A
+    budget of 0 admits everything and only tracks reservations.
+
+    ``external()`` returns the cores reserved by other processes sharing the
+    host (other workers' pipelines), so the budget covers the whole host.
+    It is cached for ``poll_interval`` seconds, and since releases there
+    aren't signalled, queued starts re-check it that often.
+
+    With ``cpus``, each pipeline is also given the ``ceil(cost)`` least
+    reserved CPUs of that set to pin FFmpeg to.
+    """
+
+    def __init__(self, budget, queue_size=8, queue_timeout=30.0, cpus=None, external=None, poll_interval=1.0):
+        self.budget = budget
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.cpus = cpus or None
+        self.external = external
+        self.poll_interval = poll_interval
+        self._external_value = (None, 0)
+        self.condition = threading.Condition()
+        # pipeline id -> {'cost': cores, 'cpus': pinned CPUs or None}
+        self.reservations = {}
+        self.queue = deque()
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    @property
+    def reserved(self):
+        return round(sum(reservation['cost'] for reservation in self.reservations.values()), 2)
+
+    def _external(self):
+        if self.external is None:
+            return 0
+        checked_at, value = self._external_value
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= self.poll_interval:
+            value = self.external()
+            self._external_value = (now, value)
+        return value
+
+    def _fits(self, cost):
+        return not self.budget or self.reserved + self._external() + cost <= self.budget
+
+    def admit(self, pipeline_id, cost, timeout=None):
+        """Reserve ``cost`` cores for a pipeline, waiting in the queue if needed; return its CPUs"""
+        timeout = self.queue_timeout if timeout is None else timeout
+        if self.budget:
+            cost = min(cost, self.budget)
+        with self.condition:
+            if self._fits(cost) and not self.queue:
+                return self._reserve(pipeline_id, cost)
+            if len(self.queue) >= self.queue_size:
+                self.rejected += 1
+                raise AdmissionRejected('CPU budget exhausted and the start queue is full', retry_after=self.queue_timeout)
+
+            ticket = object()
+            self.queue.append(ticket)
+            self.queued += 1
+            deadline = time.monotonic() + timeout
+            try:
+                # First come, first served: later starts wait behind this one
+                while self.queue[0] is not ticket or not self._fits(cost):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise AdmissionRejected('Timed out waiting for CPU budget', retry_after=self.queue_timeout)
+                    self.condition.wait(min(remaining, self.poll_interval))
+                return self._reserve(pipeline_id, cost)
+            finally:
+                self.queue.remove(ticket)
+                self.condition.notify_all()
+
+    def _reserve(self, pipeline_id, cost):
+        # Caller holds condition
+        self.reservations.pop(pipeline_id, None)
+        cpus = self._assign(cost)
+        self.reservations[pipeline_id] = {'cost': cost, 'cpus': cpus}
+        self.admitted += 1
+        return cpus
+
+    def _assign(self, cost):
+        # Caller holds condition; spread pipelines over the least reserved CPUs
+        if not self.cpus:
+            return None
+        load = dict.fromkeys(self.cpus, 0.0)
+        for reservation in self.reservations.values():
+            for cpu in reservation['cpus'] or []:
+                if cpu in load:
+                    load[cpu] += reservation['cost'] / len(reservation['cpus'])
+        count = min(len(self.cpus), max(1, math.ceil(cost)))
+        return sorted(sorted(self.cpus, key=lambda cpu: load[cpu])[:count])
+
+    def update(self, pipeline_id, cost):
+        """Replace an admitted pipeline's estimate (e.g. once its source is probed); return its CPUs
+
+        An admitted pipeline is never refused here, even if the new cost
+        takes the host over budget.
+        """
+        with self.condition:
+            reservation = self.reservations.pop(pipeline_id, None)
+            if reservation is not None and reservation['cost'] == cost:
+                self.reservations[pipeline_id] = reservation
+                return reservation['cpus']
+            cpus = self._assign(cost)
+            self.reservations[pipeline_id] = {'cost': cost, 'cpus': cpus}
+            self.condition.notify_all()
+            return cpus
+
+    def release(self, pipeline_id):
+        with self.condition:
+            if self.reservations.pop(pipeline_id, None) is not None:
+                self.condition.notify_all()
+
+    def oversubscribed(self):
+        """True when reservations exceed the budget or more tasks are runnable than there are cores"""
+        if self.budget:
+            with self.condition:
+                reserved = self.reserved
+            if reserved + self._external() > self.budget:
+                return True
+        load = host_load()
+        return load is not None and load >= 1
+
+    def stats(self):
+        load = host_load()
+        external = self._external()
+        with self.condition:
+            return {
+                'budget': self.budget,
+                'reserved': self.reserved,
+                'reserved_elsewhere': round(external, 2),
+                'pipelines': len(self.reservations),
+                'waiting': len(self.queue),
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'host_load': round(load, 2) if load is not None else None,
+                'cpus': self.cpus
+            }
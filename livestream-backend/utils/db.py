@@ -0,0 +1,160 @@
+import threading
+import time
+from urllib.parse import parse_qsl
+
+from pymongo import MongoClient, monitoring
+
+MOCK_SCHEME = 'mongomock://'
+
+
+def client_options(uri, max_pool_size=50, timeout_ms=5000, connect_timeout_ms=2000, max_idle_ms=60000):
+    """Pool and timeout settings for MongoClient; options given in ``uri`` win
+
+    pymongo's defaults wait up to 30 seconds for a server and let a
+    single slow query hold a request indefinitely. ``timeout_ms`` bounds
+    server selection and every operation (including waiting for a pooled
+    connection), so a slow or unreachable MongoDB fails a request quickly
+    instead of tying up the worker.
+    """
+    options = {
+        'maxPoolSize': max_pool_size,
+        'minPoolSize': 0,
+        'maxIdleTimeMS': max_idle_ms,
+        'connectTimeoutMS': connect_timeout_ms,
+        'serverSelectionTimeoutMS': timeout_ms,
+        'timeoutMS': timeout_ms,
+        'appname': 'livestream-backend'
+    }
+    given = {key.lower() for key, _ in parse_qsl(uri.partition('?')[2])}
+    return {name: value for name, value in options.items() if name.lower() not in given}
+
+
+class ConnectivityMonitor(monitoring.TopologyListener):
+    """Track whether MongoDB is reachable from pymongo's own server monitoring
+
+    pymongo checks every server in the background (heartbeatFrequencyMS,
+    and immediately after a failed operation), so health can report the
+    latest result without a round trip of its own.
+    """
+
+    def __init__(self):
+        self.state = 'connecting'
+        self.error = None
+        self.since = time.time()
+
+    def opened(self, event):
+        pass
+
+    def description_changed(self, event):
+        description = event.new_description
+        if description.has_writable_server():
+            state, error = 'connected', None
+        elif description.has_readable_server():
+            state, error = 'read_only', 'No writable server'
+        else:
+            errors = [str(server.error) for server in description.server_descriptions().values() if server.error]
+            if not errors and self.state == 'connecting':
+                # Servers not checked yet
+                return
+            state, error = 'disconnected', errors[0] if errors else 'No reachable server'
+        if state != self.state:
+            print(f"MongoDB {state}" + (f": {error}" if error else ''))
+            self.since = time.time()
+        self.state = state
+        self.error = error
+
+    def closed(self, event):
+        self.state = 'closed'
+        self.since = time.time()
+
+
+class _LazyCollection:
+    """Stand-in for a collection that opens the client on first use"""
+
+    def __init__(self, database, name):
+        self._database = database
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._database.db[self._name], attr)
+
+    def __repr__(self):
+        return f"<lazy collection {self._name}>"
+
+
+class Database:
+    """MongoDB access that connects on first use
+
+    Importing the app never touches the network: the client is built when
+    a collection is first used, so a slow or missing MongoDB can't stall
+    startup. ``db['overlays']`` or ``db.get_collection('overlays')``
+    return collection stand-ins that can be handed out at import time.
+    Unlike pymongo's Database, attribute access doesn't name collections,
+    so a typo raises AttributeError instead of opening an empty one.
+
+    A ``mongomock://`` URI uses mongomock's in-memory server instead, for
+    tests and benchmarks without MongoDB.
+    """
+
+    def __init__(self, uri, name, event_listeners=(), **options):
+        self.uri = uri or 'mongodb://localhost:27017'
+        self.name = name
+        self.event_listeners = list(event_listeners)
+        self.options = options
+        self.connectivity = ConnectivityMonitor()
+        self.mock = self.uri.startswith(MOCK_SCHEME)
+        self.lock = threading.Lock()
+        self._client = None
+        self._db = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self.lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    @property
+    def db(self):
+        if self._db is None:
+            if not self.name:
+                raise RuntimeError('MONGO_DB is not set')
+            self._db = self.client[self.name]
+        return self._db
+
+    def _connect(self):
+        if self.mock:
+            try:
+                import mongomock
+            except ImportError:
+                raise RuntimeError('mongomock:// needs the mongomock package (pip install mongomock)')
+            self.connectivity.state = 'connected'
+            return mongomock.MongoClient()
+        options = client_options(self.uri, **self.options)
+        listeners = self.event_listeners + [self.connectivity]
+        return MongoClient(self.uri, event_listeners=listeners, **options)
+
+    def get_collection(self, name):
+        return _LazyCollection(self, name)
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def status(self):
+        """Last known connectivity, without contacting the server"""
+        if self._client is None:
+            return {'state': 'idle', 'backend': 'mongomock' if self.mock else 'mongodb'}
+        return {
+            'state': self.connectivity.state,
+            'since': self.connectivity.since,
+            'error': self.connectivity.error,
+            'backend': 'mongomock' if self.mock else 'mongodb'
+        }
+
+    def close(self):
+        with self.lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+                self._db = None
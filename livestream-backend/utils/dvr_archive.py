@@ -0,0 +1,295 @@
+import bisect
+import math
+import os
+import shutil
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+# seq, offset, length, duration, start wallclock, flags
+INDEX_RECORD = struct.Struct('<QIIfdB')
+DISCONTINUITY = 0x01
+LINES_PER_CHUNK = 500
+
+
+class DvrArchive:
+    """Append-only archive of one stream's segments with a compact time index
+
+    Segments are appended to chunk files (``<chunk>.dat``), and each gets a
+    fixed-size record in the chunk's index (``<chunk>.idx``): archive
+    sequence number, offset and length in the data file, duration, start
+    wallclock and flags. A new chunk starts every ``chunk_seconds`` or when
+    the fMP4 init segment changes (stored as ``<chunk>.init``). Chunks older
+    than ``window_seconds`` are deleted whole, so trimming never rewrites
+    anything.
+
+    The index is kept in memory sorted by wallclock, so finding a time range
+    is a bisect and a playlist is streamed straight from the slice. A
+    read-only archive (another worker's) follows the index files with
+    ``refresh()``, reading only records appended since the last call.
+    """
+
+    def __init__(self, directory, window_seconds, chunk_seconds=600, extension='.ts', readonly=False):
+        self.directory = directory
+        self.window_seconds = window_seconds
+        self.chunk_seconds = chunk_seconds
+        self.extension = extension
+        self.readonly = readonly
+        self.lock = threading.Lock()
+
+        # One entry per segment: (seq, chunk, offset, length, duration, wallclock, flags)
+        self.entries = []
+        self.times = []
+        self.chunks = {}
+        self.chunk = None
+        self.chunk_started = None
+        self.init_segment = None
+        self.max_duration = 0.0
+        self.bytes = 0
+        self._index_sizes = {}
+        self._data_file = None
+        self._index_file = None
+
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def refresh(self):
+        """Load index records written since the last call"""
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith('.idx'))
+        except OSError:
+            return
+        with self.lock:
+            present = {int(name[:-4]) for name in names}
+            # The writer trimmed these
+            for chunk in sorted(c for c in self.chunks if c not in present):
+                self._drop_chunk(chunk)
+            for chunk in sorted(present):
+                if self.entries and chunk < self.entries[-1][1]:
+                    continue
+                self._load_index(chunk)
+
+    def _load_index(self, chunk):
+        # Caller holds lock
+        path = os.path.join(self.directory, f"{chunk:06d}.idx")
+        done = self._index_sizes.get(chunk, 0)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(done)
+                data = f.read()
+        except OSError:
+            return
+        # Ignore a record still being written
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        for offset in range(0, usable, INDEX_RECORD.size):
+            seq, position, length, duration, wallclock, flags = INDEX_RECORD.unpack_from(data, offset)
+            self._add(chunk, (seq, chunk, position, length, duration, wallclock, flags))
+        self._index_sizes[chunk] = done + usable
+        if chunk not in self.chunks:
+            self.chunks[chunk] = os.path.exists(os.path.join(self.directory, f"{chunk:06d}.init"))
+
+    def _add(self, chunk, entry):
+        self.entries.append(entry)
+        self.times.append(entry[5])
+        self.max_duration = max(self.max_duration, entry[4])
+        self.bytes += entry[3]
+
+    def append(self, data, duration, wallclock=None, discontinuity=False, init_segment=None):
+        """Archive one finished segment that ended at ``wallclock`` (default now)"""
+        end = wallclock if wallclock is not None else time.time()
+        start = end - duration
+        with self.lock:
+            if (self._data_file is None or start - self.chunk_started >= self.chunk_seconds
+                    or (init_segment is not None and init_segment != self.init_segment)):
+                self._rotate(start, init_segment)
+            offset = self._data_file.tell()
+            if offset + len(data) > 0xFFFFFFFF:
+                self._rotate(start, init_segment)
+                offset = 0
+            self._data_file.write(data)
+            self._data_file.flush()
+
+            # A new archive numbers from the wallclock in ms, so segment URLs
+            # stay unique when a stream's archive is recreated
+            seq = self.entries[-1][0] + 1 if self.entries else int(start * 1000)
+            flags = DISCONTINUITY if discontinuity else 0
+            entry = (seq, self.chunk, offset, len(data), duration, start, flags)
+            self._index_file.write(INDEX_RECORD.pack(seq, offset, len(data), duration, start, flags))
+            self._index_file.flush()
+            self._index_sizes[self.chunk] += INDEX_RECORD.size
+            self._add(self.chunk, entry)
+            self._trim(end)
+        return seq
+
+    def _rotate(self, started, init_segment):
+        # Caller holds lock
+        self._close_files()
+        self.chunk = self.entries[-1][1] + 1 if self.entries else 0
+        self.chunk_started = started
+        base = os.path.join(self.directory, f"{self.chunk:06d}")
+        if init_segment is not None:
+            with open(base + '.init', 'wb') as f:
+                f.write(init_segment)
+        self.init_segment = init_segment
+        self.chunks[self.chunk] = init_segment is not None
+        self._data_file = open(base + '.dat', 'ab')
+        self._index_file = open(base + '.idx', 'ab')
+        self._index_sizes[self.chunk] = 0
+
+    def _trim(self, now):
+        # Caller holds lock; drop whole chunks that ended before the window
+        cutoff = now - self.window_seconds
+        while len(self.chunks) > 1:
+            oldest = min(self.chunks)
+            end = self._chunk_end(oldest)
+            if end and self.times[end - 1] + self.entries[end - 1][4] >= cutoff:
+                return
+            self._drop_chunk(oldest)
+            for suffix in ('.dat', '.idx', '.init'):
+                try:
+                    os.remove(os.path.join(self.directory, f"{oldest:06d}{suffix}"))
+                except OSError:
+                    pass
+
+    def _drop_chunk(self, chunk):
+        # Caller holds lock; ``chunk`` is the oldest, so its entries are a prefix
+        end = self._chunk_end(chunk)
+        self.bytes -= sum(entry[3] for entry in self.entries[:end])
+        del self.entries[:end]
+        del self.times[:end]
+        self.chunks.pop(chunk, None)
+        self._index_sizes.pop(chunk, None)
+
+    def _chunk_end(self, chunk):
+        # Entries are ordered by chunk; find the first entry past ``chunk``
+        low, high = 0, len(self.entries)
+        while low < high:
+            middle = (low + high) // 2
+            if self.entries[middle][1] <= chunk:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def window(self, start=None, end=None):
+        """Return the entries whose segments start in ``[start, end)``"""
+        if self.readonly:
+            self.refresh()
+        with self.lock:
+            low = bisect.bisect_left(self.times, start) if start is not None else 0
+            high = bisect.bisect_left(self.times, end) if end is not None else len(self.times)
+            return self.entries[low:high]
+
+    def bounds(self):
+        """Return the ``(start, end)`` wallclock covered by the archive, or None"""
+        if self.readonly:
+            self.refresh()
+        with self.lock:
+            if not self.entries:
+                return None
+            return self.times[0], self.times[-1] + self.entries[-1][4]
+
+    def segment_uri(self, entry):
+        return f"dvr/{entry[0]}{self.extension}"
+
+    def init_uri(self, chunk):
+        return f"dvr/init{chunk}.mp4"
+
+    def playlist(self, entries, ended, append_only=False):
+        """Yield an HLS playlist for ``entries`` in pieces
+
+        With ``ended`` it is a complete VOD playlist. Otherwise players keep
+        reloading it: an EVENT playlist if ``append_only`` (its start is
+        fixed, so reloads only add segments), else a sliding window with no
+        playlist type.
+        """
+        target = max(1, math.ceil(self.max_duration))
+        header = ['#EXTM3U', '#EXT-X-VERSION:7', f'#EXT-X-TARGETDURATION:{target}']
+        if ended or append_only:
+            header.append(f'#EXT-X-PLAYLIST-TYPE:{"VOD" if ended else "EVENT"}')
+        header.append('#EXT-X-MEDIA-SEQUENCE:0' if not entries else f'#EXT-X-MEDIA-SEQUENCE:{entries[0][0]}')
+        yield ('\n'.join(header) + '\n').encode()
+
+        lines = []
+        previous = None
+        for entry in entries:
+            seq, chunk, _, _, duration, wallclock, flags = entry
+            starts_run = previous is None or flags & DISCONTINUITY or seq != previous[0] + 1
+            if previous is not None and starts_run:
+                lines.append('#EXT-X-DISCONTINUITY')
+            if (previous is None or chunk != previous[1]) and self.chunks.get(chunk):
+                lines.append(f'#EXT-X-MAP:URI="{self.init_uri(chunk)}"')
+            if starts_run:
+                stamp = datetime.fromtimestamp(wallclock, timezone.utc).isoformat(timespec='milliseconds')
+                lines.append(f'#EXT-X-PROGRAM-DATE-TIME:{stamp.replace("+00:00", "Z")}')
+            lines.append(f'#EXTINF:{duration:.5f},')
+            lines.append(self.segment_uri(entry))
+            previous = entry
+            if len(lines) >= LINES_PER_CHUNK:
+                yield ('\n'.join(lines) + '\n').encode()
+                lines = []
+
+        if ended:
+            lines.append('#EXT-X-ENDLIST')
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode()
+
+    def read_segment(self, seq):
+        """Return an archived segment's bytes, or None if it was trimmed"""
+        entry = self._entry(seq)
+        if entry is None and self.readonly:
+            self.refresh()
+            entry = self._entry(seq)
+        return self._read(entry) if entry is not None else None
+
+    def _entry(self, seq):
+        with self.lock:
+            if not self.entries or not self.entries[0][0] <= seq <= self.entries[-1][0]:
+                return None
+            # Sequence numbers are contiguous within the archive
+            return self.entries[seq - self.entries[0][0]]
+
+    def _read(self, entry):
+        _, chunk, offset, length, _, _, _ = entry
+        try:
+            fd = os.open(os.path.join(self.directory, f"{chunk:06d}.dat"), os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.pread(fd, length, offset)
+        finally:
+            os.close(fd)
+
+    def read_init(self, chunk):
+        try:
+            with open(os.path.join(self.directory, f"{chunk:06d}.init"), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'segments': len(self.entries),
+                'bytes': self.bytes,
+                'chunks': len(self.chunks),
+                'start': self.times[0] if self.times else None,
+                'end': self.times[-1] + self.entries[-1][4] if self.entries else None,
+                'window_seconds': self.window_seconds
+            }
+
+    def _close_files(self):
+        for f in (self._data_file, self._index_file):
+            if f is not None:
+                f.close()
+        self._data_file = self._index_file = None
+
+    def close(self):
+        with self.lock:
+            self._close_files()
+
+    def delete(self):
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -1,8 +1,181 @@
+import math
 import subprocess
 import threading
 import os
 import signal
 from datetime import datetime
+from urllib.parse import urlsplit
+
+OVERLAY_IMAGE_TYPES = ('image', 'logo')
+# Fonts drawtext may use live in this subdirectory of the asset directory
+FONT_SUBDIR = 'fonts'
+
+
+def escape_filter_value(value):
+    """Escape a filter option value for use inside -filter_complex
+
+    FFmpeg unescapes twice: once when splitting the filtergraph and once
+    when parsing the filter's options, so each level's specials get a
+    backslash.
+    """
+    def escape(text, specials):
+        return ''.join('\\' + c if c in specials else c for c in text)
+    return escape(escape(str(value), "\\':"), "\\'[],;")
+
+
+def _pixels(value, default):
+    # Styles come from the player, e.g. fontSize "16px"
+    try:
+        return int(float(str(value).replace('px', '')))
+    except (TypeError, ValueError):
+        return default
+
+
+def _number(value, default):
+    # Stored overlays may predate validation, e.g. null from an emptied input
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if math.isfinite(number) else default
+
+
+def _color(value, default='white'):
+    value = str(value or default)
+    return '0x' + value[1:] if value.startswith('#') else value
+
+
+def _asset_path(asset_dir, name):
+    # Only regular files inside asset_dir; absolute paths and ../ escapes resolve outside it
+    if not asset_dir or not isinstance(name, str) or not name:
+        return None
+    root = os.path.realpath(asset_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def overlay_image_input(content, asset_dir):
+    """Return ``(protocols, source)`` for an image overlay, or None if FFmpeg may not open it
+
+    Overlays come from the public overlay API, so FFmpeg is only given an
+    http(s) URL or a file inside ``asset_dir``, and ``-protocol_whitelist``
+    keeps it from following a URL into any other protocol.
+    """
+    if isinstance(content, str) and urlsplit(content).scheme in ('http', 'https') and urlsplit(content).netloc:
+        return 'http,https,tcp,tls', content
+    path = _asset_path(asset_dir, content)
+    return ('file', path) if path else None
+
+
+def overlay_font_file(name, asset_dir):
+    """Path of the font ``name`` from the asset directory's fonts, or None"""
+    if not isinstance(name, str) or os.path.basename(name) != name:
+        return None
+    return _asset_path(asset_dir and os.path.join(asset_dir, FONT_SUBDIR), name)
+
+
+def overlay_text_path(text_dir, overlay):
+    return os.path.join(text_dir, f"{overlay['_id']}.txt")
+
+
+def write_overlay_texts(text_dir, overlays):
+    """Write each text overlay's content to the file its drawtext filter reloads"""
+    os.makedirs(text_dir, exist_ok=True)
+    for overlay in overlays:
+        if overlay['type'] != 'text':
+            continue
+        path = overlay_text_path(text_dir, overlay)
+        # drawtext re-reads the file every frame, so swap it in atomically
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(str(overlay.get('content', '')))
+        os.replace(path + '.tmp', path)
+
+
+def overlay_layout(overlays):
+    """Return everything about ``overlays`` that needs a new filter graph
+
+    Text content is left out because drawtext picks it up live.
+    """
+    layout = []
+    for overlay in sorted(overlays, key=lambda o: str(o['_id'])):
+        layout.append((
+            str(overlay['_id']),
+            overlay['type'],
+            repr(overlay.get('position')),
+            repr(overlay.get('size')),
+            repr(overlay.get('style')),
+            overlay.get('z_index', 1),
+            None if overlay['type'] == 'text' else overlay.get('content')
+        ))
+    return tuple(layout)
+
+
+def build_overlay_filter(overlays, text_dir, asset_dir=None, video_input='0:v', first_input_index=1):
+    """Build a filter_complex chain that burns overlays into a video stream
+
+    Returns ``(input_args, filter_graph, output_label)``. Image and logo
+    overlays become extra looped ``-i`` inputs numbered from
+    ``first_input_index``. Text overlays use drawtext with a ``textfile``
+    that is reloaded every frame. Positions are percentages of the frame,
+    as in the player, and sizes are pixels. Images and fonts FFmpeg isn't
+    allowed to open (see ``overlay_image_input``) are left out.
+    """
+    input_args = []
+    chains = []
+    label = video_input
+    next_input = first_input_index
+
+    for i, overlay in enumerate(sorted(overlays, key=lambda o: o.get('z_index', 1))):
+        position = overlay.get('position', {})
+        size = overlay.get('size', {})
+        style = overlay.get('style') or {}
+        x = _number(position.get('x'), 0)
+        y = _number(position.get('y'), 0)
+        opacity = _number(style.get('opacity'), 1)
+        out_label = f"ov{i}"
+
+        if overlay['type'] == 'text':
+            options = [
+                f"textfile={escape_filter_value(overlay_text_path(text_dir, overlay))}",
+                "reload=1",
+                "expansion=none",
+                f"x=w*{x}/100",
+                f"y=h*{y}/100",
+                f"fontsize={_pixels(style.get('fontSize'), 24)}",
+                f"fontcolor={escape_filter_value(_color(style.get('color')))}",
+                f"alpha={opacity}"
+            ]
+            font_file = overlay_font_file(style.get('fontFile'), asset_dir)
+            if font_file:
+                options.append(f"fontfile={escape_filter_value(font_file)}")
+            chains.append(f"[{label}]drawtext={':'.join(options)}[{out_label}]")
+
+        elif overlay['type'] in OVERLAY_IMAGE_TYPES:
+            image_input = overlay_image_input(overlay.get('content'), asset_dir)
+            if image_input is None:
+                continue
+            protocols, source = image_input
+            # One frame per second is plenty for a still image; overlay keeps
+            # reusing the latest one
+            input_args += ["-protocol_whitelist", protocols, "-loop", "1", "-framerate", "1", "-i", source]
+            width = _pixels(size.get('width'), -1)
+            height = _pixels(size.get('height'), -1)
+            chains.append(
+                f"[{next_input}:v]scale={width}:{height},format=rgba,"
+                f"colorchannelmixer=aa={opacity}[img{i}]"
+            )
+            chains.append(f"[{label}][img{i}]overlay=x=W*{x}/100:y=H*{y}/100[{out_label}]")
+            next_input += 1
+
+        else:
+            continue
+        label = out_label
+
+    if not chains:
+        return [], None, video_input
+    return input_args, ';'.join(chains), label
 
 class FFmpegManager:
     def __init__(self):
@@ -15,20 +188,24 @@ class FFmpegManager:
         output_path = os.path.join(output_dir, f"{stream_id}.m3u8")
         
         # Base command
-        cmd = [
-            'ffmpeg',
-            '-i', rtsp_url,
+        cmd = ['ffmpeg', '-i', rtsp_url]
+        
+        # Add overlays if provided
+        if overlays:
+            text_dir = os.path.join(output_dir, 'overlays')
+            write_overlay_texts(text_dir, overlays)
+            input_args, filter_complex, label = self._build_overlay_filter(overlays, text_dir)
+            if filter_complex:
+                cmd.extend(input_args)
+                cmd.extend(['-filter_complex', filter_complex, '-map', f'[{label}]', '-map', '0:a?'])
+        
+        cmd.extend([
             '-c:v', 'libx264',
             '-preset', 'ultrafast',
             '-tune', 'zerolatency',
             '-c:a', 'aac',
             '-strict', 'experimental',
-        ]
-        
-        # Add overlays if provided
-        if overlays:
-            filter_complex = self._build_overlay_filter(overlays)
-            cmd.extend(['-filter_complex', filter_complex])
+        ])
         
         # HLS output settings
         cmd.extend([
@@ -70,21 +247,9 @@ class FFmpegManager:
                 return True, f"Stream {stream_id} stopped"
             return False, f"Stream {stream_id} not found"
     
-    def _build_overlay_filter(self, overlays):
+    def _build_overlay_filter(self, overlays, text_dir):
         """Build FFmpeg filter_complex for overlays"""
-        filters = []
-        
-        for i, overlay in enumerate(overlays):
-            if overlay['type'] == 'text':
-                text_filter = f"drawtext=text='{overlay['content']}':x={overlay['x']}:y={overlay['y']}:fontsize={overlay.get('size', 24)}:fontcolor={overlay.get('color', 'white')}"
-                filters.append(text_filter)
-            
-            elif overlay['type'] == 'image':
-                # For image overlays, you'd need to handle file paths
-                image_filter = f"overlay=x={overlay['x']}:y={overlay['y']}"
-                filters.append(image_filter)
-        
-        return ','.join(filters) if filters else None
+        return build_overlay_filter(overlays, text_dir)
     
     def get_active_streams(self):
         """Get list of active streams"""
@@ -0,0 +1,35 @@
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_progress(block):
+    """Turn one FFmpeg ``-progress`` key=value block into typed metrics
+
+    ``block`` maps raw keys to string values, e.g. ``{'fps': '25.00',
+    'bitrate': '1024.3kbits/s', 'speed': '1.01x', ...}``.
+    """
+    bitrate = block.get('bitrate', '')
+    speed = block.get('speed', '')
+    out_time_us = _to_int(block.get('out_time_us') or block.get('out_time_ms'))
+
+    return {
+        'frame': _to_int(block.get('frame')),
+        'fps': _to_float(block.get('fps')),
+        'bitrate_kbps': _to_float(bitrate[:-len('kbits/s')]) if bitrate.endswith('kbits/s') else None,
+        'speed': _to_float(speed[:-1]) if speed.endswith('x') else None,
+        'out_time': out_time_us / 1000000 if out_time_us is not None else None,
+        'dup_frames': _to_int(block.get('dup_frames')),
+        'drop_frames': _to_int(block.get('drop_frames')),
+        'total_size': _to_int(block.get('total_size')),
+        'ended': block.get('progress') == 'end'
+    }
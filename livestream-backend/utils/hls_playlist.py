@@ -0,0 +1,52 @@
+def parse_playlist(text):
+    """Parse a media playlist into its sequence number and segment list
+
+    LL-HLS playlists also report ``parts`` (every EXT-X-PART URI),
+    ``pending_parts`` (parts after the last full segment) and the
+    ``preload_hint`` URI.
+    """
+    playlist = {
+        'target_duration': None,
+        'media_sequence': 0,
+        'segments': [],
+        'parts': [],
+        'pending_parts': 0,
+        'preload_hint': None,
+        'ended': False
+    }
+    duration = None
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('#EXT-X-TARGETDURATION:'):
+            playlist['target_duration'] = float(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            playlist['media_sequence'] = int(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF:'):
+            duration = float(line.split(':', 1)[1].split(',')[0])
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist['ended'] = True
+        elif line.startswith('#EXT-X-PART:'):
+            playlist['parts'].append(_attribute(line, 'URI'))
+            playlist['pending_parts'] += 1
+        elif line.startswith('#EXT-X-PRELOAD-HINT:'):
+            playlist['preload_hint'] = _attribute(line, 'URI')
+        elif not line.startswith('#'):
+            playlist['segments'].append({'uri': line, 'duration': duration})
+            playlist['pending_parts'] = 0
+            duration = None
+
+    return playlist
+
+
+def _attribute(line, name):
+    """Return the quoted value of attribute ``name`` in a tag line"""
+    marker = f'{name}="'
+    start = line.find(marker)
+    if start == -1:
+        return None
+    start += len(marker)
+    return line[start:line.find('"', start)]
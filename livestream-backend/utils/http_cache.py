@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+
+# Finished segments never change under their URL
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Don't let a cache hold on to a 404 for a segment that is about to exist
+UNCACHEABLE = 'no-store'
+
+
+def content_etag(data):
+    """Strong ETag value derived from the bytes themselves"""
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def segment_etag(pipeline_id, name, size):
+    """Strong ETag value for a finished segment without hashing it
+
+    Segment names are unique within a pipeline (FFmpeg numbers them from
+    the epoch) and a finished segment is never rewritten, so the pipeline,
+    name and size identify its bytes.
+    """
+    return f"{pipeline_id}-{name}-{size:x}"
+
+
+def playlist_cache_control(target_duration, blocking=False):
+    """Cache-Control for a live playlist with segments of ``target_duration`` seconds
+
+    A plain reload may be served from cache for half a target duration, so
+    players still see each new segment in time. A blocking reload names
+    the segment it waited for, so its answer stays valid for a full one.
+    """
+    seconds = target_duration if blocking else target_duration / 2
+    return f"public, max-age={max(1, math.floor(seconds))}"
+
+
+class GzipCache:
+    """Gzipped playlist bodies, keyed by ETag so each version is compressed once
+
+    Every viewer of a stream reloads the same playlist version, so only the
+    first request after a publish pays for compression.
+    """
+
+    def __init__(self, max_entries=256, level=6):
+        self.max_entries = max_entries
+        self.level = level
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def compress(self, etag, data):
+        with self.lock:
+            compressed = self.entries.get(etag)
+            if compressed is not None:
+                self.entries.move_to_end(etag)
+                return compressed
+        # mtime=0 keeps the output (and so its ETag) identical across workers
+        compressed = gzip.compress(data, self.level, mtime=0)
+        with self.lock:
+            self.entries[etag] = compressed
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return compressed
@@ -0,0 +1,100 @@
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_RTSP_PORT = 554
+
+
+def normalize_rtsp_url(url):
+    """Normalize an RTSP URL so equivalent spellings share one pipeline"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    port = parts.port or DEFAULT_RTSP_PORT
+
+    netloc = f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ''))
+
+
+def ingest_key(rtsp_url, **profile):
+    """Build the registry key for a source URL and output profile"""
+    return (normalize_rtsp_url(rtsp_url),) + tuple(sorted(profile.items()))
+
+
+class IngestRegistry:
+    """Refcounted registry of running ingest pipelines
+
+    Every stream_id that asks for the same source and output profile is
+    attached to one pipeline. The pipeline is only stopped when its last
+    consumer releases it.
+    """
+
+    def __init__(self):
+        self.pipelines = {}
+        self.lock = threading.Lock()
+        # key -> {'lock': start lock, 'users': acquires holding or waiting on it}
+        self.key_locks = {}
+
+    def acquire(self, key, stream_id, factory):
+        """Attach ``stream_id`` to the pipeline for ``key``, starting it with ``factory`` if needed
+
+        ``factory`` returns a started pipeline or None on failure. Returns
+        ``(pipeline, created)``; ``pipeline`` is None if it failed to start.
+        """
+        # Starting a pipeline can block on ffprobe, so only serialize
+        # starts of the same key
+        with self.lock:
+            key_lock = self.key_locks.get(key)
+            if key_lock is None:
+                key_lock = self.key_locks[key] = {'lock': threading.Lock(), 'users': 0}
+            key_lock['users'] += 1
+
+        try:
+            with key_lock['lock']:
+                with self.lock:
+                    entry = self.pipelines.get(key)
+                    if entry:
+                        entry['consumers'].add(stream_id)
+                        return entry['pipeline'], False
+
+                pipeline = factory()
+                with self.lock:
+                    if pipeline is None:
+                        return None, False
+                    self.pipelines[key] = {'pipeline': pipeline, 'consumers': {stream_id}}
+                    return pipeline, True
+        finally:
+            with self.lock:
+                key_lock['users'] -= 1
+                self._drop_key_lock(key)
+
+    def _drop_key_lock(self, key):
+        # Caller holds self.lock; a key's lock lives while it has a pipeline
+        # or an acquire is using it, so keys don't pile up in long-running workers
+        key_lock = self.key_locks.get(key)
+        if key_lock is not None and not key_lock['users'] and key not in self.pipelines:
+            del self.key_locks[key]
+
+    def release(self, key, stream_id):
+        """Detach ``stream_id``; return True if it was the pipeline's last consumer"""
+        with self.lock:
+            entry = self.pipelines.get(key)
+            if not entry:
+                return True
+            entry['consumers'].discard(stream_id)
+            if entry['consumers']:
+                return False
+            del self.pipelines[key]
+            self._drop_key_lock(key)
+            return True
+
+    def consumers(self, key):
+        with self.lock:
+            entry = self.pipelines.get(key)
+            return len(entry['consumers']) if entry else 0
@@ -0,0 +1,141 @@
+import math
+import re
+
+PART_NUMBER = re.compile(r'(\d+)\.m4s$')
+
+
+class LowLatencyPlaylist:
+    """Build an LL-HLS media playlist out of FFmpeg's short fMP4 chunks
+
+    FFmpeg's HLS muxer cannot write EXT-X-PART, so in low-latency mode it is
+    run with ``-hls_time`` set to the part target and a keyframe forced on
+    every part boundary. Each chunk it writes is served as an independent
+    partial segment, and every ``parts_per_segment`` consecutive chunks are
+    concatenated into a full segment named ``seg<msn>.m4s``.
+    """
+
+    def __init__(self, part_target, parts_per_segment, list_size, init_uri='init.mp4'):
+        self.part_target = part_target
+        self.parts_per_segment = parts_per_segment
+        self.list_size = list_size
+        self.init_uri = init_uri
+        self.parts = {}
+        self.part_template = 'part%05d.m4s'
+        self.completed = []
+        self.durations = {}
+        self.last_part = None
+
+    def update(self, playlist):
+        """Take a parsed FFmpeg chunk playlist and return newly completed segments
+
+        Each completed segment is returned as ``(msn, uri, part_uris)``.
+        """
+        for index, segment in enumerate(playlist['segments']):
+            match = PART_NUMBER.search(segment['uri'])
+            seq = int(match.group(1)) if match else playlist['media_sequence'] + index
+            self.parts[seq] = (segment['uri'], segment['duration'] or self.part_target)
+            if self.last_part is None or seq > self.last_part:
+                self.last_part = seq
+
+        if self.last_part is None:
+            return []
+
+        newly_completed = []
+        next_msn = self.completed[-1] + 1 if self.completed else min(self.parts) // self.parts_per_segment
+        while (next_msn + 1) * self.parts_per_segment - 1 <= self.last_part:
+            seqs = self._part_seqs(next_msn)
+            if all(seq in self.parts for seq in seqs):
+                self.completed.append(next_msn)
+                self.durations[next_msn] = sum(self.parts[seq][1] for seq in seqs)
+                newly_completed.append((next_msn, self.segment_uri(next_msn), [self.parts[seq][0] for seq in seqs]))
+            next_msn += 1
+
+        self._trim()
+        return newly_completed
+
+    def segment_uri(self, msn):
+        return f"seg{msn}.m4s"
+
+    def _part_seqs(self, msn):
+        start = msn * self.parts_per_segment
+        return range(start, start + self.parts_per_segment)
+
+    def _trim(self):
+        del self.completed[:-self.list_size]
+        if not self.completed:
+            return
+        first_seq = self.completed[0] * self.parts_per_segment
+        for seq in [s for s in self.parts if s < first_seq]:
+            del self.parts[seq]
+        for msn in [m for m in self.durations if m < self.completed[0]]:
+            del self.durations[msn]
+
+    @property
+    def media_sequence(self):
+        return self.completed[0] if self.completed else None
+
+    @property
+    def last_msn(self):
+        return self.completed[-1] if self.completed else None
+
+    @property
+    def target_duration(self):
+        if not self.durations:
+            return self.part_target * self.parts_per_segment
+        return math.ceil(max(self.durations.values()))
+
+    def segment_uris(self):
+        return [self.segment_uri(msn) for msn in self.completed]
+
+    def part_uris(self):
+        return [uri for uri, _ in self.parts.values()]
+
+    def preload_hint(self):
+        """Return the URI of the next part FFmpeg will write"""
+        if self.last_part is None:
+            return None
+        return self.part_template % (self.last_part + 1)
+
+    def has(self, msn, part=None):
+        """Return True once segment ``msn`` (or part ``part`` of it) is published"""
+        if self.last_msn is not None and self.last_msn >= msn:
+            return True
+        if part is None or self.last_part is None:
+            return False
+        return self.last_part >= msn * self.parts_per_segment + part
+
+    def render(self):
+        """Render the current LL-HLS media playlist"""
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:9',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            f'#EXT-X-PART-INF:PART-TARGET={self.part_target:.3f}',
+            f'#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * self.part_target:.3f}',
+            f'#EXT-X-MEDIA-SEQUENCE:{self.media_sequence or 0}',
+            f'#EXT-X-MAP:URI="{self.init_uri}"'
+        ]
+
+        # Parts are only listed for the last couple of segments; older ones
+        # are addressed as whole segments
+        for msn in self.completed:
+            if msn >= self.completed[-1] - 1:
+                lines.extend(self._part_lines(self._part_seqs(msn)))
+            lines.append(f'#EXTINF:{self.durations[msn]:.5f},')
+            lines.append(self.segment_uri(msn))
+
+        if self.last_part is not None:
+            next_msn = self.completed[-1] + 1 if self.completed else self.last_part // self.parts_per_segment
+            pending = [seq for seq in self._part_seqs(next_msn) if seq <= self.last_part]
+            lines.extend(self._part_lines(pending))
+            lines.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{self.preload_hint()}"')
+
+        return ('\n'.join(lines) + '\n').encode()
+
+    def _part_lines(self, seqs):
+        lines = []
+        for seq in seqs:
+            if seq in self.parts:
+                uri, duration = self.parts[seq]
+                lines.append(f'#EXT-X-PART:DURATION={duration:.5f},URI="{uri}",INDEPENDENT=YES')
+        return lines
@@ -0,0 +1,49 @@
+import json
+import subprocess
+
+# Codecs that can go into MPEG-TS HLS segments without re-encoding
+HLS_VIDEO_CODECS = {'h264'}
+HLS_AUDIO_CODECS = {'aac', 'mp3'}
+
+
+def probe_source(url, ffprobe_path='ffprobe', timeout=10):
+    """Return the first video/audio stream of ``url`` as a dict, or None if probing fails"""
+    cmd = [
+        ffprobe_path,
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,profile,width,height',
+        '-of', 'json',
+        url
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"ffprobe failed for {url}: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"ffprobe failed for {url}: {result.stderr.decode(errors='replace').strip()}")
+        return None
+
+    try:
+        streams = json.loads(result.stdout).get('streams', [])
+    except ValueError:
+        return None
+
+    source = {'video': None, 'audio': None, 'width': None, 'height': None}
+    for stream in streams:
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video' and source['video'] is None:
+            source['video'] = stream.get('codec_name')
+            source['width'] = stream.get('width')
+            source['height'] = stream.get('height')
+        elif codec_type == 'audio' and source['audio'] is None:
+            source['audio'] = stream.get('codec_name')
+    return source
+
+
+def can_copy_video(source):
+    return bool(source) and source['video'] in HLS_VIDEO_CODECS
+
+
+def can_copy_audio(source):
+    return bool(source) and source['audio'] in HLS_AUDIO_CODECS
@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+# Seconds; covers cache hits (sub-millisecond) up to LL-HLS blocking reloads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Recorders fold their own backlog past this many pending observations
+FOLD_THRESHOLD = 4096
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for metrics recorded from request threads
+
+    Recording only appends to a deque, which is atomic without a lock, so
+    the hot path never contends with other requests. Observations are
+    aggregated under the metric's lock when it is rendered, or by the
+    recording thread once more than FOLD_THRESHOLD are pending.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _record(self, labels, value):
+        self.pending.append((labels, value))
+        if len(self.pending) > FOLD_THRESHOLD:
+            self._fold()
+
+    def _fold(self):
+        with self.lock:
+            pending = self.pending
+            while True:
+                try:
+                    labels, value = pending.popleft()
+                except IndexError:
+                    return
+                self._apply(labels, value)
+
+    def _apply(self, labels, value):
+        raise NotImplementedError
+
+    def remove(self, *labels):
+        """Drop every series whose leading label values are ``labels``"""
+        self._fold()
+        with self.lock:
+            for key in [key for key in self.values if key[:len(labels)] == labels]:
+                del self.values[key]
+
+    def render(self):
+        self._fold()
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            lines += self._samples()
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, *labels):
+        self._record(labels, amount)
+
+    def _apply(self, labels, value):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def _samples(self):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                for labels, value in self.values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        self._record(labels, value)
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def _apply(self, labels, value):
+        state = self.values.get(labels)
+        if state is None:
+            # Per-bucket counts (the last is +Inf), sum
+            state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _samples(self):
+        lines = []
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = ('le', _format_value(float(bound)))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class MetricsRegistry:
+    """Counters and histograms, plus collectors that read gauges at scrape time
+
+    A collector is a callable returning ``(name, kind, documentation,
+    labelnames, samples)`` tuples, where samples are ``(label values,
+    value)`` pairs; state that already lives elsewhere (FFmpeg progress,
+    cache stats) is read this way instead of being recorded twice.
+    """
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(self.prefix + name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(self.prefix + name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collector in self.collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, kind, documentation, labelnames, samples in families:
+                name = self.prefix + name
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines += [f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}'
+                          for labels, value in samples if value is not None]
+        return '\n'.join(lines) + '\n'
+
+
+class ViewerTracker:
+    """Estimate each stream's concurrent viewers from recent playlist requests
+
+    Players reload the playlist every target duration, so a client seen in
+    the last ``window`` seconds is watching. Recording is a dict store,
+    atomic without a lock; stale clients are pruned when counted.
+    """
+
+    def __init__(self, window=30):
+        self.window = window
+        self.streams = {}
+
+    def seen(self, stream_id, client):
+        clients = self.streams.get(stream_id)
+        if clients is None:
+            clients = self.streams.setdefault(stream_id, {})
+        clients[client] = time.monotonic()
+
+    def counts(self):
+        cutoff = time.monotonic() - self.window
+        counts = {}
+        for stream_id, clients in list(self.streams.items()):
+            for client, last_seen in list(clients.items()):
+                if last_seen < cutoff:
+                    clients.pop(client, None)
+            if clients:
+                counts[stream_id] = len(clients)
+            else:
+                self.streams.pop(stream_id, None)
+        return counts
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener recording every command's duration"""
+
+    def __init__(self, durations, failures):
+        self.durations = durations
+        self.failures = failures
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.durations.observe(event.duration_micros / 1000000, event.command_name)
+
+    def failed(self, event):
+        self.durations.observe(event.duration_micros / 1000000, event.command_name)
+        self.failures.inc(1, event.command_name)
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+
+
+class OverlayCache:
+    """Cache of serialized overlay list responses, invalidated on any overlay change
+
+    Entries map a query key (e.g. ``('list', type, visible_only)``) to the
+    encoded JSON body and its ETag, so repeat reads cost no database round
+    trip and no serialization. A background thread drops every entry when
+    the collection changes:
+
+    * ``change_stream``: MongoDB change streams (replica sets and Atlas)
+    * ``polling``: fallback for standalone servers, comparing the document
+      count and newest ``updated_at`` every ``poll_interval`` seconds; both
+      are cheap given an index on ``updated_at``
+
+    Writes made through this process also call ``invalidate()`` directly, so
+    they are visible immediately; the watcher covers other processes.
+
+    ``on_change(change)`` is called with each change stream event, or with
+    None when changes may have been missed or polling saw a change.
+    """
+
+    def __init__(self, collection, poll_interval=2.0, max_entries=1024, on_change=None):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.max_entries = max_entries
+        self.on_change = on_change
+        self.entries = {}
+        self.version = 0
+        self.lock = threading.Lock()
+        self.mode = None
+        self._thread = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, loader):
+        """Return ``(etag, body)`` for ``key``, calling ``loader()`` for the body bytes on a miss"""
+        self._ensure_watcher()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = self.version
+
+        body = loader()
+        entry = (hashlib.sha1(body).hexdigest(), body)
+        with self.lock:
+            # Don't store a body loaded before a concurrent invalidation
+            if version == self.version:
+                self.entries[key] = entry
+                # Paginated keys are unbounded; drop the oldest past the cap
+                while len(self.entries) > self.max_entries:
+                    del self.entries[next(iter(self.entries))]
+        return entry
+
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'mode': self.mode,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+    def start(self):
+        """Start watching for changes now rather than on the first read"""
+        self._ensure_watcher()
+
+    def _ensure_watcher(self):
+        if self._thread is not None:
+            return
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            with self.collection.watch(full_document='updateLookup') as stream:
+                self.mode = 'change_stream'
+                for change in stream:
+                    self.invalidate()
+                    self._notify(change)
+        except Exception as e:
+            print(f"Overlay change stream unavailable ({e}); polling every {self.poll_interval}s")
+
+        # Events may have been missed while the stream was failing
+        self.mode = 'polling'
+        self.invalidate()
+        self._notify(None)
+        self._poll()
+
+    def _notify(self, change):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(change)
+        except Exception as e:
+            print(f"Overlay change callback failed: {e}")
+
+    def _poll(self):
+        last = None
+        while True:
+            try:
+                fingerprint = self._fingerprint()
+                if last is not None and fingerprint != last:
+                    self.invalidate()
+                    # Polling can't tell what changed, only that something did
+                    self._notify(None)
+                last = fingerprint
+            except Exception as e:
+                print(f"Overlay cache poll failed: {e}")
+                self.invalidate()
+                last = None
+            time.sleep(self.poll_interval)
+
+    def _fingerprint(self):
+        # Inserts and updates bump the newest updated_at, read from the end of
+        # its index; deletes change the count, which comes from collection
+        # metadata instead of a scan
+        newest = self.collection.find_one({}, {'_id': 0, 'updated_at': 1}, sort=[('updated_at', -1)])
+        return self.collection.estimated_document_count(), newest.get('updated_at') if newest else None
@@ -0,0 +1,131 @@
+import threading
+from collections import deque
+
+
+class Subscription:
+    """One client's bounded queue of encoded overlay events"""
+
+    def __init__(self, stream_id, max_queue):
+        self.stream_id = stream_id
+        self.max_queue = max_queue
+        self.events = deque()
+        self.condition = threading.Condition()
+        self.lagged = False
+
+    def push(self, event):
+        with self.condition:
+            if self.lagged:
+                return
+            if len(self.events) >= self.max_queue:
+                # Too slow to keep up: drop the backlog and tell it to refetch
+                self.events.clear()
+                self.lagged = True
+            else:
+                self.events.append(event)
+            self.condition.notify()
+
+    def next_event(self, timeout):
+        """Return the next ``(name, version, data)`` event, a resync event, or None on timeout"""
+        with self.condition:
+            if not self.events and not self.lagged:
+                self.condition.wait(timeout)
+            if self.events:
+                return self.events.popleft()
+            if self.lagged:
+                self.lagged = False
+                return 'resync', None, '{}'
+            return None
+
+    def accepts(self, scope):
+        # A subscription without a stream sees every overlay
+        return self.stream_id is None or scope is None or scope == self.stream_id
+
+
+class OverlayEventHub:
+    """Fan out overlay changes to every subscribed client as versioned deltas
+
+    Each change is encoded once with ``encode`` and pushed to each matching
+    subscriber's queue, so a write costs N small pushes instead of N list
+    reloads. Events carry a monotonically increasing version. A subscriber
+    whose queue fills up gets a single ``resync`` event instead of the
+    backlog, so one slow client never holds memory or blocks writers.
+    """
+
+    def __init__(self, encode, max_queue=256):
+        self.encode = encode
+        self.max_queue = max_queue
+        self.subscribers = set()
+        self.version = 0
+        self.lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, stream_id=None):
+        subscription = Subscription(stream_id, self.max_queue)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        with self.lock:
+            return bool(self.subscribers)
+
+    def publish_upsert(self, overlay):
+        """Send ``overlay`` to subscribers in its scope, and a delete to everyone else
+
+        The delete covers overlays moved to another stream; clients ignore
+        deletes for overlays they don't have.
+        """
+        # Fan out under the lock so every subscriber sees versions in order
+        with self.lock:
+            self.version += 1
+            self.published += 1
+            if not self.subscribers:
+                return
+
+            scope = overlay.get('stream_id')
+            upsert = ('upsert', self.version, self.encode({'version': self.version, 'overlay': overlay}))
+            delete = None
+            for subscription in self.subscribers:
+                if subscription.accepts(scope):
+                    subscription.push(upsert)
+                else:
+                    if delete is None:
+                        delete = ('delete', self.version, self.encode({'version': self.version, 'overlay_id': overlay['_id']}))
+                    subscription.push(delete)
+
+    def publish_delete(self, overlay_id):
+        with self.lock:
+            self.version += 1
+            self.published += 1
+            if not self.subscribers:
+                return
+
+            event = ('delete', self.version, self.encode({'version': self.version, 'overlay_id': overlay_id}))
+            for subscription in self.subscribers:
+                subscription.push(event)
+
+    def resync_all(self):
+        """Ask every subscriber to refetch, e.g. after missed changes"""
+        with self.lock:
+            self.version += 1
+            self.resyncs += 1
+            for subscription in self.subscribers:
+                with subscription.condition:
+                    subscription.events.clear()
+                    subscription.lagged = True
+                    subscription.condition.notify()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscribers': len(self.subscribers),
+                'version': self.version,
+                'published': self.published,
+                'resyncs': self.resyncs,
+                'lagging': sum(1 for subscription in self.subscribers if subscription.lagged)
+            }
@@ -0,0 +1,35 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(document, field='created_at'):
+    """Build an opaque cursor pointing just past ``document`` in a (field, _id) descending scan"""
+    millis = (document[field] - EPOCH) // timedelta(milliseconds=1)
+    token = json.dumps({'t': millis, 'id': str(document['_id'])}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(timestamp, ObjectId)`` from a cursor, or raise ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        token = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return EPOCH + timedelta(milliseconds=int(token['t'])), ObjectId(token['id'])
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_filter(cursor, field='created_at'):
+    """Query clause matching documents after ``cursor`` in a (field, _id) descending scan"""
+    timestamp, last_id = decode_cursor(cursor)
+    return {'$or': [
+        {field: {'$lt': timestamp}},
+        {field: timestamp, '_id': {'$lt': last_id}}
+    ]}
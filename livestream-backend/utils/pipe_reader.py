@@ -0,0 +1,137 @@
+import os
+import selectors
+import threading
+
+from utils.ffmpeg_progress import parse_progress
+
+
+class _PipeState:
+    def __init__(self, process, on_progress, log_buffer):
+        self.process = process
+        self.on_progress = on_progress
+        self.log_buffer = log_buffer
+        self.partial = {}
+        self.block = {}
+        self.open_fds = set()
+
+
+class FFmpegPipeReader:
+    """Drain the stdout/stderr pipes of every FFmpeg process from one thread
+
+    Pipes are switched to non-blocking mode and multiplexed with a selector,
+    so FFmpeg never stalls on a full pipe and there is one reader thread in
+    total rather than one per stream. stdout carries ``-progress`` key/value
+    blocks, which are parsed and handed to ``on_progress``; stderr lines are
+    appended to a bounded ``log_buffer`` (a ``collections.deque``).
+    """
+
+    def __init__(self, chunk_size=64 * 1024):
+        self.chunk_size = chunk_size
+        self.selector = None
+        self.pending = []
+        self.lock = threading.Lock()
+        self._wakeup_r = None
+        self._wakeup_w = None
+        self._thread = None
+
+    def register(self, process, on_progress, log_buffer):
+        """Start draining ``process``'s pipes"""
+        state = _PipeState(process, on_progress, log_buffer)
+        pipes = [(process.stdout, 'stdout'), (process.stderr, 'stderr')]
+
+        if os.name == 'nt':
+            # Windows selectors only support sockets; drain each pipe with a
+            # plain blocking thread instead
+            for pipe, kind in pipes:
+                threading.Thread(target=self._drain_blocking, args=(state, pipe, kind), daemon=True).start()
+            return
+
+        with self.lock:
+            self._ensure_thread()
+            for pipe, kind in pipes:
+                if pipe is None:
+                    continue
+                os.set_blocking(pipe.fileno(), False)
+                state.open_fds.add(pipe.fileno())
+                self.pending.append((pipe, kind, state))
+        os.write(self._wakeup_w, b'\0')
+
+    def _ensure_thread(self):
+        # Caller holds lock
+        if self._thread and self._thread.is_alive():
+            return
+        self.selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    self._drain_wakeup()
+                    continue
+                pipe, kind, state = key.data
+                try:
+                    chunk = os.read(pipe.fileno(), self.chunk_size)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    chunk = b''
+
+                if chunk:
+                    self._feed(state, pipe.fileno(), kind, chunk)
+                else:
+                    self._close(state, pipe, kind)
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for pipe, kind, state in pending:
+            self.selector.register(pipe.fileno(), selectors.EVENT_READ, (pipe, kind, state))
+
+    def _close(self, state, pipe, kind):
+        fd = pipe.fileno()
+        self.selector.unregister(fd)
+        rest = state.partial.pop(fd, b'')
+        if rest:
+            self._handle_line(state, kind, rest)
+        state.open_fds.discard(fd)
+        pipe.close()
+
+    def _feed(self, state, fd, kind, chunk):
+        data = state.partial.pop(fd, b'') + chunk
+        lines = data.split(b'\n')
+        if lines[-1]:
+            state.partial[fd] = lines[-1]
+        for line in lines[:-1]:
+            self._handle_line(state, kind, line)
+
+    def _handle_line(self, state, kind, raw):
+        line = raw.decode(errors='replace').strip()
+        if not line:
+            return
+        if kind == 'stderr':
+            state.log_buffer.append(line)
+            return
+
+        key, _, value = line.partition('=')
+        state.block[key] = value
+        if key == 'progress':
+            try:
+                state.on_progress(parse_progress(state.block))
+            except Exception as e:
+                state.log_buffer.append(f"progress callback failed: {e}")
+            state.block = {}
+
+    def _drain_blocking(self, state, pipe, kind):
+        for raw in iter(pipe.readline, b''):
+            self._handle_line(state, kind, raw)
+        pipe.close()
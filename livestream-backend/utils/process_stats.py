@@ -0,0 +1,21 @@
+import os
+
+try:
+    CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None
+
+
+def process_cpu_seconds(pid):
+    """Return user+system CPU seconds used by ``pid``, or None where /proc is unavailable"""
+    if CLOCK_TICKS is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name can contain spaces, so split after its closing paren
+    fields = stat[stat.rfind(b')') + 2:].split()
+    utime, stime = int(fields[11]), int(fields[12])
+    return (utime + stime) / CLOCK_TICKS
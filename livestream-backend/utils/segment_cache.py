@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+
+class SegmentCache:
+    """Bounded in-memory cache of one stream's playlists and HLS segments"""
+
+    def __init__(self, max_segments, max_bytes):
+        self.max_segments = max_segments
+        self.max_bytes = max_bytes
+        self.segments = OrderedDict()
+        self.playlists = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_cached = 0
+        self.evictions = 0
+
+    def get(self, name):
+        """Return cached segment bytes, or None on a miss"""
+        with self.lock:
+            data = self.segments.get(name)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_served += len(data)
+            return data
+
+    def peek(self, name):
+        """Return cached segment bytes without counting a hit or miss"""
+        with self.lock:
+            return self.segments.get(name)
+
+    def put(self, name, data):
+        """Store a finished segment and evict down to the budget"""
+        with self.lock:
+            previous = self.segments.pop(name, None)
+            if previous is not None:
+                self.bytes_cached -= len(previous)
+            self.segments[name] = data
+            self.bytes_cached += len(data)
+            self._evict()
+
+    def __contains__(self, name):
+        with self.lock:
+            return name in self.segments
+
+    def set_playlist(self, name, data):
+        """Replace the cached bytes of playlist ``name``"""
+        with self.lock:
+            self.playlists[name] = data
+
+    def get_playlist(self, name):
+        """Return cached playlist bytes, or None if not loaded yet"""
+        with self.lock:
+            data = self.playlists.get(name)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.bytes_served += len(data)
+            return data
+
+    def clear(self):
+        with self.lock:
+            self.segments.clear()
+            self.playlists.clear()
+            self.bytes_cached = 0
+
+    def _evict(self):
+        # Segments arrive in sequence order, so the oldest insert is the one
+        # that slid out of the playlist window first
+        while self.segments and (
+            len(self.segments) > self.max_segments or self.bytes_cached > self.max_bytes
+        ):
+            _, data = self.segments.popitem(last=False)
+            self.bytes_cached -= len(data)
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss/byte counters"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_served': self.bytes_served,
+                'bytes_cached': self.bytes_cached,
+                'segments_cached': len(self.segments),
+                'evictions': self.evictions
+            }
@@ -0,0 +1,226 @@
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.stream_watcher import StreamWatcher
+
+
+class DiskStorage:
+    """FFmpeg writes HLS output into a directory that a StreamWatcher follows
+
+    The directory can be on disk or on a RAM-backed tmpfs; ``kind`` only
+    labels which. Files can be handed to a front proxy (``offload``).
+    """
+
+    offload = True
+    output_args = []
+
+    def __init__(self, directory, kind='disk'):
+        self.directory = directory
+        self.kind = kind
+        self.watcher = None
+
+    @property
+    def mode(self):
+        return self.watcher.mode if self.watcher else None
+
+    def target(self, name):
+        return os.path.join(self.directory, name)
+
+    def start(self, callback):
+        os.makedirs(self.directory, exist_ok=True)
+        self.watcher = StreamWatcher(self.directory, callback)
+        self.watcher.start()
+
+    def stop(self):
+        if self.watcher:
+            self.watcher.stop()
+
+    def read(self, name):
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def stats(self):
+        return {'backend': self.kind, 'watch_mode': self.mode}
+
+
+class MemoryStorage:
+    """FFmpeg uploads HLS output to an UploadServer and files are kept only in memory
+
+    Every completed upload is reported to the callback like a closed file.
+    FFmpeg's DELETEs for expired segments drop them; past ``max_bytes`` the
+    oldest non-playlist files are evicted as well.
+    """
+
+    kind = 'memory'
+    mode = 'upload'
+    # Files never reach a filesystem a front proxy could read
+    offload = False
+    output_args = ['-method', 'PUT', '-http_persistent', '1']
+
+    def __init__(self, server, key, max_bytes):
+        self.server = server
+        self.key = key
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.callback = None
+
+        self.uploads = 0
+        self.evictions = 0
+
+    def target(self, name):
+        return self.server.url(self.key, name)
+
+    def start(self, callback):
+        self.callback = callback
+        self.server.attach(self.key, self)
+
+    def stop(self):
+        self.server.detach(self.key)
+        with self.lock:
+            self.files.clear()
+            self.bytes = 0
+
+    def put(self, name, data):
+        with self.lock:
+            previous = self.files.pop(name, None)
+            self.bytes += len(data) - (len(previous) if previous is not None else 0)
+            self.files[name] = data
+            self.uploads += 1
+            evictable = [n for n in self.files if not n.endswith('.m3u8')]
+            while self.bytes > self.max_bytes and len(evictable) > 1:
+                self.bytes -= len(self.files.pop(evictable.pop(0)))
+                self.evictions += 1
+        if self.callback is not None:
+            self.callback(name, True)
+
+    def delete(self, name):
+        with self.lock:
+            data = self.files.pop(name, None)
+            if data is not None:
+                self.bytes -= len(data)
+
+    def read(self, name):
+        with self.lock:
+            return self.files.get(name)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'backend': self.kind,
+                'files': len(self.files),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'uploads': self.uploads,
+                'evictions': self.evictions
+            }
+
+
+class _UploadHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so FFmpeg's -http_persistent reuses one connection
+    protocol_version = 'HTTP/1.1'
+    upload_server = None
+
+    def do_PUT(self):
+        body = self._read_body()
+        target = self.upload_server.resolve(self.path)
+        if target is None:
+            self._reply(404)
+            return
+        sink, name = target
+        sink.put(name, body)
+        self._reply(201)
+
+    do_POST = do_PUT
+
+    def do_DELETE(self):
+        target = self.upload_server.resolve(self.path)
+        if target is None:
+            self._reply(404)
+            return
+        sink, name = target
+        sink.delete(name)
+        self._reply(204)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    # Skip trailers up to the blank line
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # FFmpeg uploads several files a second per stream
+        pass
+
+
+class UploadServer:
+    """Loopback HTTP endpoint that FFmpeg writes HLS output to with ``-method PUT``
+
+    Requests go to ``/<token>/<key>/<name>`` and are routed to the storage
+    attached under ``key``. The random token keeps other local processes
+    from writing into streams. Started on the first ``attach``.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.token = secrets.token_hex(16)
+        self.sinks = {}
+        self.lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        with self.lock:
+            if self._server is not None:
+                return
+            handler = type('UploadHandler', (_UploadHandler,), {'upload_server': self})
+            self._server = ThreadingHTTPServer((self.host, self.port), handler)
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            print(f"Segment upload server listening on {self.host}:{self.port}")
+
+    def url(self, key, name):
+        return f"http://{self.host}:{self.port}/{self.token}/{key}/{name}"
+
+    def attach(self, key, sink):
+        self.start()
+        with self.lock:
+            self.sinks[key] = sink
+
+    def detach(self, key):
+        with self.lock:
+            self.sinks.pop(key, None)
+
+    def resolve(self, path):
+        """Return ``(sink, name)`` for a request path, or None"""
+        parts = path.split('?', 1)[0].lstrip('/').split('/')
+        if len(parts) != 3 or parts[0] != self.token or not parts[2] or parts[2].startswith('.'):
+            return None
+        with self.lock:
+            sink = self.sinks.get(parts[1])
+        return (sink, parts[2]) if sink is not None else None
+
+    def stats(self):
+        with self.lock:
+            return {'port': self.port if self._server else None, 'streams': len(self.sinks)}
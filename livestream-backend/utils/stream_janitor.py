@@ -0,0 +1,232 @@
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+def directory_size(path):
+    """Total size in bytes of the files under ``path``"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class SegmentLedger:
+    """Segment files one stream has written, oldest first, with their sizes
+
+    Fed from the stream's file watcher, so the janitor never lists the
+    output directory: reaping walks only the entries that dropped out of
+    the playlist since the last pass.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.over_budget = False
+
+        self.reaped_files = 0
+        self.reaped_bytes = 0
+
+    def record(self, name):
+        try:
+            size = os.stat(os.path.join(self.directory, name)).st_size
+        except OSError:
+            return
+        with self.lock:
+            # A rewrite (e.g. after a restart) makes the file the newest again
+            self.bytes += size - self.files.pop(name, 0)
+            self.files[name] = size
+
+    def reap(self, published, retain=0):
+        """Delete files older than the oldest ``published`` one, keeping the newest ``retain`` of them
+
+        Returns ``(files, bytes)`` actually removed; files FFmpeg already
+        deleted are only dropped from the ledger.
+        """
+        with self.lock:
+            stale = []
+            for name in self.files:
+                if name in published:
+                    break
+                stale.append(name)
+            # Players holding the previous playlist may still ask for these
+            stale = stale[:max(0, len(stale) - retain)]
+            sizes = [(name, self.files.pop(name)) for name in stale]
+            self.bytes -= sum(size for _, size in sizes)
+
+        removed = reclaimed = 0
+        for name, size in sizes:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            removed += 1
+            reclaimed += size
+        with self.lock:
+            self.reaped_files += removed
+            self.reaped_bytes += reclaimed
+        return removed, reclaimed
+
+    def stats(self):
+        with self.lock:
+            return {
+                'files': len(self.files),
+                'bytes': self.bytes,
+                'over_budget': self.over_budget,
+                'reaped_files': self.reaped_files,
+                'reaped_bytes': self.reaped_bytes
+            }
+
+
+class StreamJanitor:
+    """Reclaim disk under the ``roots`` directories at startup and every ``interval`` seconds
+
+    Each pass:
+
+    * ``reconcile(startup)`` lets the app adopt or drop streams whose owner
+      died (``startup`` is True on the first pass only)
+    * every local stream reaps segment files that left its playlist but
+      that FFmpeg failed to delete (see SegmentLedger)
+    * a stream over ``stream_budget`` bytes, or all streams while the total
+      is over ``total_budget``, reap without the ``retain`` margin
+    * directories in any root that belong to no live pipeline are purged
+      once they have been idle for ``orphan_grace`` seconds
+
+    ``live_pipelines()`` returns the directory names to keep, or None if
+    that can't be determined right now (the orphan purge is then skipped).
+    ``managers()`` returns the local stream managers. Budgets of 0 are
+    unlimited.
+    """
+
+    def __init__(self, roots, live_pipelines, managers, reconcile=None, interval=10.0,
+                 orphan_grace=60.0, retain=2, stream_budget=0, total_budget=0):
+        self.roots = roots
+        self.live_pipelines = live_pipelines
+        self.managers = managers
+        self.reconcile = reconcile
+        self.interval = interval
+        self.orphan_grace = orphan_grace
+        self.retain = retain
+        self.stream_budget = stream_budget
+        self.total_budget = total_budget
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+        self.runs = 0
+        self.last_run = None
+        self.last_duration = None
+        self.orphans_purged = 0
+        self.files_reaped = 0
+        self.bytes_reclaimed = 0
+        self.tracked_bytes = 0
+        self.over_budget = False
+
+    def start(self):
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        startup = True
+        while True:
+            try:
+                self.run_once(startup)
+            except Exception as e:
+                print(f"Stream janitor error: {e}")
+            startup = False
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self, startup=False):
+        started = time.monotonic()
+        if self.reconcile is not None:
+            try:
+                self.reconcile(startup)
+            except Exception as e:
+                print(f"Stream reconcile failed: {e}")
+
+        managers = list(self.managers())
+        for manager in managers:
+            self._reap(manager, self.retain)
+            if self.stream_budget and manager.ledger.bytes > self.stream_budget:
+                self._reap(manager, 0)
+            manager.ledger.over_budget = bool(self.stream_budget) and manager.ledger.bytes > self.stream_budget
+
+        tracked = sum(manager.ledger.bytes for manager in managers)
+        if self.total_budget and tracked > self.total_budget:
+            for manager in managers:
+                self._reap(manager, 0)
+            tracked = sum(manager.ledger.bytes for manager in managers)
+
+        live = self.live_pipelines()
+        if live is not None:
+            self._purge_orphans(live)
+
+        with self.lock:
+            self.tracked_bytes = tracked
+            self.over_budget = bool(self.total_budget) and tracked > self.total_budget
+            self.runs += 1
+            self.last_run = time.time()
+            self.last_duration = time.monotonic() - started
+
+    def _reap(self, manager, retain):
+        removed, reclaimed = manager.reap_segments(retain)
+        if removed:
+            with self.lock:
+                self.files_reaped += removed
+                self.bytes_reclaimed += reclaimed
+
+    def _purge_orphans(self, live):
+        now = time.time()
+        orphans = []
+        for root in self.roots:
+            try:
+                with os.scandir(root) as entries:
+                    orphans += [entry for entry in entries
+                                if entry.is_dir(follow_symlinks=False) and entry.name not in live]
+            except OSError:
+                continue
+
+        for entry in orphans:
+            try:
+                # Starting pipelines create their directory before registering
+                if now - entry.stat(follow_symlinks=False).st_mtime < self.orphan_grace:
+                    continue
+            except OSError:
+                continue
+            size = directory_size(entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
+            if os.path.exists(entry.path):
+                continue
+            print(f"Purged orphaned stream directory {entry.name} ({size} bytes)")
+            with self.lock:
+                self.orphans_purged += 1
+                self.bytes_reclaimed += size
+
+    def stats(self):
+        with self.lock:
+            return {
+                'runs': self.runs,
+                'last_run': self.last_run,
+                'last_duration_ms': round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+                'orphans_purged': self.orphans_purged,
+                'files_reaped': self.files_reaped,
+                'bytes_reclaimed': self.bytes_reclaimed,
+                'tracked_bytes': self.tracked_bytes,
+                'stream_budget': self.stream_budget,
+                'total_budget': self.total_budget,
+                'over_budget': self.over_budget
+            }
@@ -0,0 +1,206 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pymongo import UpdateMany
+
+
+class SQLiteStreamRegistry:
+    """Stream registry in a local SQLite file, shared by worker processes on one host
+
+    Each row maps a stream_id to its pipeline, output directory, owning node
+    and state; extra keyword arguments to ``register`` are kept as JSON in
+    ``info``. The owner refreshes ``heartbeat_at`` for its rows; a row whose
+    owner stopped heartbeating is considered orphaned.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        # WAL lets readers in other workers proceed while the owner writes
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS streams (
+                stream_id TEXT PRIMARY KEY,
+                pipeline_id TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                state TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                stop_requested INTEGER NOT NULL DEFAULT 0,
+                heartbeat_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                info TEXT NOT NULL DEFAULT '{}'
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS streams_owner ON streams (owner)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS streams_pipeline ON streams (pipeline_id)')
+
+    def _rows(self, sql, params=()):
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        records = []
+        for row in rows:
+            record = dict(zip(columns, row))
+            record.update(json.loads(record.pop('info')))
+            record['stop_requested'] = bool(record['stop_requested'])
+            records.append(record)
+        return records
+
+    def register(self, stream_id, pipeline_id, owner, output_dir, state='starting', **info):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO streams '
+                '(stream_id, pipeline_id, owner, state, output_dir, stop_requested, heartbeat_at, created_at, info) '
+                'VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)',
+                (stream_id, pipeline_id, owner, state, os.path.abspath(output_dir), now, now, json.dumps(info))
+            )
+
+    def get(self, stream_id):
+        records = self._rows('SELECT * FROM streams WHERE stream_id = ?', (stream_id,))
+        return records[0] if records else None
+
+    def list(self, owner=None):
+        if owner is None:
+            return self._rows('SELECT * FROM streams ORDER BY created_at')
+        return self._rows('SELECT * FROM streams WHERE owner = ? ORDER BY created_at', (owner,))
+
+    def remove(self, stream_id):
+        with self.lock:
+            self.conn.execute('DELETE FROM streams WHERE stream_id = ?', (stream_id,))
+
+    def remove_owner(self, owner):
+        with self.lock:
+            self.conn.execute('DELETE FROM streams WHERE owner = ?', (owner,))
+
+    def request_stop(self, stream_id):
+        """Flag a stream for its owner to stop; return False if it isn't registered"""
+        with self.lock:
+            cursor = self.conn.execute('UPDATE streams SET stop_requested = 1 WHERE stream_id = ?', (stream_id,))
+            return cursor.rowcount > 0
+
+    def claim(self, stream_id, owner, stale_before, previous_owner=None):
+        """Take over a stream whose owner stopped heartbeating before ``stale_before``
+
+        Rows owned by ``previous_owner`` are taken regardless of heartbeat.
+        Returns True for exactly one of several workers racing for the row.
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                'UPDATE streams SET owner = ?, heartbeat_at = ? '
+                'WHERE stream_id = ? AND (heartbeat_at < ? OR owner = ?)',
+                (owner, time.time(), stream_id, stale_before, previous_owner)
+            )
+            return cursor.rowcount > 0
+
+    def heartbeat(self, owner, states):
+        """Refresh ``owner``'s rows and pipeline states; return stream_ids asked to stop
+
+        ``states`` maps pipeline_id to its current state.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.execute('UPDATE streams SET heartbeat_at = ? WHERE owner = ?', (now, owner))
+                self.conn.executemany(
+                    'UPDATE streams SET state = ? WHERE pipeline_id = ? AND owner = ?',
+                    [(state, pipeline_id, owner) for pipeline_id, state in states.items()]
+                )
+                rows = self.conn.execute(
+                    'SELECT stream_id FROM streams WHERE owner = ? AND stop_requested = 1', (owner,)
+                ).fetchall()
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return [row[0] for row in rows]
+
+
+class MongoStreamRegistry:
+    """Stream registry in a MongoDB collection, shared by workers on any host"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    def _ensure_indexes(self):
+        if not self._indexed:
+            self.collection.create_index('owner')
+            self.collection.create_index('pipeline_id')
+            self._indexed = True
+
+    @staticmethod
+    def _record(document):
+        if document is None:
+            return None
+        record = dict(document.pop('info', {}))
+        record.update(document)
+        record['stream_id'] = record.pop('_id')
+        return record
+
+    def register(self, stream_id, pipeline_id, owner, output_dir, state='starting', **info):
+        self._ensure_indexes()
+        now = time.time()
+        self.collection.replace_one({'_id': stream_id}, {
+            'pipeline_id': pipeline_id,
+            'owner': owner,
+            'state': state,
+            'output_dir': os.path.abspath(output_dir),
+            'stop_requested': False,
+            'heartbeat_at': now,
+            'created_at': now,
+            'info': info
+        }, upsert=True)
+
+    def get(self, stream_id):
+        return self._record(self.collection.find_one({'_id': stream_id}))
+
+    def list(self, owner=None):
+        query = {} if owner is None else {'owner': owner}
+        return [self._record(document) for document in self.collection.find(query).sort('created_at', 1)]
+
+    def remove(self, stream_id):
+        self.collection.delete_one({'_id': stream_id})
+
+    def remove_owner(self, owner):
+        self.collection.delete_many({'owner': owner})
+
+    def request_stop(self, stream_id):
+        return self.collection.update_one({'_id': stream_id}, {'$set': {'stop_requested': True}}).matched_count > 0
+
+    def claim(self, stream_id, owner, stale_before, previous_owner=None):
+        previous = [{'heartbeat_at': {'$lt': stale_before}}]
+        if previous_owner is not None:
+            previous.append({'owner': previous_owner})
+        result = self.collection.update_one(
+            {'_id': stream_id, '$or': previous},
+            {'$set': {'owner': owner, 'heartbeat_at': time.time()}}
+        )
+        return result.modified_count > 0
+
+    def heartbeat(self, owner, states):
+        operations = [UpdateMany({'owner': owner}, {'$set': {'heartbeat_at': time.time()}})]
+        operations += [
+            UpdateMany({'pipeline_id': pipeline_id, 'owner': owner}, {'$set': {'state': state}})
+            for pipeline_id, state in states.items()
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+        return [document['_id'] for document in
+                self.collection.find({'owner': owner, 'stop_requested': True}, {'_id': 1})]
+
+
+def open_stream_registry(url, db=None):
+    """Open the registry named by ``url``: ``sqlite:///path/to/file.db`` or ``mongodb``"""
+    if url.startswith('sqlite:///'):
+        return SQLiteStreamRegistry(url[len('sqlite:///'):])
+    if url in ('mongo', 'mongodb'):
+        return MongoStreamRegistry(db['streams'])
+    raise ValueError(f"Unsupported STREAM_REGISTRY: {url}")
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import deque
+
+from utils.process_stats import process_cpu_seconds
+
+
+class StreamSupervisor:
+    """Watch every StreamManager, score its health and restart it when FFmpeg fails
+
+    A single background thread checks each pipeline once per ``interval``:
+
+    * liveness: the FFmpeg process has exited while the stream should run
+    * stall: no playlist update for ``stall_timeout`` seconds (or no first
+      playlist within ``startup_timeout``)
+    * production: published segments per minute over the last minute
+    * encoder: fps, speed and bitrate from FFmpeg's ``-progress`` output
+    * CPU: percent of one core used by the FFmpeg process
+
+    Failed pipelines are restarted with exponential backoff. The result is
+    written to ``manager.health`` for the status endpoints.
+    """
+
+    def __init__(self, interval=1.0, stall_timeout=15, startup_timeout=30,
+                 backoff_base=1.0, backoff_max=60.0, stable_after=60.0):
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.managers = {}
+        self.lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, manager):
+        with self.lock:
+            self.managers[manager] = {
+                'failures': 0,
+                'restarts': deque(),
+                'retry_at': None,
+                'production': deque(),
+                'cpu_sample': None
+            }
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def unregister(self, manager):
+        with self.lock:
+            self.managers.pop(manager, None)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.lock:
+                tracked = list(self.managers.items())
+            for manager, record in tracked:
+                try:
+                    self.check(manager, record)
+                except Exception as e:
+                    print(f"Supervisor error for {manager.stream_id}: {e}")
+
+    def check(self, manager, record):
+        now = time.time()
+        if manager.stopped:
+            return
+
+        # Segment production over a sliding one-minute window
+        production = record['production']
+        production.append((now, manager.segments_published))
+        while production and production[0][0] < now - 60:
+            production.popleft()
+        window = now - production[0][0]
+        segments_per_minute = (production[-1][1] - production[0][1]) * 60 / window if window >= 10 else None
+
+        self._sample_cpu(manager, record, now)
+        manager.check_cpu_budget(now)
+
+        while record['restarts'] and record['restarts'][0] < now - 600:
+            record['restarts'].popleft()
+
+        state = self._classify(manager, now)
+
+        if state in ('crashed', 'stalled'):
+            if record['retry_at'] is None:
+                record['failures'] += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (record['failures'] - 1))
+                record['retry_at'] = now + delay
+                print(f"Stream {manager.stream_id} {state}; restarting in {delay:.0f}s")
+            if now >= record['retry_at']:
+                record['retry_at'] = None
+                record['restarts'].append(now)
+                state = 'restarting'
+                manager.restart()
+            else:
+                state = 'backoff'
+        elif state == 'running' and manager.started_at and now - manager.started_at > self.stable_after:
+            record['failures'] = 0
+
+        manager.health = {
+            'state': state,
+            'score': self._score(manager, state, len(record['restarts'])),
+            'restarts': manager.restart_count,
+            'restarts_last_10m': len(record['restarts']),
+            'consecutive_failures': record['failures'],
+            'next_restart_in': round(record['retry_at'] - now, 1) if record['retry_at'] else None,
+            'last_exit_code': manager.last_exit_code,
+            'seconds_since_update': round(now - manager.last_update, 1) if manager.last_update else None,
+            'segments_per_minute': round(segments_per_minute, 1) if segments_per_minute is not None else None,
+            'cpu_percent': round(manager.cpu_percent, 1) if manager.cpu_percent is not None else None,
+            'progress': dict(manager.progress)
+        }
+
+    def _sample_cpu(self, manager, record, now):
+        process = manager.process
+        cpu = process_cpu_seconds(process.pid) if process else None
+        previous = record['cpu_sample']
+        if cpu is not None and previous and previous[2] == process.pid and now > previous[0]:
+            manager.cpu_percent = (cpu - previous[1]) * 100 / (now - previous[0])
+        elif cpu is None:
+            manager.cpu_percent = None
+        record['cpu_sample'] = (now, cpu, process.pid) if cpu is not None else None
+
+    def _classify(self, manager, now):
+        if manager.process is None or manager.process.poll() is not None:
+            if manager.process is not None:
+                manager.last_exit_code = manager.process.returncode
+            manager.is_running = False
+            return 'crashed'
+
+        started_at = manager.started_at or now
+        if manager.last_update is None or manager.last_update < started_at:
+            return 'stalled' if now - started_at > self.startup_timeout else 'starting'
+
+        stall_timeout = max(self.stall_timeout, 3 * (manager.target_duration or 0))
+        if now - manager.last_update > stall_timeout:
+            return 'stalled'
+        return 'running'
+
+    def _score(self, manager, state, recent_restarts):
+        if state in ('crashed', 'backoff', 'restarting'):
+            return 0
+        if state == 'stalled':
+            return 10
+
+        score = 100
+        speed = manager.progress.get('speed')
+        if speed is not None and speed < 1:
+            score -= min(50, int((1 - speed) * 100))
+        score -= min(40, 10 * recent_restarts)
+        if state == 'starting':
+            score = min(score, 50)
+        return max(score, 0)
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+from utils.dvr_archive import DvrArchive
+from utils.hls_playlist import parse_playlist
+from utils.thumbnail_cache import ThumbnailCache, THUMBNAIL_NAME
+
+# Subdirectory where the owning worker mirrors the playlists (and LL-HLS
+# segments) it serves from memory, so other workers can serve them too
+SERVED_DIR = 'served'
+
+PLAYLIST_NAME = 'playlist.m3u8'
+
+
+class DiskStreamView:
+    """Read-only view of a stream owned by another worker process
+
+    Serves the owner's mirrored playlists and the segment files in its
+    output directory, with the same interface the playlist and segment
+    routes use on a StreamManager. Blocking reloads poll the mirrored
+    playlist, since change notifications only reach the owner.
+    """
+
+    def __init__(self, record, extensions, poll_interval=0.1, thumbnail_ttl=2.0):
+        self.stream_id = record['pipeline_id']
+        self.output_dir = record['output_dir']
+        self.served_dir = os.path.join(self.output_dir, SERVED_DIR)
+        self.media_playlists = set(record.get('media_playlists') or [PLAYLIST_NAME])
+        self.part_target = record.get('part_target')
+        self.extensions = tuple(extensions)
+        self.poll_interval = poll_interval
+        self.stopped = False
+        self.lock = threading.Lock()
+        self._playlists = {}
+        self.thumbnails = ThumbnailCache(os.path.join(self.output_dir, THUMBNAIL_NAME), thumbnail_ttl)
+        self.dvr = None
+        if record.get('dvr_dir'):
+            self.dvr = DvrArchive(record['dvr_dir'], None, extension=record.get('dvr_extension') or '.ts', readonly=True)
+
+    def _load(self, name):
+        """Return ``(data, parsed)`` for a mirrored playlist, re-reading it only when it changes"""
+        path = os.path.join(self.served_dir, name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None, None
+        with self.lock:
+            cached = self._playlists.get(name)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None, None
+        parsed = parse_playlist(data.decode('utf-8', 'replace')) if name in self.media_playlists else None
+        with self.lock:
+            self._playlists[name] = (mtime, data, parsed)
+        return data, parsed
+
+    def is_media_playlist(self, name):
+        return name in self.media_playlists
+
+    def target_duration_of(self, name):
+        _, parsed = self._load(name)
+        return parsed['target_duration'] if parsed else None
+
+    def last_msn(self, name=PLAYLIST_NAME):
+        _, parsed = self._load(name)
+        if not parsed or not parsed['segments']:
+            return None
+        return parsed['media_sequence'] + len(parsed['segments']) - 1
+
+    def wait_for_msn(self, msn, part=None, timeout=None, name=PLAYLIST_NAME):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self._has_msn(msn, part, name):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def _has_msn(self, msn, part, name):
+        _, parsed = self._load(name)
+        if not parsed:
+            return False
+        last_msn = parsed['media_sequence'] + len(parsed['segments']) - 1
+        if last_msn >= msn:
+            return True
+        # Parts after the last full segment belong to the next one
+        return part is not None and msn == last_msn + 1 and parsed['pending_parts'] > part
+
+    def read_playlist(self, name=PLAYLIST_NAME):
+        data, _ = self._load(name)
+        return data
+
+    def _segment_path(self, filename):
+        if not filename.endswith(self.extensions) or filename.startswith('.'):
+            return None
+        for directory, relative in ((self.served_dir, f"{SERVED_DIR}/{filename}"), (self.output_dir, filename)):
+            if os.path.isfile(os.path.join(directory, filename)):
+                return os.path.join(directory, filename), relative
+        return None
+
+    def _wait_for_hint(self, filename):
+        _, parsed = self._load(PLAYLIST_NAME)
+        if not parsed or parsed['preload_hint'] != filename or not self.part_target:
+            return
+        deadline = time.monotonic() + 3 * self.part_target
+        while self._segment_path(filename) is None and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+
+    def read_segment(self, filename):
+        self._wait_for_hint(filename)
+        found = self._segment_path(filename)
+        if found is None:
+            return None
+        try:
+            with open(found[0], 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def segment_file(self, filename):
+        """Return the segment's path relative to the stream root, for proxy offload"""
+        self._wait_for_hint(filename)
+        found = self._segment_path(filename)
+        return f"{self.stream_id}/{found[1]}" if found else None
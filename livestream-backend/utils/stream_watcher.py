@@ -0,0 +1,126 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _load_inotify()
+
+
+class StreamWatcher:
+    """Watch a stream output directory and report files FFmpeg has written
+
+    Uses inotify on Linux so a segment is reported the moment FFmpeg closes
+    it. Elsewhere (or if inotify is unavailable) the directory is polled and
+    only files whose mtime changed are reported.
+
+    The callback receives ``(filename, closed)``; ``closed`` is True when the
+    writer is known to be finished with the file.
+    """
+
+    def __init__(self, directory, callback, poll_interval=0.25):
+        self.directory = directory
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        self._stop.clear()
+        if self._start_inotify():
+            self.mode = 'inotify'
+            target = self._run_inotify
+        else:
+            self.mode = 'polling'
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _start_inotify(self):
+        if _libc is None:
+            return False
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return False
+        wd = _libc.inotify_add_watch(fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd], [], [], self.poll_interval)
+            if not readable:
+                continue
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+
+            offset = 0
+            while offset < len(buf):
+                _, mask, _, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b'\0').decode()
+                offset += length
+                if name:
+                    self._notify(name, True)
+
+    def _run_polling(self):
+        mtimes = {}
+        while not self._stop.is_set():
+            seen = {}
+            try:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        try:
+                            seen[entry.name] = entry.stat().st_mtime_ns
+                        except OSError:
+                            continue
+            except OSError:
+                seen = {}
+
+            for name, mtime in seen.items():
+                if mtimes.get(name) != mtime:
+                    self._notify(name, False)
+            mtimes = seen
+            self._stop.wait(self.poll_interval)
+
+    def _notify(self, name, closed):
+        try:
+            self.callback(name, closed)
+        except Exception as e:
+            print(f"Watcher callback error for {name}: {e}")
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+THUMBNAIL_NAME = 'thumbnail.jpg'
+
+
+class ThumbnailCache:
+    """A stream's latest JPEG thumbnail, re-checked on disk at most once per ``ttl`` seconds
+
+    FFmpeg rewrites the file every few seconds as a side output of the
+    stream's pipeline. Between checks every request is answered from
+    memory, so any number of pollers costs no disk I/O and no decoding.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.version = None
+        self.mtime = None
+        self.data = None
+
+    def get(self):
+        """Return ``(data, version, mtime)``, or None until FFmpeg has written a thumbnail"""
+        now = time.monotonic()
+        with self.lock:
+            if self.checked_at is None or now - self.checked_at >= self.ttl:
+                self.checked_at = now
+                self._reload()
+            if self.data is None:
+                return None
+            return self.data, self.version, self.mtime
+
+    def _reload(self):
+        # Caller holds lock; keep the last thumbnail if the file is missing
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        if version == self.version:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        self.data = data
+        self.version = version
+        self.mtime = stat.st_mtime
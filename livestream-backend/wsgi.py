@@ -0,0 +1,10 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app"""
+import atexit
+import threading
+
+from app import app, cleanup_on_exit, ensure_overlay_indexes, start_stream_janitor
+
+atexit.register(cleanup_on_exit)
+start_stream_janitor()
+# Don't hold up worker boot on MongoDB being reachable
+threading.Thread(target=ensure_overlay_indexes, daemon=True).start()
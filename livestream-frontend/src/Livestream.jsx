@@ -66,6 +66,41 @@ const RTSPStreamingApp = () => {
     fetchOverlays();
   }, []);
 
+  // Refresh the stream list; thumbnail URLs carry the thumbnail's version,
+  // so an image is only fetched again once the server has a new one
+  useEffect(() => {
+    const timer = setInterval(fetchStreams, 10000);
+    return () => clearInterval(timer);
+  }, []);
+
+  // Keep overlays in sync with changes pushed by the server, from any client
+  useEffect(() => {
+    const events = new EventSource(`${API_BASE}/overlays/events`);
+    let connectedOnce = false;
+
+    events.addEventListener('ready', () => {
+      // Changes may have been missed while reconnecting
+      if (connectedOnce) fetchOverlays();
+      connectedOnce = true;
+    });
+    // The server dropped our backlog; reload the list instead
+    events.addEventListener('resync', () => fetchOverlays());
+    events.addEventListener('upsert', (e) => applyOverlay(JSON.parse(e.data).overlay));
+    events.addEventListener('delete', (e) => {
+      const { overlay_id } = JSON.parse(e.data);
+      setOverlays(prev => prev.filter(o => o._id !== overlay_id));
+    });
+
+    return () => events.close();
+  }, []);
+
+  const applyOverlay = (overlay) => {
+    setOverlays(prev => prev.some(o => o._id === overlay._id)
+      ? prev.map(o => o._id === overlay._id ? { ...o, ...overlay } : o)
+      : [overlay, ...prev]
+    );
+  };
+
   const fetchStreams = async () => {
     try {
       const response = await fetch(`${API_BASE}/streams`);
@@ -79,9 +114,19 @@ const RTSPStreamingApp = () => {
   const fetchOverlays = async () => {
     setLoadingOverlays(true);
     try {
-      const response = await fetch(`${API_BASE}/overlays`);
-      const data = await response.json();
-      setOverlays(data.overlays || []);
+      // The list is paged; follow next_cursor until every overlay is loaded
+      const all = [];
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ limit: '500' });
+        if (cursor) params.set('cursor', cursor);
+        const response = await fetch(`${API_BASE}/overlays?${params}`);
+        const data = await response.json();
+        if (!response.ok) throw new Error(data.error || `HTTP ${response.status}`);
+        all.push(...(data.overlays || []));
+        cursor = data.next_cursor;
+      } while (cursor);
+      setOverlays(all);
     } catch (err) {
       console.error('Error fetching overlays:', err);
       // For demo purposes, use mock data
@@ -233,7 +278,8 @@ const RTSPStreamingApp = () => {
       });
 
       if (response.ok) {
-        await fetchOverlays();
+        const data = await response.json();
+        applyOverlay(data.overlay);
         resetOverlayForm();
         setShowOverlayForm(false);
       } else {
@@ -267,7 +313,8 @@ const RTSPStreamingApp = () => {
       });
 
       if (response.ok) {
-        await fetchOverlays();
+        const data = await response.json();
+        applyOverlay(data.overlay);
         resetOverlayForm();
         setEditingOverlay(null);
         setShowOverlayForm(false);
@@ -294,15 +341,12 @@ const RTSPStreamingApp = () => {
   const deleteOverlay = async (overlayId) => {
     if (window.confirm('Are you sure you want to delete this overlay?')) {
       try {
-        const response = await fetch(`${API_BASE}/overlays/${overlayId}`, {
+        await fetch(`${API_BASE}/overlays/${overlayId}`, {
           method: 'DELETE'
         });
 
-        if (response.ok) {
-          await fetchOverlays();
-        } else {
-          setOverlays(prev => prev.filter(o => o._id !== overlayId));
-        }
+        // Removed locally either way; other clients hear about it from the server
+        setOverlays(prev => prev.filter(o => o._id !== overlayId));
       } catch (error) {
         setOverlays(prev => prev.filter(o => o._id !== overlayId));
       }
@@ -318,7 +362,8 @@ const RTSPStreamingApp = () => {
       });
 
       if (response.ok) {
-        await fetchOverlays();
+        const data = await response.json();
+        applyOverlay(data.overlay);
       } else {
         setOverlays(prev => prev.map(o => 
           o._id === overlay._id ? { ...o, visible: !o.visible } : o
@@ -603,6 +648,15 @@ const RTSPStreamingApp = () => {
                       key={stream.stream_id}
                       className="bg-gray-700 p-3 rounded-lg text-sm"
                     >
+                      {stream.thumbnail_url && (
+                        <img
+                          src={`${API_BASE.replace(/\/api$/, '')}${stream.thumbnail_url}`}
+                          alt=""
+                          className="w-full aspect-video object-cover rounded mb-2 bg-gray-900"
+                          onError={(e) => { e.currentTarget.style.visibility = 'hidden'; }}
+                          onLoad={(e) => { e.currentTarget.style.visibility = 'visible'; }}
+                        />
+                      )}
                       <p className="font-mono text-xs text-gray-300 mb-1">
                         {stream.stream_id.slice(0, 8)}...
                       </p>